@@ -0,0 +1,124 @@
+# api/cancellation.py
+
+import contextlib
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger("TranslationApp")
+
+_local = threading.local()
+
+
+class OperationCancelled(requests.exceptions.RequestException):
+    """Запит перервано, бо користувач зупинив обробку черги."""
+
+
+class CancellationToken:
+    """
+    Токен скасування одного запуску черги. cancel() позначає запуск зупиненим і викликає
+    зареєстровані обробники: вони завершують процеси ffmpeg/Whisper і відпускають HTTP-запити,
+    тож зупинка звільняє ресурси за секунди, а не після завершення поточного кроку.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Переривчаста пауза: повертає True, якщо запуск скасовано до її завершення."""
+        return self._event.wait(timeout)
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Скасування -> Обробник завершився з помилкою: {e}")
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback):
+        """Викликає callback при скасуванні, поки виконується блок (або одразу, якщо вже скасовано)."""
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                callback_id = self._next_id
+                self._next_id += 1
+                self._callbacks[callback_id] = callback
+        if not registered:
+            callback()
+        try:
+            yield self
+        finally:
+            if registered:
+                with self._lock:
+                    self._callbacks.pop(callback_id, None)
+
+
+def current_token():
+    """Токен, встановлений для поточного потоку через cancellation_scope, або None."""
+    return getattr(_local, 'token', None)
+
+
+@contextlib.contextmanager
+def cancellation_scope(token):
+    """Прив'язує токен до викликів провайдерів у цьому потоці (див. RetryPolicy і cancellable_request)."""
+    previous = current_token()
+    _local.token = token if token is not None else previous
+    try:
+        yield _local.token
+    finally:
+        _local.token = previous
+
+
+def cancellable_request(method: str, url: str, **kwargs):
+    """
+    requests.request, який можна перервати токеном поточного потоку.
+    Запит виконується в допоміжному потоці; при скасуванні сесія закривається, а виклик
+    одразу кидає OperationCancelled, не чекаючи відповіді сервера чи таймауту.
+    """
+    token = current_token()
+    if token is None:
+        return requests.request(method, url, **kwargs)
+    if token.is_cancelled:
+        raise OperationCancelled(f"{method} {url}: запуск зупинено")
+
+    session = requests.Session()
+    outcome = {}
+    done = threading.Event()
+
+    def run():
+        try:
+            outcome['response'] = session.request(method, url, **kwargs)
+        except Exception as e:
+            outcome['error'] = e
+        finally:
+            # Як і requests.request, сесія закривається одразу; потокова відповідь тримає власне з'єднання
+            session.close()
+            done.set()
+            if token.is_cancelled and 'response' in outcome:
+                # Відповідь уже нікому не потрібна: звільняємо з'єднання
+                outcome['response'].close()
+
+    threading.Thread(target=run, daemon=True).start()
+    with token.on_cancel(done.set):
+        done.wait()
+
+    if token.is_cancelled:
+        session.close()
+        raise OperationCancelled(f"{method} {url}: запуск зупинено")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['response']
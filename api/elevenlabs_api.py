@@ -2,6 +2,9 @@ import requests
 import logging
 import time
 
+from api.retry_policy import RATE_LIMIT_STATUSES, RetryPolicy, RetryableError, TerminalError, current_deadline, parse_retry_after, request_timeout
+from api.cancellation import cancellable_request
+
 logger = logging.getLogger("TranslationApp")
 
 class ElevenLabsAPI:
@@ -14,6 +17,7 @@ class ElevenLabsAPI:
         }
         self.balance = None
         self.templates = []
+        self.retry_policy = RetryPolicy(config.get("retry_policy", {}))
 
     def test_connection(self):
         if not self.api_key:
@@ -105,91 +109,79 @@ class ElevenLabsAPI:
         if template_uuid: 
             payload["template_uuid"] = template_uuid
         
-        notification_sent = False
-        while True:
-            try:
-                response = requests.post(url, headers=self.headers, json=payload, timeout=20)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    task_id = data.get("task_id")
-                    logger.info(f"ElevenLabs -> Завдання успішно створено. ID: {task_id}")
-                    self.update_balance()
-                    return task_id
-                
-                elif response.status_code == 402:
-                    if not notification_sent:
-                        logger.warning("ElevenLabs -> НЕПРИПУСТИМИЙ БАЛАНС. Програма чекатиме та повторюватиме спробу кожні 60 секунд. Будь ласка, поповніть свій рахунок.")
-                        notification_sent = True
-                    time.sleep(60)
-                    continue
-                
-                elif response.status_code in [401, 422]:
-                    logger.error(f"ElevenLabs -> Критична помилка ({response.status_code}): {response.text}. Зупинка.")
-                    return None
-                
-                else:
-                    logger.warning(f"ElevenLabs -> Помилка сервера ({response.status_code}). Повторна спроба через 10с...")
-                    time.sleep(10)
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"ElevenLabs -> Помилка мережі: {e}. Повторна спроба через 10с...")
-                time.sleep(10)
+        def attempt():
+            response = cancellable_request("POST", url, headers=self.headers, json=payload, timeout=request_timeout(20))
+            
+            if response.status_code == 200:
+                data = response.json()
+                task_id = data.get("task_id")
+                logger.info(f"ElevenLabs -> Завдання успішно створено. ID: {task_id}")
+                self.update_balance()
+                return task_id
+            
+            elif response.status_code == 402:
+                raise RetryableError("НЕПРИПУСТИМИЙ БАЛАНС (402), поповніть рахунок", retry_after=60, rate_limited=True)
+            
+            elif response.status_code in [401, 422]:
+                raise TerminalError(f"Критична помилка ({response.status_code}): {response.text}. Зупинка.")
+            
+            raise RetryableError(f"Помилка сервера ({response.status_code})", retry_after=parse_retry_after(response),
+                                 rate_limited=response.status_code in RATE_LIMIT_STATUSES)
+
+        return self.retry_policy.call("ElevenLabs", attempt, "Створення завдання")
 
     def check_task_status(self, task_id):
         if not task_id: 
             return None
         url = f"{self.base_url}/tasks/{task_id}/status"
-        while True:
-            try:
-                response = requests.get(url, headers=self.headers, timeout=10)
-                if response.status_code == 200:
-                    return response.json().get("status")
-                if response.status_code == 404:
-                    logger.warning(f"ElevenLabs -> Завдання {task_id} не знайдено (404).")
-                    return "not_found"
-                if response.status_code == 401:
-                    logger.error("ElevenLabs -> Недійсний ключ API при перевірці статусу.")
-                    return None
-                logger.error(f"ElevenLabs -> Перевірка статусу не вдалася ({response.status_code}). Повторна спроба через 10с...")
-                time.sleep(10)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"ElevenLabs -> Помилка мережі при перевірці статусу: {e}. Повторна спроба через 10с...")
-                time.sleep(10)
+
+        def attempt():
+            response = cancellable_request("GET", url, headers=self.headers, timeout=request_timeout(10))
+            if response.status_code == 200:
+                return response.json().get("status")
+            if response.status_code == 404:
+                raise TerminalError(f"Завдання {task_id} не знайдено (404).", result="not_found", provider_failure=False)
+            if response.status_code == 401:
+                raise TerminalError("Недійсний ключ API при перевірці статусу.")
+            raise RetryableError(f"Перевірка статусу не вдалася ({response.status_code})", retry_after=parse_retry_after(response),
+                                 rate_limited=response.status_code in RATE_LIMIT_STATUSES)
+
+        return self.retry_policy.call("ElevenLabs", attempt, f"Статус завдання {task_id}")
 
     def download_audio(self, task_id, output_path):
         if not task_id: 
             return False
         logger.info(f"ElevenLabs -> Спроба завантаження аудіо для завдання {task_id}...")
         url = f"{self.base_url}/tasks/{task_id}/result"
-        while True:
-            try:
-                response = requests.get(url, headers={"X-API-Key": self.api_key}, timeout=180)
-                if response.status_code == 200 and response.headers.get('content-type') == 'audio/mpeg':
-                    with open(output_path, 'wb') as f:
-                        f.write(response.content)
-                    logger.info(f"ElevenLabs -> УСПІХ: Аудіо збережено в {output_path}")
-                    return True
-                if response.status_code == 202:
-                    logger.info(f"ElevenLabs -> Аудіо для завдання {task_id} ще не готове (статус 202). Очікування...")
-                    return False 
-                if response.status_code in [404, 500, 502, 503, 504]:
-                    logger.error(f"ElevenLabs -> Помилка завантаження ({response.status_code}). Повторна спроба через 10с...")
-                    time.sleep(10)
-                else:
-                    logger.error(f"ElevenLabs -> КРИТИЧНА ПОМИЛКА: Помилка завантаження, статус {response.status_code}, що не передбачає повторних спроб.")
-                    return False
-            except requests.exceptions.RequestException as e:
-                logger.error(f"ElevenLabs -> Помилка мережі при завантаженні: {e}. Повторна спроба через 10с...")
-                time.sleep(10)
+
+        def attempt():
+            response = cancellable_request("GET", url, headers={"X-API-Key": self.api_key}, timeout=request_timeout(180))
+            if response.status_code == 200 and response.headers.get('content-type') == 'audio/mpeg':
+                with open(output_path, 'wb') as f:
+                    f.write(response.content)
+                logger.info(f"ElevenLabs -> УСПІХ: Аудіо збережено в {output_path}")
+                return True
+            if response.status_code == 202:
+                logger.info(f"ElevenLabs -> Аудіо для завдання {task_id} ще не готове (статус 202). Очікування...")
+                return False 
+            if response.status_code in [404, 429, 500, 502, 503, 504]:
+                raise RetryableError(f"Помилка завантаження ({response.status_code})", retry_after=parse_retry_after(response),
+                                     rate_limited=response.status_code in RATE_LIMIT_STATUSES)
+            raise TerminalError(f"КРИТИЧНА ПОМИЛКА: Помилка завантаження, статус {response.status_code}, що не передбачає повторних спроб.")
+
+        return self.retry_policy.call("ElevenLabs", attempt, f"Завантаження аудіо {task_id}", default=False)
 
     def wait_for_elevenlabs_task(self, app, task_id, output_path):
         """Wait for ElevenLabs task completion and download the result."""
         max_wait_time, wait_interval, waited_time = 600, 15, 0
         
+        deadline = current_deadline()
         while waited_time < max_wait_time:
             if not app._check_app_state(): 
                 return False
+            if deadline is not None and deadline.expired:
+                logger.error(f"[Chain] Audio task {task_id}: deadline reached, giving up.")
+                return False
 
             status = self.check_task_status(task_id)
             logger.info(f"[Chain] Audio task {task_id} status: {status}")
@@ -22,6 +22,7 @@ class GooglerAPI:
             "Content-Type": "application/json"
         }
         self._lock = threading.Lock()
+        self.last_usage_stats = None
 
     def test_connection(self):
         """Тестує підключення до Googler API."""
@@ -56,7 +57,9 @@ class GooglerAPI:
             url = f"{self.base_url}/usage"
             response = requests.get(url, headers={"X-API-Key": self.api_key}, timeout=10)
             if response.status_code == 200:
-                return response.json()
+                # Остання статистика використовується для оцінки квоти перед запуском черги
+                self.last_usage_stats = response.json()
+                return self.last_usage_stats
             else:
                 logger.error(f"Googler -> ПОМИЛКА: Не вдалося отримати статистику. Статус: {response.status_code}, Повідомлення: {response.text}")
                 return None
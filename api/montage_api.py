@@ -2,11 +2,16 @@ import logging
 import os
 import sys
 import datetime
+import hashlib
+import json
 import random
-import re
+import shutil
 import subprocess
 import threading
 import time
+import concurrent.futures
+import contextlib
+from collections import namedtuple
 from tkinter import messagebox # Потрібно для повідомлень про помилки
 
 # Нові залежності, які ми перевіряли в оригінальному файлі
@@ -17,7 +22,17 @@ import ffmpeg
 logger = logging.getLogger("TranslationApp")
 
 # Визначаємо шлях, щоб знайти, куди зберігати лог
-from constants.app_settings import DETAILED_LOG_FILE
+from constants.app_settings import DETAILED_LOG_FILE, CACHE_DIR
+from constants.default_config import DEFAULT_CONFIG
+from api.cancellation import CancellationToken
+from core.whisper_manager import WhisperModelManager
+from utils.file_utils import prune_cache_dir
+from utils.history_utils import format_duration
+from utils.image_utils import FRAMING_MODES, PREPARE_VERSION, file_sha1, prepare_montage_images, generate_test_image
+from utils.speech_utils import (
+    SAMPLE_RATE, find_silence_points, plan_shards, stitch_shard_segments,
+    detect_language_worker, transcribe_shard_worker, transcribe_with_vad
+)
 
 def format_time(seconds: float) -> str:
     """Конвертує секунди у формат часу для .ass (Г:ХХ:СС.цс)."""
@@ -27,13 +42,66 @@ def format_time(seconds: float) -> str:
     centiseconds = int(delta.microseconds / 10000)
     return f"{hours}:{minutes:02}:{seconds_val:02}.{centiseconds:02}"
 
+# Змінюйте при зміні способу рендеру сегментів, щоб старі кліпи з кешу не використовувались
+SEGMENT_CACHE_VERSION = 2
+# Частота читання статичного зображення; вихідна частота кадрів досягається дублюванням
+STILL_INPUT_FRAMERATE = 1
+
+# Одна подія каналу -progress ffmpeg. Поля, яких ffmpeg ще не знає (N/A), дорівнюють None.
+FFmpegProgress = namedtuple('FFmpegProgress', ['frame', 'fps', 'out_time', 'speed', 'done'])
+
+def _progress_number(value, cast=float):
+    try:
+        return cast(value.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+def iter_progress_events(lines):
+    """
+    Розбирає вивід -progress pipe:1 (блоки рядків key=value, кожен закінчується рядком
+    progress=continue|end) і повертає по одній події FFmpegProgress на блок.
+    """
+    block = {}
+    for line in lines:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            continue
+        block[key] = value
+        if key != 'progress':
+            continue
+        out_time_us = _progress_number(block.get('out_time_us'), int)
+        if out_time_us is None:
+            out_time_us = _progress_number(block.get('out_time_ms'), int) # у ffmpeg це теж мікросекунди
+        yield FFmpegProgress(
+            frame=_progress_number(block.get('frame'), int),
+            fps=_progress_number(block.get('fps')),
+            out_time=out_time_us / 1_000_000 if out_time_us is not None else None,
+            speed=_progress_number(block.get('speed')),
+            done=value == 'end'
+        )
+        block = {}
+
+def terminate_process_pool(executor):
+    """Завершує процеси-воркери ProcessPoolExecutor, не чекаючи поточних завдань."""
+    terminate_workers = getattr(executor, 'terminate_workers', None) # Python 3.14+
+    if terminate_workers:
+        terminate_workers()
+        return
+    for process in list((getattr(executor, '_processes', None) or {}).values()):
+        process.terminate()
+
 # --- API для монтажу ---
 class MontageAPI:
     def __init__(self, config, app_instance, update_callback):
         self.config = config.get("montage", {})
         self.app = app_instance
         self.update_callback = update_callback
-        self.whisper_model_instance = None
+        # WorkflowManager підставляє токен свого запуску: зупинка черги завершує ffmpeg і воркери Whisper
+        self.cancel_token = CancellationToken()
+        # Пул підготовки зображень поточного запуску монтажу (див. image_prep_pool)
+        self._image_prep_pool = None
+        # Модель Whisper спільна для всієї програми (див. core/whisper_manager.py)
+        self.whisper_manager = getattr(app_instance, 'whisper_manager', None) or WhisperModelManager(config)
         self.codec_map = {
             "libx264 (CPU)": "libx264",
             # Windows/Linux
@@ -47,27 +115,82 @@ class MontageAPI:
             "hevc_videotoolbox (Apple H.265/HEVC)": "hevc_videotoolbox",
         }
 
-    def _load_whisper_model(self):
-        """Завантажує модель Whisper, якщо вона ще не завантажена."""
-        if self.whisper_model_instance is None:
-            model_name = self.config.get("whisper_model", "base")
-            logger.info(f"Whisper -> Запит на завантаження моделі: {model_name}")
-            
-            download_root = None
-            if getattr(sys, 'frozen', False):
-                base_path = os.path.dirname(sys.executable)
-                download_root = os.path.join(base_path, "whisper_models")
-                os.makedirs(download_root, exist_ok=True)
-                logger.info(f"Whisper -> Програма запущена як EXE. Шлях для моделей: {download_root}")
+    @contextlib.contextmanager
+    def image_prep_pool(self):
+        """
+        Один пул процесів підготовки зображень на весь запуск монтажу: усі чанки create_video
+        діляться ним, тож процеси-воркери (у EXE - нові інтерпретатори з імпортом програми) стартують один раз.
+        Поза цим блоком create_video створює власний пул.
+        """
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        self._image_prep_pool = executor
+        try:
+            with self.cancel_token.on_cancel(lambda: terminate_process_pool(executor)):
+                yield executor
+        finally:
+            self._image_prep_pool = None
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            self.update_callback(f"Завантаження моделі Whisper ({model_name})...")
-            try:
-                self.whisper_model_instance = whisper.load_model(model_name, download_root=download_root)
-                logger.info(f"Whisper -> УСПІХ: Модель '{model_name}' успішно завантажена.")
-            except Exception as e:
-                logger.error(f"Whisper -> ПОМИЛКА: Не вдалося завантажити модель '{model_name}': {e}", exc_info=True)
-                self.whisper_model_instance = None
-        return self.whisper_model_instance
+    def transcribe_long_audio(self, audio_path):
+        """
+        Транскрибує довге аудіо (джерело для рерайту) і повертає повний текст.
+        Аудіо ріжеться по паузах на шарди з перекриттям, шарди транскрибуються
+        паралельно в окремих процесах, а сегменти склеюються зі зсувом часу.
+        Повертає None у разі помилки.
+        """
+        shard_seconds = self.config.get('transcription_shard_seconds', 300)
+        overlap = self.config.get('transcription_shard_overlap', 2.0)
+        num_workers = max(1, self.config.get('transcription_workers', 2))
+
+        try:
+            samples = whisper.load_audio(audio_path)
+        except Exception as e:
+            logger.error(f"Транскрипція -> ПОМИЛКА: Не вдалося прочитати аудіо {os.path.basename(audio_path)}: {e}", exc_info=True)
+            return None
+
+        duration = len(samples) / SAMPLE_RATE
+        silence_points = find_silence_points(samples)
+        shards = plan_shards(duration, silence_points, shard_seconds, overlap)
+
+        if len(shards) == 1 or num_workers == 1:
+            with self.whisper_manager.use(self.update_callback) as model:
+                if not model:
+                    return None
+                logger.info(f"Транскрипція -> {os.path.basename(audio_path)} ({duration:.0f}с) в один прохід.")
+                result = transcribe_with_vad(model, samples, self.config, verbose=False)
+            return result['text']
+
+        logger.info(f"Транскрипція -> {os.path.basename(audio_path)} ({duration:.0f}с): {len(shards)} шардів, {num_workers} воркерів, пауз знайдено: {len(silence_points)}.")
+        self.update_callback(f"Паралельна транскрипція: {len(shards)} частин...")
+
+        shard_segments = [None] * len(shards)
+        cancel_token = self.cancel_token
+        try:
+            # Пул процесів належить WhisperModelManager і перевикористовується наступними джерелами
+            with self.whisper_manager.shard_pool(num_workers, self.update_callback) as executor, \
+                 cancel_token.on_cancel(lambda: terminate_process_pool(executor)):
+                # Мову визначаємо один раз, щоб усі шарди транскрибувались однаково
+                language = executor.submit(detect_language_worker, samples[:30 * SAMPLE_RATE]).result()
+                logger.info(f"Транскрипція -> Визначена мова: {language}")
+
+                futures = {}
+                for i, shard in enumerate(shards):
+                    shard_samples = samples[int(shard['start'] * SAMPLE_RATE):int(shard['end'] * SAMPLE_RATE)]
+                    futures[executor.submit(transcribe_shard_worker, shard_samples, language, self.config)] = i
+
+                for done_count, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                    shard_segments[futures[future]] = future.result()
+                    self.update_callback(f"Транскрипція: {done_count}/{len(shards)} частин готово.")
+        except Exception as e:
+            if cancel_token.is_cancelled:
+                logger.warning("Транскрипція -> Перервано: обробку зупинено, процеси-воркери завершено.")
+                return None
+            logger.error(f"Транскрипція -> ПОМИЛКА паралельної транскрипції: {e}", exc_info=True)
+            return None
+
+        stitched = stitch_shard_segments(shards, shard_segments)
+        logger.info(f"Транскрипція -> УСПІХ: склеєно {len(stitched)} сегментів з {len(shards)} шардів.")
+        return "".join(segment['text'] for segment in stitched)
 
     def create_subtitles(self, audio_path, output_ass_path, lang_code=None):
         """Створює файл субтитрів .ass з аудіофайлу."""
@@ -82,15 +205,15 @@ class MontageAPI:
         """Створює субтитри використовуючи стандартний Whisper (Python library)."""
         logger.info(f"Субтитри (Standard) -> Початок створення субтитрів для {os.path.basename(audio_path)}")
         try:
-            model = self._load_whisper_model()
-            if not model:
-                self.update_callback("Помилка: не вдалося завантажити модель Whisper.")
-                logger.error("Субтитри -> ПОМИЛКА: Модель Whisper не завантажена.")
-                return False
+            with self.whisper_manager.use(self.update_callback) as model:
+                if not model:
+                    self.update_callback("Помилка: не вдалося завантажити модель Whisper.")
+                    logger.error("Субтитри -> ПОМИЛКА: Модель Whisper не завантажена.")
+                    return False
 
-            logger.info(f"Субтитри -> Початок транскрибації файлу: {os.path.basename(audio_path)}...")
+                logger.info(f"Субтитри -> Початок транскрибації файлу: {os.path.basename(audio_path)}...")
 
-            result = model.transcribe(audio_path, verbose=False)
+                result = transcribe_with_vad(model, whisper.load_audio(audio_path), self.config, verbose=False)
 
             if not result or not result.get('segments'):
                 logger.error("Субтитри -> ПОМИЛКА: Результат транскрибації порожній або недійсний.")
@@ -234,15 +357,27 @@ class MontageAPI:
             self.update_callback(f"Транскрибація AMD GPU... {os.path.basename(audio_path)}")
             
             # 5. Запуск процесу
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
                 encoding='utf-8',
-                errors='replace',
-                timeout=600  # 10 хвилин таймаут для довгих аудіо
+                errors='replace'
             )
+            with self.cancel_token.on_cancel(process.kill):
+                try:
+                    stdout, stderr = process.communicate(timeout=600)  # 10 хвилин таймаут для довгих аудіо
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.communicate()
+                    raise
+            result = subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
             
+            if self.cancel_token.is_cancelled:
+                logger.warning("Субтитри (AMD) -> Перервано: обробку зупинено.")
+                return False
+
             if result.returncode != 0:
                 logger.error(f"AMD Whisper повернув код помилки {result.returncode}")
                 logger.error(f"stderr: {result.stderr}")
@@ -394,12 +529,421 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         total_seconds = h * 3600 + m * 60 + s + ms / 1000.0
         return total_seconds
 
-    def create_video(self, image_paths, audio_path, ass_path, output_video_path, task_key=None, chunk_index=None):
-        """Створює відео з зображень, аудіо та субтитрів з ефектами, ЗАВЖДИ з переходами."""
+    def _encoder_params(self):
+        """Повертає (кодек, параметри виводу) для фінального кодування згідно з налаштуваннями."""
+        codec_cfg = self.config.get('codec', {})
+        selected_codec_display_name = codec_cfg.get('video_codec', 'libx264 (CPU)')
+        video_codec = self.codec_map.get(selected_codec_display_name, 'libx264')
+
+        output_params = {'vcodec': video_codec, 'pix_fmt': 'yuv420p'}
+        if video_codec == 'libx264':
+            output_params['crf'] = codec_cfg.get('x264_crf', 23)
+            # preset і threads записує калібрування кодека (calibrate_encoder); без нього - типові значення ffmpeg
+            if codec_cfg.get('x264_preset'):
+                output_params['preset'] = codec_cfg['x264_preset']
+            if codec_cfg.get('x264_threads'):
+                output_params['threads'] = codec_cfg['x264_threads']
+        elif 'nvenc' in video_codec:
+            output_params['cq'] = codec_cfg.get('nvenc_cq', 23)
+            output_params['rc'] = 'constqp'
+        elif 'amf' in video_codec:
+            output_params['usage'] = codec_cfg.get('amf_usage', 'transcoding')
+            output_params['quality'] = codec_cfg.get('amf_quality', 'balanced')
+            rc = codec_cfg.get('amf_rc', 'cqp')
+            output_params['rc'] = rc
+            if rc != 'cqp':
+                output_params['b:v'] = codec_cfg.get('amf_bitrate', '8000k')
+        elif 'videotoolbox' in video_codec:
+            output_params['b:v'] = codec_cfg.get('vt_bitrate', '8000k')
+
+        return video_codec, {k: v for k, v in output_params.items() if v != '' and v is not None}
+
+    def _run_ffmpeg(self, output_stream, script_dir, on_progress=None, threads=0):
+        """
+        Запускає ffmpeg для графа ffmpeg-python. Граф фільтрів передається через
+        -filter_complex_script, тож довжина командного рядка не залежить від кількості кадрів.
+        threads обмежує потоки фільтрів (потоки кодера задаються параметром виводу threads).
+        Прогрес читається з машинного каналу -progress pipe:1; on_progress отримує FFmpegProgress.
+        Повертає (код завершення, stderr).
+        """
+        if threads:
+            output_stream = output_stream.global_args('-filter_complex_threads', str(threads))
+        args = output_stream.overwrite_output().get_args()
+        if '-filter_complex' in args:
+            idx = args.index('-filter_complex')
+            script_path = os.path.join(script_dir, f"filter_{threading.get_ident()}_{time.time_ns()}.txt")
+            with open(script_path, 'w', encoding='utf-8') as f:
+                f.write(args[idx + 1])
+            args[idx:idx + 2] = ['-filter_complex_script', script_path]
+
+        # Додаємо прапорець -nostdin, щоб запобігти зависанню ffmpeg в очікуванні вводу.
+        # -nostats прибирає рядки frame= зі stderr: там лишаються тільки попередження й помилки.
+        process = subprocess.Popen(["ffmpeg", '-y', '-nostdin', '-hide_banner', '-nostats', '-progress', 'pipe:1'] + args,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, encoding='utf-8', errors='ignore')
+
+        # stderr читається окремим потоком, щоб заповнений буфер не заблокував ffmpeg
+        stderr_chunks = []
+        stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_thread.start()
+        # Зупинка черги завершує ffmpeg одразу, не чекаючи кінця рендеру
+        with self.cancel_token.on_cancel(process.terminate):
+            for event in iter_progress_events(process.stdout):
+                if on_progress:
+                    on_progress(event)
+            process.wait()
+        stderr_thread.join()
+        if self.cancel_token.is_cancelled:
+            logger.warning(f"FFmpeg -> Процес завершено (код {process.returncode}): обробку зупинено.")
+        return process.returncode, "".join(stderr_chunks)
+
+    def _image_framing(self, use_motion):
+        """
+        Спосіб кадрування зображень (montage.image_framing). "auto" зберігає попередню поведінку:
+        з рухом/зумом кадр розтягується до 16:9, статичний кадр вписується з чорними полями.
+        """
+        framing = self.config.get('image_framing', 'auto')
+        if framing in FRAMING_MODES:
+            return framing
+        return 'stretch' if use_motion else 'fit'
+
+    def _pick_motion_type(self, seed):
+        """
+        Обирає тип руху для одного зображення. "Випадковий" детермінований за хешем зображення,
+        тож повторний монтаж того самого кадру дає той самий кліп і може взяти його з кешу.
+        """
+        motion_type = self.config.get('motion_type', 'Випадковий')
+        if motion_type == "Випадковий":
+            motion_type = random.Random(seed).choice(["Гойдання (ліво-право)", "Гойдання (верх-низ)", "Гойдання (знак нескінченності)"])
+        return motion_type
+
+    def _segment_cache_key(self, segment, image_hashes, prepared_paths, motion_types, transition_effect, transition_duration, output_framerate, segment_params, geometry):
+        """Ключ кешу сегмента: вміст його зображень і все, що впливає на його кадри."""
+        cfg = self.config
+        key_data = {
+            'version': SEGMENT_CACHE_VERSION,
+            'prepare_version': PREPARE_VERSION,
+            'kind': segment['kind'],
+            'offset': segment['offset'],
+            'frames': segment['frames'],
+            'images': [image_hashes[i] for i in segment['images']],
+            'prepared': [bool(prepared_paths[i]) for i in segment['images']],
+            'framing': self._image_framing(cfg.get('motion_enabled', False) or cfg.get('zoom_enabled', False)),
+            'motion_types': [motion_types[i] for i in segment['images']],
+            'motion': [cfg.get('motion_enabled', False), cfg.get('motion_intensity', 5.0),
+                       cfg.get('zoom_enabled', False), cfg.get('zoom_intensity', 10.0), cfg.get('zoom_speed', 1.0)],
+            'transition': [transition_effect, round(transition_duration, 4)] if segment['kind'] == 'transition' else None,
+            'fps': output_framerate,
+            'geometry': geometry,
+            'codec': segment_params,
+        }
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _image_clip_stream(self, image_path, prepared_path, motion_type, frame_offset, num_frames, output_width, output_height, output_framerate, supersample=2):
+        """
+        Будує потік ffmpeg-python для кадрів [frame_offset, frame_offset + num_frames) одного зображення.
+        Вирази руху залежать від (on + frame_offset), тож сусідні сегменти одного кадру стикуються без стрибків.
+        """
+        cfg = self.config
+        MOTION_PERIOD_SECONDS = 20.0
+        ZOOM_PERIOD_SECONDS = 10.0
+        motion_period_frames = MOTION_PERIOD_SECONDS * output_framerate
+        zoom_period_frames = ZOOM_PERIOD_SECONDS * output_framerate
+        frame_n = f"(on+{frame_offset})"
+
+        if not (cfg.get('motion_enabled', False) or cfg.get('zoom_enabled', False)):
+            # Статичний кадр: зображення читається з низькою частотою, а fps лише дублює кадри,
+            # тож декодування та масштабування не повторюються для кожного вихідного кадру
+            stream = ffmpeg.input(prepared_path or image_path, loop=1, framerate=STILL_INPUT_FRAMERATE)
+            if not prepared_path:
+                stream = stream.filter('scale', size=f'{output_width}x{output_height}', force_original_aspect_ratio='decrease').filter('pad', w=output_width, h=output_height, x='(ow-iw)/2', y='(oh-ih)/2', color='black')
+            return stream.filter('fps', fps=output_framerate).trim(end_frame=num_frames).setpts('PTS-STARTPTS')
+
+        if prepared_path:
+            stream = ffmpeg.input(prepared_path, loop=1, framerate=output_framerate)
+        else:
+            stream = ffmpeg.input(image_path, loop=1, framerate=output_framerate).filter('scale', size=f'{output_width*supersample}x{output_height*supersample}')
+
+        pan_x_expr, pan_y_expr = "0", "0"
+
+        if cfg.get('motion_enabled', False):
+            # Амплітуда задана в пікселях кадру 3840px (1080p з 2x), тож масштабується під поточну якість
+            amplitude = cfg.get('motion_intensity', 5.0) * 5 * (output_width * supersample / 3840)
+            if motion_type == "Гойдання (ліво-право)": pan_x_expr = f"sin(2*PI*{frame_n}/{motion_period_frames})*{amplitude}"
+            elif motion_type == "Гойдання (верх-низ)": pan_y_expr = f"sin(2*PI*{frame_n}/{motion_period_frames})*{amplitude}"
+            elif motion_type == "Гойдання (знак нескінченності)":
+                pan_x_expr = f"sin(2*PI*{frame_n}/{motion_period_frames})*{amplitude}"
+                pan_y_expr = f"sin(4*PI*{frame_n}/{motion_period_frames})*{amplitude/2}"
+
+        zoom_expr = "1.1" if cfg.get('motion_enabled', False) and not cfg.get('zoom_enabled', False) else "1.0"
+
+        if cfg.get('zoom_enabled', False):
+            intensity_decimal = cfg.get('zoom_intensity', 10.0) / 100.0
+            zoom_speed = cfg.get('zoom_speed', 1.0)
+            base_zoom = 1.0 + intensity_decimal / 2.0
+            amplitude_zoom = intensity_decimal / 2.0
+            zoom_expr = f"{base_zoom} - {amplitude_zoom} * cos(2*PI*{zoom_speed}*{frame_n}/{zoom_period_frames})"
+
+        x_final_expr = f"(iw-iw/({zoom_expr}))/2 + {pan_x_expr}"
+        y_final_expr = f"(ih-ih/({zoom_expr}))/2 + {pan_y_expr}"
+
+        stream = stream.filter('zoompan', z=zoom_expr, d=num_frames, s=f'{output_width}x{output_height}', x=x_final_expr, y=y_final_expr, fps=output_framerate)
+
+        return stream.trim(end_frame=num_frames).setpts('PTS-STARTPTS')
+
+    def _plan_segments(self, num_images, image_frames, transition_frames):
+        """
+        Ділить таймлайн на незалежні сегменти: "тіло" кожного зображення та окремі переходи між сусідніми.
+        Кожен сегмент відкриває не більше двох зображень, тож пам'ять не росте з їхньою кількістю.
+        """
+        segments = []
+        for i in range(num_images):
+            body_start = transition_frames if i > 0 else 0
+            body_end = image_frames - (transition_frames if i < num_images - 1 else 0)
+            if body_end > body_start:
+                segments.append({'kind': 'body', 'images': [i], 'offset': body_start, 'frames': body_end - body_start})
+            if i < num_images - 1 and transition_frames > 0:
+                segments.append({'kind': 'transition', 'images': [i, i + 1], 'offset': image_frames - transition_frames, 'frames': transition_frames})
+        return segments
+
+    def _soft_subtitle_params(self):
+        """Параметри виводу для доріжки м'яких субтитрів: ASS у MKV (зі стилями) або mov_text у MP4."""
+        if self.config.get('soft_subtitle_container', 'mkv') == 'mkv':
+            # Формат задається явно, бо чанки можуть мати розширення .mp4
+            return {'scodec': 'ass', 'f': 'matroska'}
+        return {'scodec': 'mov_text'}
+
+    def history_key(self, quality=None):
+        """Ключ статистики швидкості монтажу в RunHistory: кодек, рух і рівень якості."""
+        video_codec, _ = self._encoder_params()
+        use_motion = self.config.get('motion_enabled', False) or self.config.get('zoom_enabled', False)
+        return f"{video_codec}|{'motion' if use_motion else 'static'}|{self._quality_settings(quality)['name']}"
+
+    def output_profiles(self):
+        """Додаткові формати виводу з налаштувань (порожній список, якщо вимкнено)."""
+        if not self.config.get('output_profiles_enabled', False):
+            return []
+        return [p for p in self.config.get('output_profiles', []) if p.get('width') and p.get('height')]
+
+    @staticmethod
+    def profile_output_path(output_video_path, profile):
+        """Шлях файлу додаткового формату: суфікс профілю перед розширенням основного файлу."""
+        base, ext = os.path.splitext(output_video_path)
+        return f"{base}_{profile.get('suffix') or profile.get('name', 'alt')}{ext}"
+
+    def _frame_for_profile(self, video, profile):
+        """
+        Кадрування гілки під формат профілю. "crop" вирізає центральну частину з потрібним
+        співвідношенням сторін (16:9 -> 9:16 для shorts), "fit" вписує кадр з полями.
+        """
+        width, height = profile['width'], profile['height']
+        if profile.get('framing', 'crop') == 'fit':
+            video = video.filter('scale', width, height, force_original_aspect_ratio='decrease')
+            video = video.filter('pad', width, height, '(ow-iw)/2', '(oh-ih)/2')
+        else:
+            video = video.filter('crop', f'min(iw,ih*{width}/{height})', f'min(ih,iw*{height}/{width})')
+            video = video.filter('scale', width, height, flags='lanczos')
+        return video.filter('setsar', 1)
+
+    def _profile_output_params(self, profile, base_params):
+        """Параметри кодування профілю: загальні параметри виводу з перевизначеннями кодека й бітрейту."""
+        params = dict(base_params)
+        if profile.get('vcodec') and profile['vcodec'] != params.get('vcodec'):
+            # Параметри якості іншого кодека не підходять, лишаємо лише спільні
+            params = {k: v for k, v in params.items() if k in ('pix_fmt', 'acodec', 'scodec', 'f', 't', 'r', 'threads')}
+            params['vcodec'] = profile['vcodec']
+        if profile.get('bitrate'):
+            for key in ('crf', 'cq', 'rc', 'qp'):
+                params.pop(key, None)
+            params['b:v'] = profile['bitrate']
+        elif profile.get('crf') is not None:
+            params['crf'] = profile['crf']
+        return params
+
+    def soft_subtitle_extension(self):
+        """Розширення фінального відео з урахуванням режиму субтитрів."""
+        if self.config.get('subtitle_mode', 'burn') == 'soft' and self.config.get('soft_subtitle_container', 'mkv') == 'mkv':
+            return '.mkv'
+        return '.mp4'
+
+    def burn_subtitles(self, video_path, output_path, ass_path=None):
+        """
+        Окремий прохід "вшити пізніше": накладає субтитри на готове відео.
+        Без ass_path береться вбудована доріжка м'яких субтитрів самого відео. Аудіо копіюється.
+        """
+        video_name = os.path.basename(output_path)
+        video_codec, output_params = self._encoder_params()
+        output_params['acodec'] = 'copy'
+        logger.info(f"Монтаж -> Вшивання субтитрів у '{video_name}'...")
+        try:
+            source = ffmpeg.input(video_path)
+            video = source.video.filter('subtitles', filename=ass_path or video_path, force_style=f'Fontsize={self.config.get("font_size", 48)}')
+            returncode, stderr = self._run_ffmpeg(ffmpeg.output(video, source.audio, output_path, **output_params), os.path.dirname(os.path.abspath(output_path)))
+            if returncode != 0:
+                if self.cancel_token.is_cancelled:
+                    return False
+                self._report_ffmpeg_error(video_codec, returncode, stderr, output_path)
+                return False
+            logger.info(f"Монтаж -> УСПІХ: Субтитри вшито: {output_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Монтаж -> ПОМИЛКА: Не вдалося вшити субтитри в '{video_name}': {e}", exc_info=True)
+            return False
+
+    def remux_subtitles(self, video_path, ass_path, output_path):
+        """
+        Замінює доріжку м'яких субтитрів без перекодування відео та аудіо (для виправлень субтитрів).
+        Контейнер і кодек доріжки ті самі, що й у create_video; output_path може збігатися з video_path.
+        Викликається з video_chunk_worker, коли при повторному запуску змінились лише субтитри чанка.
+        """
+        base, ext = os.path.splitext(output_path)
+        tmp_path = f"{base}.remux{ext}"
+        try:
+            source = ffmpeg.input(video_path)
+            output_params = dict(self._soft_subtitle_params(), vcodec='copy', acodec='copy')
+            # Чанки рендеряться без аудіо, тож аудіодоріжка необов'язкова
+            (
+                ffmpeg
+                .output(source.video, source['a?'], ffmpeg.input(ass_path), tmp_path, **output_params)
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            os.replace(tmp_path, output_path)
+            logger.info(f"Монтаж -> Субтитри замінено без перекодування: {output_path}")
+            return True
+        except (ffmpeg.Error, OSError) as e:
+            details = e.stderr.decode(errors='ignore') if isinstance(e, ffmpeg.Error) and e.stderr else e
+            logger.error(f"Монтаж -> ПОМИЛКА ремуксу субтитрів: {details}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def calibrate_encoder(self, progress_callback=None):
+        """
+        Калібрування libx264 на цій машині: рендерить короткий синтетичний монтаж (згенеровані
+        зображення з поточними налаштуваннями руху та синусоїдальний тон) з кожною комбінацією
+        preset/threads/crf з montage.calibration і вимірює швидкість та розмір файлу.
+        Серед комбінацій, що досягають target_fps, обирається найкраща за goal:
+        "quality" - найменший crf, далі найменший файл; "speed" - найвища швидкість.
+        Повертає (найкраща комбінація або None, список усіх результатів).
+        """
+        cal_cfg = dict(DEFAULT_CONFIG['montage']['calibration'], **self.config.get('calibration', {}))
+        tier = self._quality_settings()
+        width, height = tier['width'], tier['height']
+        fps = tier['fps'] or self.config.get('output_framerate', 30)
+        supersample = tier['supersample']
+        duration = cal_cfg['duration']
+        num_images = 3
+        frames_per_image = max(1, int(duration * fps / num_images))
+        total_frames = frames_per_image * num_images
+
+        work_dir = os.path.join(CACHE_DIR, "calibration")
+        os.makedirs(work_dir, exist_ok=True)
+        results = []
+        try:
+            image_paths = [generate_test_image(os.path.join(work_dir, f"test_{i}.jpg"), width, height, seed=i) for i in range(num_images)]
+            motion_types = [self._pick_motion_type(i) for i in range(num_images)]
+            combos = [(preset, threads, crf) for preset in cal_cfg['presets'] for threads in cal_cfg['threads'] for crf in cal_cfg['crfs']]
+            logger.info(f"Калібрування -> {len(combos)} комбінацій, {width}x{height}@{fps}, {duration}с синтетичного відео.")
+
+            for n, (preset, threads, crf) in enumerate(combos, start=1):
+                if progress_callback:
+                    progress_callback(n, len(combos), preset, threads, crf)
+                clips = [self._image_clip_stream(path, None, motion_types[i], 0, frames_per_image, width, height, fps, supersample)
+                         for i, path in enumerate(image_paths)]
+                video = ffmpeg.concat(*clips, v=1, a=0) if len(clips) > 1 else clips[0]
+                audio = ffmpeg.input(f'sine=frequency=440:sample_rate=44100:duration={total_frames / fps}', f='lavfi')
+                output_path = os.path.join(work_dir, f"bench_{preset}_{threads}_{crf}.mp4")
+                output_params = {'vcodec': 'libx264', 'pix_fmt': 'yuv420p', 'preset': preset, 'crf': crf, 'acodec': 'aac', 'r': fps}
+                if threads:
+                    output_params['threads'] = threads
+
+                start_time = time.time()
+                returncode, stderr = self._run_ffmpeg(ffmpeg.output(video, audio, output_path, **output_params), work_dir, threads=threads)
+                elapsed = time.time() - start_time
+                if returncode != 0:
+                    logger.warning(f"Калібрування -> preset={preset}, threads={threads}, crf={crf}: помилка ffmpeg (код {returncode}).")
+                    continue
+                result = {'preset': preset, 'threads': threads, 'crf': crf,
+                          'fps': total_frames / elapsed if elapsed > 0 else 0.0,
+                          'size_mb': os.path.getsize(output_path) / 1024 ** 2}
+                results.append(result)
+                logger.info(f"Калібрування -> preset={preset}, threads={threads or 'авто'}, crf={crf}: {result['fps']:.1f} fps, {result['size_mb']:.2f} МБ.")
+        except Exception as e:
+            logger.error(f"Калібрування -> ПОМИЛКА: {e}", exc_info=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        if not results:
+            return None, results
+        fast_enough = [r for r in results if r['fps'] >= cal_cfg['target_fps']]
+        if not fast_enough:
+            # Цільової швидкості не досягла жодна комбінація - беремо найшвидшу
+            logger.warning(f"Калібрування -> Жодна комбінація не досягла {cal_cfg['target_fps']} fps, обрано найшвидшу.")
+            return max(results, key=lambda r: r['fps']), results
+        if cal_cfg['goal'] == 'speed':
+            return max(fast_enough, key=lambda r: r['fps']), results
+        return min(fast_enough, key=lambda r: (r['crf'], r['size_mb'])), results
+
+    def _report_ffmpeg_error(self, video_codec, returncode, stderr, output_video_path, task_key=None, chunk_index=None):
+        video_name = os.path.basename(output_video_path)
+        logger.error(f"Монтаж -> ПОМИЛКА FFMPEG для '{video_name}' (код {returncode}):\n{stderr}")
+        error_shown = False
+        if "InitializeEncoder failed" in stderr or "No such device" in stderr or "Error initializing" in stderr or "Error selecting encoder" in stderr:
+            error_message = (f"Не вдалося ініціалізувати апаратний кодек '{video_codec}'.\n"
+                             "Переконайтесь у наявності останніх драйверів та підтримці кодека.\n"
+                             f"Деталі в '{DETAILED_LOG_FILE}'.")
+            if threading.current_thread() is threading.main_thread():
+                messagebox.showerror("Помилка апаратного кодека", error_message)
+                error_shown = True
+        if not error_shown and threading.current_thread() is threading.main_thread():
+            messagebox.showerror("Помилка FFmpeg", f"Сталася помилка. Деталі в файлі '{DETAILED_LOG_FILE}'.")
+
+        # Надсилаємо сповіщення про помилку в Telegram
+        task_info = getattr(threading.current_thread(), 'task_info', {})
+        self.app.send_telegram_error_notification(
+            task_name=task_info.get('task_name', 'Невідоме завдання'),
+            lang_code=task_info.get('lang_code', 'N/A'),
+            step=self.app._t('step_name_create_video'),
+            error_details=f"Помилка FFmpeg (код {returncode}). Перевірте детальний лог."
+        )
+
+        self.update_callback(f"Помилка монтажу {video_name}. Див. лог.", task_key=task_key, chunk_index=chunk_index)
+
+    def _quality_settings(self, quality=None):
+        """
+        Повертає параметри рівня якості (draft/final): роздільність, суперсемплінг для руху,
+        частоту кадрів, а також preset/CRF для сегментів і для фінального libx264.
+        Значення None означає "як у загальних налаштуваннях монтажу".
+        """
+        tiers = self.config.get('quality_tiers') or DEFAULT_CONFIG['montage']['quality_tiers']
+        name = quality or self.config.get('quality_tier', 'final')
+        if name not in tiers:
+            logger.warning(f"Монтаж -> Невідомий рівень якості '{name}', використовується 'final'.")
+            name = 'final'
+        settings = dict(DEFAULT_CONFIG['montage']['quality_tiers']['final'])
+        settings.update(tiers.get(name, {}))
+        settings['name'] = name
+        return settings
+
+    def create_video(self, image_paths, audio_path, ass_path, output_video_path, task_key=None, chunk_index=None, resources=None, quality=None, include_audio=True, profiles=None):
+        """
+        Створює відео з зображень, аудіо та субтитрів з ефектами, ЗАВЖДИ з переходами.
+        Кожне зображення і кожен перехід рендеряться окремим коротким сегментом,
+        після чого сегменти склеюються одним проходом, який накладає субтитри та аудіо.
+        Сегменти кешуються за вмістом зображень, тож після заміни одного зображення
+        перерендерюються лише його кліп і два сусідні переходи.
+        resources - план з utils.resource_utils.plan_montage_resources (паралельність сегментів і -threads).
+        quality - рівень якості з montage.quality_tiers (за замовчуванням montage.quality_tier).
+        include_audio=False - рендерить лише відеодоріжку тривалістю аудіо (для чанків, аудіо
+        яких кодується один раз при склейці).
+        profiles - додаткові формати (див. montage.output_profiles), які виходять з того самого
+        фінального проходу через split; кожен пишеться у profile_output_path(output_video_path, profile).
+        """
         cfg = self.config
-        codec_cfg = cfg.get('codec', {})
         video_name = os.path.basename(output_video_path)
         logger.info(f"Монтаж -> Початок створення відео '{video_name}'")
+        montage_start_time = time.time()
+        work_dir = None
         try:
             self.update_callback(f"Аналіз медіа: {video_name}...", task_key=task_key, chunk_index=chunk_index, progress=0)
             probe = ffmpeg.probe(audio_path)
@@ -423,164 +967,235 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                 self.update_callback(f"Помилка: {msg}", task_key=task_key, chunk_index=chunk_index)
                 return False
 
+            if num_images > 1 and image_duration < 2 * transition_duration:
+                # Сегменти не перекриваються: кожне зображення бере участь у двох переходах, тож воно не може бути
+                # коротшим за два переходи, інакше відео вийде коротшим за аудіо
+                transition_duration = audio_duration / (num_images + 1)
+                image_duration = 2 * transition_duration
+                logger.warning(f"Монтаж -> Аудіо закоротке для {num_images} зображень, перехід скорочено до {transition_duration:.2f}с.")
+
             logger.info(f"Монтаж -> Тривалість аудіо: {audio_duration:.2f}с. Час на картинку: ~{image_duration:.2f}с.")
             self.update_callback(f"Тривалість аудіо: {audio_duration:.2f}с. Час на картинку: ~{image_duration:.2f}с.", task_key=task_key, chunk_index=chunk_index)
 
-            video_streams = []
-            output_width, output_height = 1920, 1080
-            output_framerate = cfg.get('output_framerate', 30)
-            
-            MOTION_PERIOD_SECONDS = 20.0 
-            ZOOM_PERIOD_SECONDS = 10.0
-            motion_period_frames = MOTION_PERIOD_SECONDS * output_framerate
-            zoom_period_frames = ZOOM_PERIOD_SECONDS * output_framerate
-
-            for i, img_path in enumerate(image_paths):
-                stream = ffmpeg.input(img_path, loop=1, framerate=output_framerate).filter('scale', size=f'{output_width*2}x{output_height*2}')
-                
-                if cfg.get('motion_enabled', False) or cfg.get('zoom_enabled', False):
-                    total_frames = int(image_duration * output_framerate)
-                    pan_x_expr, pan_y_expr = "0", "0"
-                    
-                    if cfg.get('motion_enabled', False):
-                        motion_type = cfg.get('motion_type', 'Випадковий')
-                        if motion_type == "Випадковий":
-                            motion_type = random.choice(["Гойдання (ліво-право)", "Гойдання (верх-низ)", "Гойдання (знак нескінченності)"])
-                        
-                        amplitude = cfg.get('motion_intensity', 5.0) * 5
-                        if motion_type == "Гойдання (ліво-право)": pan_x_expr = f"sin(2*PI*on/{motion_period_frames})*{amplitude}"
-                        elif motion_type == "Гойдання (верх-низ)": pan_y_expr = f"sin(2*PI*on/{motion_period_frames})*{amplitude}"
-                        elif motion_type == "Гойдання (знак нескінченності)":
-                            pan_x_expr = f"sin(2*PI*on/{motion_period_frames})*{amplitude}"
-                            pan_y_expr = f"sin(4*PI*on/{motion_period_frames})*{amplitude/2}"
-
-                    zoom_expr = "1.1" if cfg.get('motion_enabled', False) and not cfg.get('zoom_enabled', False) else "1.0"
-                    
-                    if cfg.get('zoom_enabled', False):
-                        intensity_decimal = cfg.get('zoom_intensity', 10.0) / 100.0
-                        zoom_speed = cfg.get('zoom_speed', 1.0)
-                        base_zoom = 1.0 + intensity_decimal / 2.0
-                        amplitude_zoom = intensity_decimal / 2.0
-                        zoom_expr = f"{base_zoom} - {amplitude_zoom} * cos(2*PI*{zoom_speed}*on/{zoom_period_frames})"
-                    
-                    x_final_expr = f"(iw-iw/({zoom_expr}))/2 + {pan_x_expr}"
-                    y_final_expr = f"(ih-ih/({zoom_expr}))/2 + {pan_y_expr}"
-
-                    stream = stream.filter('zoompan', z=zoom_expr, d=total_frames, s=f'{output_width}x{output_height}', x=x_final_expr, y=y_final_expr, fps=output_framerate)
-                else:
-                    stream = stream.filter('scale', size=f'{output_width}x{output_height}', force_original_aspect_ratio='decrease').filter('pad', w=output_width, h=output_height, x='(ow-iw)/2', y='(oh-ih)/2', color='black')
-
-                video_streams.append(stream.trim(duration=image_duration))
+            tier = self._quality_settings(quality)
+            output_width, output_height = tier['width'], tier['height']
+            output_framerate = tier['fps'] or cfg.get('output_framerate', 30)
+            supersample = tier['supersample']
+            total_output_frames = int(audio_duration * output_framerate)
+            transition_frames = int(round(transition_duration * output_framerate))
+            # Округлюємо вгору, щоб сумарна довжина сегментів не була коротшою за аудіо (зайве обріже -t)
+            image_frames = -(-(total_output_frames + transition_frames * (num_images - 1)) // num_images)
 
-            if transition_effect == "Без переходу" or len(video_streams) == 1:
-                final_video = ffmpeg.concat(*video_streams, v=1, a=0)
-            else:
-                processed_stream = video_streams[0]
-                for i in range(1, len(video_streams)):
-                    offset = i * image_duration - i * transition_duration
-                    processed_stream = ffmpeg.filter([processed_stream, video_streams[i]], 'xfade', transition=transition_effect, duration=transition_duration, offset=offset)
-                final_video = processed_stream
+            # Зображення готуються один раз (кеш за хешем і геометрією), тож ffmpeg отримує готові кадри
+            use_motion = cfg.get('motion_enabled', False) or cfg.get('zoom_enabled', False)
+            prepared_width, prepared_height = (output_width * supersample, output_height * supersample) if use_motion else (output_width, output_height)
+            framing = self._image_framing(use_motion)
+            # Спільний пул запуску монтажу вже ділить ядра між чанками; власний пул займає лише частку ядер одного чанка
+            prepare_workers = max(1, (os.cpu_count() or 1) // (resources or {}).get('chunk_workers', 1))
+            image_cache_dir = os.path.join(CACHE_DIR, "montage_images")
+            prepared_paths = prepare_montage_images(image_paths, prepared_width, prepared_height, image_cache_dir, framing, prepare_workers,
+                                                    executor=self._image_prep_pool)
+            image_hashes = [file_sha1(p) for p in image_paths]
+            motion_types = [self._pick_motion_type(h) for h in image_hashes]
+            clip_cache_dir = os.path.join(CACHE_DIR, "montage_clips")
+            os.makedirs(clip_cache_dir, exist_ok=True)
 
-            final_video_with_subs = final_video.filter('subtitles', filename=ass_path, force_style=f'Fontsize={cfg.get("font_size", 48)}')
-            audio_input = ffmpeg.input(audio_path, vn=None)
+            # Статичне слайдшоу без переходів не потребує проміжних сегментів: concat-демуксер подає
+            # зображення з тривалістю кожного напряму у фінальний прохід
+            still_slideshow = not use_motion and transition_frames == 0 and all(prepared_paths)
+            segments = [] if still_slideshow else self._plan_segments(num_images, image_frames, transition_frames)
+            work_dir = os.path.join(os.path.dirname(os.path.abspath(output_video_path)), f".segments_{os.path.splitext(video_name)[0]}")
+            os.makedirs(work_dir, exist_ok=True)
 
-            selected_codec_display_name = codec_cfg.get('video_codec', 'libx264 (CPU)')
-            video_codec = self.codec_map.get(selected_codec_display_name, 'libx264')
-            
-            output_params = {
-                'vcodec': video_codec, 'acodec': 'aac',
-                't': audio_duration, 'pix_fmt': 'yuv420p',
-                'r': output_framerate
-            }
-            
+            video_codec, output_params = self._encoder_params()
+            # Сегменти - проміжні файли, тому кодуються швидко й майже без втрат; якість визначає фінальний прохід
+            segment_params = {'vcodec': 'libx264', 'preset': tier['segment_preset'], 'crf': tier['segment_crf'], 'pix_fmt': 'yuv420p', 'r': output_framerate, 'an': None}
             if video_codec == 'libx264':
-                output_params['crf'] = codec_cfg.get('x264_crf', 23)
-            elif 'nvenc' in video_codec:
-                output_params['cq'] = codec_cfg.get('nvenc_cq', 23)
-                output_params['rc'] = 'constqp'
-            elif 'amf' in video_codec:
-                output_params['usage'] = codec_cfg.get('amf_usage', 'transcoding')
-                output_params['quality'] = codec_cfg.get('amf_quality', 'balanced')
-                rc = codec_cfg.get('amf_rc', 'cqp')
-                output_params['rc'] = rc
-                if rc != 'cqp': 
-                    output_params['b:v'] = codec_cfg.get('amf_bitrate', '8000k')
-            elif 'videotoolbox' in video_codec:
-                output_params['b:v'] = codec_cfg.get('vt_bitrate', '8000k')
-
-            output_params = {k: v for k, v in output_params.items() if v != '' and v is not None}
-            
-            self.update_callback(f"Монтаж: '{video_name}' з кодеком '{video_codec}'...", task_key=task_key, chunk_index=chunk_index)
-            logger.info(f"Монтаж -> Рендеринг '{video_name}' з кодеком '{video_codec}'. Параметри: {output_params}")
+                if tier['crf'] is not None:
+                    output_params['crf'] = tier['crf']
+                if tier['preset']:
+                    output_params['preset'] = tier['preset']
+            if not use_motion:
+                # Кадри статичних зображень майже не змінюються, stillimage економить біти й час кодування
+                segment_params['tune'] = 'stillimage'
+                if video_codec == 'libx264':
+                    output_params['tune'] = 'stillimage'
 
-            ffmpeg_executable = "ffmpeg"
-            args = ffmpeg.output(final_video_with_subs, audio_input, output_video_path, **output_params).overwrite_output().get_args()
-            
-            # Додаємо прапорець -nostdin, щоб запобігти зависанню ffmpeg в очікуванні вводу
-            process = subprocess.Popen([ffmpeg_executable, '-y', '-nostdin'] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, encoding='utf-8', errors='ignore')
-            
-            total_output_frames = int(audio_duration * output_framerate)
-            
-            # Додаємо throttling для оновлень GUI
+            resources = resources or {}
+            segment_workers = resources.get('segment_workers', 1)
+            ffmpeg_threads = resources.get('ffmpeg_threads', 0)
+
+            # Прогрес рахуємо в кадрах: усі сегменти + фінальний прохід.
+            # Сегменти рендеряться паралельно, тому враховуємо кадри всіх процесів, що зараз працюють.
+            total_work_frames = sum(s['frames'] for s in segments) + total_output_frames
+            done_frames = 0
+            cached_frames = 0 # Кадри сегментів з кешу не враховуються у швидкості рендеру
+            in_flight_frames = {}
+            progress_lock = threading.Lock()
+            render_start_time = time.time()
             last_update_time = 0
             update_interval = 0.2 # Оновлювати не частіше, ніж раз на 200 мс
 
-            for line in process.stderr:
-                line = line.strip()
-                logger.debug(f"FFMPEG -> {line}")
-
-                if line.startswith("frame="):
+            def report_progress(event, run_id=None):
+                nonlocal last_update_time
+                with progress_lock:
+                    in_flight_frames[run_id] = event.frame or 0
                     current_time = time.time()
-                    if current_time - last_update_time > update_interval:
-                        last_update_time = current_time
-                        
-                        progress = 0.0
-                        frame_match = re.search(r"frame=\s*(\d+)", line)
-                        if frame_match and total_output_frames > 0:
-                            progress = (int(frame_match.group(1)) / total_output_frames) * 100
-                        
-                        # Формуємо повідомлення для основного логу
-                        fps_match = re.search(r"fps=\s*([\d\.]+)", line)
-                        fps = fps_match.group(1) if fps_match else "N/A"
-                        bitrate_match = re.search(r"bitrate=\s*([\d\.]+\w*bits/s)", line)
-                        bitrate = bitrate_match.group(1) if bitrate_match else "N/A"
-                        formatted_line = f"Прогрес: {progress:.1f}% | FPS: {fps} | Бітрейт: {bitrate}"
-                        
-                        # Передаємо дані в callback
-                        self.update_callback(formatted_line, task_key=task_key, chunk_index=chunk_index, progress=progress)
-
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                logger.error(f"Монтаж -> ПОМИЛКА FFMPEG для '{video_name}' (код {process.returncode}):\n{stderr}")
-                error_shown = False
-                if "InitializeEncoder failed" in stderr or "No such device" in stderr or "Error initializing" in stderr or "Error selecting encoder" in stderr:
-                    error_message = (f"Не вдалося ініціалізувати апаратний кодек '{video_codec}'.\n"
-                                     "Переконайтесь у наявності останніх драйверів та підтримці кодека.\n"
-                                     f"Деталі в '{DETAILED_LOG_FILE}'.")
-                    if threading.current_thread() is threading.main_thread(): 
-                        messagebox.showerror("Помилка апаратного кодека", error_message)
-                        error_shown = True
-                if not error_shown and threading.current_thread() is threading.main_thread():
-                    messagebox.showerror("Помилка FFmpeg", f"Сталася помилка. Деталі в файлі '{DETAILED_LOG_FILE}'.")
-                
-                # Надсилаємо сповіщення про помилку в Telegram
-                task_info = getattr(threading.current_thread(), 'task_info', {})
-                self.app.send_telegram_error_notification(
-                    task_name=task_info.get('task_name', 'Невідоме завдання'),
-                    lang_code=task_info.get('lang_code', 'N/A'),
-                    step=self.app._t('step_name_create_video'),
-                    error_details=f"Помилка FFmpeg (код {process.returncode}). Перевірте детальний лог."
+                    if current_time - last_update_time <= update_interval:
+                        return
+                    last_update_time = current_time
+                    current_frames = done_frames + sum(in_flight_frames.values())
+                    rendered_frames = current_frames - cached_frames
+                progress = min(100.0, current_frames / total_work_frames * 100) if total_work_frames > 0 else 0.0
+                # ETA за фактичною швидкістю цього чанка (враховує паралельні сегменти)
+                elapsed = current_time - render_start_time
+                eta = (total_work_frames - current_frames) * elapsed / rendered_frames if rendered_frames > 0 and elapsed > 0 else None
+                speed = f"{event.speed:.2f}x" if event.speed is not None else "N/A"
+                formatted_line = f"Прогрес: {progress:.1f}% | FPS: {event.fps or 'N/A'} | Швидкість: {speed}"
+                if eta is not None:
+                    formatted_line += f" | Залишилось: ~{format_duration(eta)}"
+                self.update_callback(formatted_line, task_key=task_key, chunk_index=chunk_index, progress=progress, eta=eta)
+
+            def finish_frames(run_id, frames, from_cache=False):
+                nonlocal done_frames, cached_frames
+                with progress_lock:
+                    in_flight_frames.pop(run_id, None)
+                    done_frames += frames
+                    if from_cache:
+                        cached_frames += frames
+
+            self.update_callback(f"Монтаж: '{video_name}' ({len(segments)} сегментів)...", task_key=task_key, chunk_index=chunk_index)
+            logger.info(f"Монтаж -> '{video_name}': {num_images} зображень, {len(segments)} сегментів, паралельно: {segment_workers}, потоків ffmpeg: {ffmpeg_threads or 'авто'}.")
+
+            def render_segment(seg_idx):
+                """Рендерить один сегмент або бере його з кешу. Повертає (шлях, помилка (код, stderr) або None, чи з кешу)."""
+                segment = segments[seg_idx]
+                cache_key = self._segment_cache_key(segment, image_hashes, prepared_paths, motion_types, transition_effect, transition_duration, output_framerate, segment_params, [output_width, output_height, supersample])
+                segment_path = os.path.join(clip_cache_dir, f"{cache_key}.mp4")
+                if os.path.exists(segment_path) and os.path.getsize(segment_path) > 0:
+                    os.utime(segment_path) # Оновлюємо час доступу для очищення кешу
+                    finish_frames(seg_idx, segment['frames'], from_cache=True)
+                    return segment_path, None, True
+
+                clips = [
+                    self._image_clip_stream(image_paths[i], prepared_paths[i], motion_types[i],
+                                            segment['offset'] if n == 0 else 0, segment['frames'],
+                                            output_width, output_height, output_framerate, supersample)
+                    for n, i in enumerate(segment['images'])
+                ]
+                if segment['kind'] == 'transition':
+                    stream = ffmpeg.filter(clips, 'xfade', transition=transition_effect, duration=transition_duration, offset=0)
+                else:
+                    stream = clips[0]
+
+                # Рендеримо у тимчасовий файл: паралельні чанки можуть рендерити той самий сегмент
+                tmp_segment_path = os.path.join(work_dir, f"{cache_key}.mp4")
+                output_kwargs = dict(segment_params, threads=ffmpeg_threads) if ffmpeg_threads else segment_params
+                returncode, stderr = self._run_ffmpeg(
+                    ffmpeg.output(stream, tmp_segment_path, vframes=segment['frames'], **output_kwargs), work_dir,
+                    lambda event: report_progress(event, seg_idx), threads=ffmpeg_threads
                 )
+                if returncode != 0:
+                    return None, (returncode, stderr), False
+                os.replace(tmp_segment_path, segment_path)
+                finish_frames(seg_idx, segment['frames'])
+                return segment_path, None, False
+
+            segment_paths = [None] * len(segments)
+            reused_segments = 0
+            segment_error = None
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, segment_workers)) as executor:
+                futures = {executor.submit(render_segment, i): i for i in range(len(segments))}
+                for future in concurrent.futures.as_completed(futures):
+                    path, error, from_cache = future.result()
+                    reused_segments += from_cache
+                    if error and not segment_error:
+                        segment_error = error
+                        # Решту сегментів не запускаємо: чанк однаково доведеться рендерити знову
+                        for pending in futures:
+                            pending.cancel()
+                    segment_paths[futures[future]] = path
+
+            if segment_error:
+                if self.cancel_token.is_cancelled:
+                    # ffmpeg завершено кнопкою зупинки: це не помилка рендеру, сповіщення не надсилаємо
+                    return False
+                self._report_ffmpeg_error('libx264', segment_error[0], segment_error[1], output_video_path, task_key, chunk_index)
+                return False
+
+            if reused_segments:
+                logger.info(f"Монтаж -> '{video_name}': {reused_segments}/{len(segments)} сегментів взято з кешу.")
 
-                self.update_callback(f"Помилка монтажу {os.path.basename(output_video_path)}. Див. лог.", task_key=task_key, chunk_index=chunk_index)
+            concat_list_path = os.path.join(work_dir, "segments.txt")
+            with open(concat_list_path, "w", encoding='utf-8') as f:
+                if still_slideshow:
+                    image_seconds = image_frames / output_framerate
+                    for file_path in prepared_paths:
+                        safe_path = file_path.replace("'", "'\\''")
+                        f.write(f"file '{safe_path}'\nduration {image_seconds:.6f}\n")
+                    # Демуксер ігнорує тривалість останнього файлу, якщо його не повторити
+                    f.write(f"file '{safe_path}'\n")
+                else:
+                    for file_path in segment_paths:
+                        safe_path = file_path.replace("'", "'\\''")
+                        f.write(f"file '{safe_path}'\n")
+
+            joined_video = ffmpeg.input(concat_list_path, format='concat', safe=0).video
+            if still_slideshow:
+                joined_video = joined_video.filter('fps', fps=output_framerate)
+            extra_streams = []
+            if include_audio:
+                extra_streams.append(ffmpeg.input(audio_path, vn=None))
+                output_params['acodec'] = 'aac'
+            soft_subs = cfg.get('subtitle_mode', 'burn') == 'soft' and ass_path
+            if soft_subs:
+                # М'які субтитри: ASS додається окремою доріжкою, libass не растеризує кожен кадр
+                extra_streams.append(ffmpeg.input(ass_path))
+                output_params.update(self._soft_subtitle_params())
+            output_params.update({'t': audio_duration, 'r': output_framerate})
+            # Потоки кодера з калібрування (x264_threads) мають пріоритет над розрахунком планувальника
+            if ffmpeg_threads and not output_params.get('threads'):
+                output_params['threads'] = ffmpeg_threads
+
+            # Усі формати беруть кадри з одного декодованого графа: split і окремі crop/scale/субтитри на гілку
+            profiles = profiles or []
+            branches = joined_video.split() if profiles else None
+            master_video = branches[0] if profiles else joined_video
+            if ass_path and not soft_subs:
+                master_video = master_video.filter('subtitles', filename=ass_path, force_style=f'Fontsize={cfg.get("font_size", 48)}')
+            outputs = [ffmpeg.output(master_video, *extra_streams, output_video_path, **output_params)]
+            for i, profile in enumerate(profiles, start=1):
+                profile_video = self._frame_for_profile(branches[i], profile)
+                if ass_path and not soft_subs:
+                    style = profile.get('subtitle_style') or f'Fontsize={cfg.get("font_size", 48)}'
+                    profile_video = profile_video.filter('subtitles', filename=ass_path, force_style=style)
+                outputs.append(ffmpeg.output(profile_video, *extra_streams, self.profile_output_path(output_video_path, profile), **self._profile_output_params(profile, output_params)))
+
+            self.update_callback(f"Монтаж: '{video_name}' з кодеком '{video_codec}'...", task_key=task_key, chunk_index=chunk_index)
+            profile_names = ", ".join(p.get('name', '?') for p in profiles)
+            logger.info(f"Монтаж -> Рендеринг '{video_name}' з кодеком '{video_codec}', якість '{tier['name']}' ({output_width}x{output_height}@{output_framerate}). Параметри: {output_params}"
+                        + (f". Додаткові формати: {profile_names}" if profiles else ""))
+
+            returncode, stderr = self._run_ffmpeg(
+                outputs[0] if len(outputs) == 1 else ffmpeg.merge_outputs(*outputs), work_dir, report_progress, threads=ffmpeg_threads
+            )
+            if returncode != 0:
+                if self.cancel_token.is_cancelled:
+                    return False
+                self._report_ffmpeg_error(video_codec, returncode, stderr, output_video_path, task_key, chunk_index)
                 return False
 
             logger.info(f"Монтаж -> УСПІХ: Відео успішно створено: {output_video_path}")
-            self.update_callback(f"Монтаж {video_name} завершено.", task_key=task_key, chunk_index=chunk_index, progress=100)
+            self.app.run_history.record_throughput('montage', self.history_key(quality), total_output_frames, time.time() - montage_start_time)
+            prune_cache_dir(clip_cache_dir, cfg.get('clip_cache_max_gb', 20) * 1024 ** 3)
+            prune_cache_dir(image_cache_dir, cfg.get('image_cache_max_gb', 5) * 1024 ** 3)
+            self.update_callback(f"Монтаж {video_name} завершено.", task_key=task_key, chunk_index=chunk_index, progress=100, eta=0)
             return True
 
         except Exception as e:
             logger.error(f"Монтаж -> КРИТИЧНА ПОМИЛКА: Непередбачена помилка під час створення відео '{video_name}': {e}", exc_info=True)
             self.update_callback(f"Критична помилка монтажу: {e}", task_key=task_key, chunk_index=chunk_index)
-            return False
\ No newline at end of file
+            return False
+        finally:
+            if work_dir and os.path.exists(work_dir):
+                shutil.rmtree(work_dir, ignore_errors=True)
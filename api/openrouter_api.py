@@ -1,16 +1,51 @@
 # api/openrouter_api.py
 
+import concurrent.futures
+import contextlib
 import logging
 import requests
-import time
+import threading
 import json
 
 # Імпортуємо конфігурацію, від якої залежить клас
 from constants.default_config import DEFAULT_CONFIG
+from api.retry_policy import RATE_LIMIT_STATUSES, RetryPolicy, RetryableError, TerminalError, current_deadline, deadline_scope, parse_retry_after, request_timeout
+from api.cancellation import OperationCancelled, cancellable_request, cancellation_scope, current_token
 
 # Отримуємо існуючий логер
 logger = logging.getLogger("TranslationApp")
 
+# Структурована відповідь для generate_cta_and_prompts
+CTA_AND_PROMPTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "call_to_action": {"type": "string"},
+        "image_prompts": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["call_to_action", "image_prompts"],
+    "additionalProperties": False
+}
+
+def parse_cta_and_prompts(raw_response):
+    """Розбирає та перевіряє JSON за CTA_AND_PROMPTS_SCHEMA. Повертає dict або None."""
+    text = raw_response.strip()
+    # Моделі без підтримки response_format часто загортають JSON у ```json ... ```
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or set(data) != set(CTA_AND_PROMPTS_SCHEMA["required"]):
+        return None
+    cta = data["call_to_action"]
+    prompts = data["image_prompts"]
+    if not isinstance(cta, str) or not cta.strip() or not isinstance(prompts, list):
+        return None
+    if not prompts or not all(isinstance(p, str) and p.strip() for p in prompts):
+        return None
+    return {"call_to_action": cta.strip(), "image_prompts": [p.strip() for p in prompts]}
+
 class OpenRouterAPI:
     def __init__(self, config):
         self.api_key = config["openrouter"]["api_key"]
@@ -26,6 +61,10 @@ class OpenRouterAPI:
         self.translation_params = config["openrouter"]["translation_params"]
         self.prompt_params = config["openrouter"]["prompt_params"]
         self.config = config
+        # Обмежує кількість одночасних запитів до OpenRouter з усіх потоків (сегменти перекладу, мови, CTA)
+        self.max_concurrent_requests = max(1, config["openrouter"].get("max_concurrent_requests", 4))
+        self._governor = threading.BoundedSemaphore(self.max_concurrent_requests)
+        self.retry_policy = RetryPolicy(config.get("retry_policy", {}))
 
     def test_connection(self):
         if not self.api_key:
@@ -81,12 +120,19 @@ class OpenRouterAPI:
             logger.error(f"OpenRouter -> Помилка мережі при отриманні балансу: {e}")
             return None
 
-    def call_model(self, model, messages, params, task_description=""):
+    def call_model(self, model, messages, params, task_description="", on_text=None):
+        """
+        Викликає модель і повертає текст відповіді.
+        Якщо передано on_text, відповідь читається потоком (SSE), а on_text(accumulated) отримує
+        весь текст, що надійшов на цей момент. Після повтору запиту текст починається з нуля.
+        """
         if not self.api_key:
             logger.error("OpenRouter -> Ключ API не встановлено.")
             return None
         
         payload = {"model": model, "messages": messages, **params}
+        if on_text:
+            payload["stream"] = True
         url = f"{self.base_url}/chat/completions"
         
         logger.info(f"OpenRouter -> {task_description}: Виклик моделі '{model}'...")
@@ -95,56 +141,222 @@ class OpenRouterAPI:
         payload_str = json.dumps(payload, indent=2, ensure_ascii=False)
         logger.debug(f"OpenRouter -> Пейлоад запиту:\n--- ПОЧАТОК ЗАПИТУ ---\n{payload_str}\n--- КІНЕЦЬ ЗАПИТУ ---")
 
-        retry_delay = 10 
-        while True:
-            try:
-                response = requests.post(url, headers=self.headers, json=payload, timeout=180)
-                
-                if response.status_code == 200:
-                    response_data = response.json()
-                    if 'choices' in response_data and len(response_data['choices']) > 0:
-                        message_content = response_data['choices'][0].get('message', {}).get('content')
-                        if message_content:
-                            logger.info(f"OpenRouter -> УСПІХ: Отримано відповідь від моделі '{model}'.")
-                            return message_content.strip()
-                    logger.error("OpenRouter -> ПОМИЛКА: Неочікувана структура відповіді.")
-                    return None
+        def attempt():
+            with self._governor:
+                response = cancellable_request("POST", url, headers=self.headers, json=payload, timeout=request_timeout(180), stream=bool(on_text))
+                message_content = self._read_stream(response, on_text) if response.status_code == 200 and on_text else None
+            
+            if response.status_code == 200 and on_text:
+                if message_content and message_content.strip():
+                    logger.info(f"OpenRouter -> УСПІХ: Отримано потокову відповідь від моделі '{model}'.")
+                    return message_content.strip()
+                logger.error("OpenRouter -> ПОМИЛКА: Потокова відповідь порожня.")
+                return None
 
-                elif response.status_code == 429 or response.status_code >= 500:
-                    error_type = "Перевищено ліміт запитів" if response.status_code == 429 else "Помилка сервера"
-                    logger.warning(f"OpenRouter -> {error_type} ({response.status_code}). Повторна спроба через {retry_delay}с...")
-                    time.sleep(retry_delay)
-                
-                else:
-                    logger.error(f"OpenRouter -> КРИТИЧНА ПОМИЛКА ({response.status_code}): {response.text}. Зупинка.")
-                    return None
+            elif response.status_code == 200:
+                response_data = response.json()
+                if 'choices' in response_data and len(response_data['choices']) > 0:
+                    message_content = response_data['choices'][0].get('message', {}).get('content')
+                    if message_content:
+                        logger.info(f"OpenRouter -> УСПІХ: Отримано відповідь від моделі '{model}'.")
+                        return message_content.strip()
+                logger.error("OpenRouter -> ПОМИЛКА: Неочікувана структура відповіді.")
+                return None
+
+            elif response.status_code == 429 or response.status_code >= 500:
+                error_type = "Перевищено ліміт запитів" if response.status_code == 429 else "Помилка сервера"
+                raise RetryableError(f"{error_type} ({response.status_code})", retry_after=parse_retry_after(response),
+                                     rate_limited=response.status_code in RATE_LIMIT_STATUSES)
+            
+            raise TerminalError(f"КРИТИЧНА ПОМИЛКА ({response.status_code}): {response.text}. Зупинка.")
+
+        return self.retry_policy.call("OpenRouter", attempt, task_description or model)
 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"OpenRouter -> Помилка мережі: {e}. Повторна спроба через {retry_delay}с...")
-                time.sleep(retry_delay)
+    def _read_stream(self, response, on_text):
+        """Збирає текст із SSE-відповіді chat/completions, повідомляючи on_text про кожен новий фрагмент."""
+        response.encoding = 'utf-8'
+        accumulated = ""
+        token = current_token()
+        # Зупинка черги закриває відповідь, щоб не чекати наступної події потоку
+        with response, (token.on_cancel(response.close) if token else contextlib.nullcontext()):
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if token is not None and token.is_cancelled:
+                        break
+                    # Порожні рядки розділяють події, рядки з ':' - коментарі-keepalive
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        event = json.loads(data)
+                    except json.JSONDecodeError:
+                        logger.warning(f"OpenRouter -> Пропущено некоректну подію потоку: {data[:100]}")
+                        continue
+                    if event.get('error'):
+                        # Помилка провайдера посеред потоку - повторюємо запит, як при 5xx
+                        raise requests.exceptions.RequestException(f"Помилка в потоці: {event['error']}")
+                    choices = event.get('choices') or [{}]
+                    delta = choices[0].get('delta', {}).get('content')
+                    if delta:
+                        accumulated += delta
+                        on_text(accumulated)
+            except Exception:
+                if token is None or not token.is_cancelled:
+                    raise
+            if token is not None and token.is_cancelled:
+                raise OperationCancelled("Потокову відповідь перервано: обробку зупинено")
+        return accumulated
 
-    def translate_text(self, text, model, params, target_language_name, custom_prompt_template=None):
+    def translate_text(self, text, model, params, target_language_name, custom_prompt_template=None, on_text=None):
         if custom_prompt_template:
             prompt_template = custom_prompt_template
         else:
             prompt_template = DEFAULT_CONFIG["default_prompts"]["translation"]
+
+        segment_cfg = self.config["openrouter"].get("segmented_translation", {})
+        if segment_cfg.get("enabled", True) and len(text) > segment_cfg.get("segment_chars", 3000) * 1.5:
+            return self._translate_segmented(text, model, params, target_language_name, prompt_template, segment_cfg, on_text)
         
         prompt = prompt_template.format(text=text, language=target_language_name)
         messages = [{"role": "user", "content": prompt}]
-        return self.call_model(model, messages, params, f"Translation to {target_language_name}")
+        return self.call_model(model, messages, self._translation_params(params, text), f"Translation to {target_language_name}", on_text=on_text)
 
-    def rewrite_text(self, text, model, params, custom_prompt_template):
+    @staticmethod
+    def _translation_params(params, text):
+        """Ліміт токенів - на весь переклад тексту (~2 символи на токен для нелатинських мов)."""
+        return {**params, "max_tokens": max(params.get("max_tokens", 0), len(text) // 2)}
+
+    def _translate_segmented(self, text, model, params, target_language_name, prompt_template, segment_cfg, on_text=None):
+        """
+        Map-reduce переклад довгого тексту: сегменти перекладаються паралельно зі спільним глосарієм
+        і контекстом сусідніх сегментів, а потім збираються в початковому порядку.
+        on_text отримує зібраний переклад щоразу, коли готовий наступний за порядком сегмент.
+        """
+        # utils імпортує цей модуль (openrouter_utils), тому імпорт - тут, а не на рівні модуля
+        from utils.file_utils import split_text_segments
+        segments = split_text_segments(text, segment_cfg.get("segment_chars", 3000))
+        context_chars = segment_cfg.get("context_chars", 300)
+        glossary = self._build_glossary(segments, model, target_language_name, segment_cfg) if segment_cfg.get("glossary", True) else ""
+        context_template = self.config.get("default_prompts", {}).get("translation_segment_context", DEFAULT_CONFIG["default_prompts"]["translation_segment_context"])
+        glossary_block = f"Use these translations of names and terms consistently:\n{glossary}\n\n" if glossary else ""
+        logger.info(f"OpenRouter -> Переклад на {target_language_name}: {len(segments)} сегментів, до {self.max_concurrent_requests} одночасно.")
+
+        deadline = current_deadline()
+        token = current_token()
+
+        def translate_segment(index):
+            with deadline_scope(deadline=deadline), cancellation_scope(token):
+                return translate_one(index)
+
+        def translate_one(index):
+            segment = segments[index][0]
+            context = context_template.format(
+                part=index + 1, total=len(segments), language=target_language_name, glossary=glossary_block,
+                before=segments[index - 1][0][-context_chars:] if index > 0 else "-",
+                after=segments[index + 1][0][:context_chars] if index + 1 < len(segments) else "-"
+            )
+            messages = [
+                {"role": "system", "content": context},
+                {"role": "user", "content": prompt_template.format(text=segment, language=target_language_name)}
+            ]
+            return self.call_model(model, messages, self._translation_params(params, segment), f"Translation to {target_language_name} ({index + 1}/{len(segments)})")
+
+        results = [None] * len(segments)
+        ready = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(segments), self.max_concurrent_requests)) as executor:
+            future_to_index = {executor.submit(translate_segment, i): i for i in range(len(segments))}
+            for future in concurrent.futures.as_completed(future_to_index):
+                index = future_to_index[future]
+                results[index] = future.result()
+                if not results[index]:
+                    logger.error(f"OpenRouter -> ПОМИЛКА: Сегмент {index + 1}/{len(segments)} не перекладено, переклад скасовано.")
+                    for pending in future_to_index:
+                        pending.cancel()
+                    return None
+                previously_ready = ready
+                while ready < len(segments) and results[ready]:
+                    ready += 1
+                if on_text and ready > previously_ready:
+                    on_text(self._join_segments(results[:ready], segments))
+
+        return self._join_segments(results, segments).strip()
+
+    @staticmethod
+    def _join_segments(translations, segments):
+        """Збирає перекладені сегменти з початковими розділювачами абзаців."""
+        return "".join(translation.strip() + separator for translation, (_, separator) in zip(translations, segments))
+
+    def _build_glossary(self, segments, model, target_language_name, segment_cfg):
+        """
+        Спільний для всіх сегментів список імен і термінів з перекладом (один короткий запит).
+        Глосарій будується з вибірки - початків усіх сегментів у межах glossary_sample_chars,
+        а запит обмежений glossary_timeout: без глосарію сегменти все одно перекладаються.
+        """
+        template = self.config.get("default_prompts", {}).get("translation_glossary", DEFAULT_CONFIG["default_prompts"]["translation_glossary"])
+        sample_chars = segment_cfg.get("glossary_sample_chars", 6000)
+        piece_chars = max(1, sample_chars // len(segments))
+        sample = "\n...\n".join(segment[:piece_chars] for segment, _ in segments)
+        messages = [{"role": "user", "content": template.format(text=sample, language=target_language_name)}]
+        with deadline_scope(seconds=segment_cfg.get("glossary_timeout", 60)):
+            glossary = self.call_model(model, messages, {"temperature": 0.2, "max_tokens": 800}, f"Glossary for {target_language_name}")
+        if not glossary:
+            logger.warning(f"OpenRouter -> Глосарій для {target_language_name} не отримано, сегменти перекладаються без нього.")
+        return glossary or ""
+
+    def rewrite_text(self, text, model, params, custom_prompt_template, on_text=None):
         prompt = custom_prompt_template.format(text=text)
         messages = [{"role": "user", "content": prompt}]
-        return self.call_model(model, messages, params, "Rewriting Text")
+        return self.call_model(model, messages, params, "Rewriting Text", on_text=on_text)
 
-    def generate_image_prompts(self, text, model, params, lang_name=""):
+    def generate_image_prompts(self, text, model, params, lang_name="", image_count=None):
+        """
+        image_count - бюджет зображень за тривалістю озвучки. Підставляється в {count} шаблону;
+        якщо шаблон його не містить, кількість додається окремою вимогою.
+        """
         prompt_template = self.config.get("default_prompts", {}).get("image_prompt_generation", DEFAULT_CONFIG["default_prompts"]["image_prompt_generation"])
-        prompt = prompt_template.format(text=text)
+        prompt = prompt_template.format(text=text, count=image_count or 3)
+        if image_count:
+            if "{count}" not in prompt_template:
+                prompt += f"\n\nGenerate exactly {image_count} prompts."
+            # ~100 токенів на промпт, щоб довгий список не обрізався max_tokens
+            params = dict(params, max_tokens=max(params.get("max_tokens", 0), image_count * 100))
         messages = [{"role": "user", "content": prompt}]
         task_desc = f"Генерація промптів зображень ({lang_name})"
         return self.call_model(model, messages, params, task_desc)
 
+    def generate_cta_and_prompts(self, text, model, params, lang_name="", image_count=None):
+        """
+        Один запит замість двох: заклик до дії та список промптів зображень у JSON за схемою
+        CTA_AND_PROMPTS_SCHEMA. Інструкції беруться з тих самих шаблонів, що й для окремих запитів.
+        Повертає {'call_to_action': str, 'image_prompts': [str, ...]} або None, якщо модель не
+        повернула валідний JSON - тоді викликач переходить на окремі запити.
+        """
+        prompts = self.config.get("default_prompts", {})
+        placeholder = "the TEXT given at the end"
+        cta_task = prompts.get("call_to_action", DEFAULT_CONFIG["default_prompts"]["call_to_action"]).format(text=placeholder)
+        prompts_task = prompts.get("image_prompt_generation", DEFAULT_CONFIG["default_prompts"]["image_prompt_generation"]).format(text=placeholder, count=image_count or 3)
+        if image_count:
+            prompts_task += f"\nGenerate exactly {image_count} prompts."
+        combined_template = prompts.get("combined_cta_prompts", DEFAULT_CONFIG["default_prompts"]["combined_cta_prompts"])
+        messages = [{"role": "user", "content": combined_template.format(cta_task=cta_task, prompts_task=prompts_task, text=text)}]
+
+        params = dict(params, response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "cta_and_prompts", "strict": True, "schema": CTA_AND_PROMPTS_SCHEMA}
+        })
+        # ~100 токенів на промпт плюс заклик до дії
+        params["max_tokens"] = max(params.get("max_tokens", 0), (image_count or 3) * 100 + 200)
+        raw_response = self.call_model(model, messages, params, f"Заклик до дії та промпти зображень ({lang_name})")
+        if not raw_response:
+            return None
+
+        result = parse_cta_and_prompts(raw_response)
+        if result is None:
+            logger.warning(f"OpenRouter -> Відповідь не відповідає схемі заклику до дії та промптів ({lang_name}): {raw_response[:200]}")
+        return result
+
     def generate_call_to_action(self, text, model, params, lang_name=""):
         prompt_template = self.config.get("default_prompts", {}).get("call_to_action", DEFAULT_CONFIG["default_prompts"]["call_to_action"])
         prompt = prompt_template.format(text=text)
@@ -0,0 +1,256 @@
+# api/retry_policy.py
+
+import contextlib
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from api.cancellation import OperationCancelled, current_token
+
+logger = logging.getLogger("TranslationApp")
+
+# Типові значення; перевизначаються секцією "retry_policy" конфігурації
+DEFAULT_RETRY_SETTINGS = {
+    "base_delay": 2.0,
+    "max_delay": 60.0,
+    "max_attempts": 8,
+    "breaker_failure_threshold": 5,
+    "breaker_reset_seconds": 120
+}
+
+# Ліміт запитів і нестача квоти: провайдер працює, тож ці відповіді лише відкладають повтор, а не відкривають запобіжник
+RATE_LIMIT_STATUSES = (402, 429)
+
+_local = threading.local()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class RetryableError(Exception):
+    """
+    Тимчасова помилка провайдера (429, 5xx тощо): спробу варто повторити.
+    rate_limited позначає ліміт запитів або квоти (RATE_LIMIT_STATUSES): така відповідь не рахується запобіжником.
+    """
+    def __init__(self, message, retry_after=None, rate_limited=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+class TerminalError(Exception):
+    """
+    Остаточна відповідь провайдера (400, 401 тощо): повтор не допоможе, виклик повертає result.
+    provider_failure=False позначає відповідь, що не свідчить про збій провайдера (наприклад, завдання не знайдено):
+    запобіжник її не рахує.
+    """
+    def __init__(self, message, result=None, provider_failure=True):
+        super().__init__(message)
+        self.result = result
+        self.provider_failure = provider_failure
+
+
+class Deadline:
+    """Момент, після якого виклики провайдерів більше не повторюються."""
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def current_deadline():
+    """Дедлайн, встановлений для поточного потоку через deadline_scope, або None."""
+    return getattr(_local, 'deadline', None)
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds=None, deadline=None):
+    """
+    Встановлює дедлайн для всіх викликів провайдерів у цьому потоці.
+    Вкладений дедлайн не може бути пізнішим за зовнішній. Щоб передати дедлайн
+    у інший потік, передайте туди об'єкт current_deadline() як deadline=.
+    """
+    previous = current_deadline()
+    scoped = deadline if deadline is not None else (Deadline(seconds) if seconds else None)
+    if previous is not None and (scoped is None or previous.remaining() < scoped.remaining()):
+        scoped = previous
+    _local.deadline = scoped
+    try:
+        yield scoped
+    finally:
+        _local.deadline = previous
+
+
+def request_timeout(default: float) -> float:
+    """Таймаут HTTP-запиту, що не виходить за межі дедлайну поточного потоку."""
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    return max(1.0, min(default, deadline.remaining()))
+
+
+def parse_retry_after(response):
+    """Значення заголовка Retry-After у секундах (число або HTTP-дата) або None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Запобіжник провайдера. Після failure_threshold тимчасових помилок поспіль відкривається,
+    і виклики одразу повертають помилку, не займаючи воркери. Через reset_seconds пропускає
+    один пробний виклик: успіх закриває запобіжник, помилка відкриває його знову.
+    """
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info(f"{self.name} -> Запобіжник: пробний запит після {self.reset_seconds:.0f}с паузи.")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"{self.name} -> Запобіжник закрито, провайдер знову відповідає.")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_neutral(self):
+        """Ліміт запитів чи відсутнє завдання не є ні збоєм, ні відновленням провайдера: лічильник не змінюється, пробний запит звільняється."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning(f"{self.name} -> Запобіжник відкрито після {self._failures} помилок поспіль. "
+                               f"Запити не надсилатимуться {self.reset_seconds:.0f}с.")
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+def get_circuit_breaker(provider: str, settings: dict = None) -> CircuitBreaker:
+    """Спільний для всього процесу запобіжник провайдера (переживає перестворення API-об'єктів)."""
+    settings = {**DEFAULT_RETRY_SETTINGS, **(settings or {})}
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider, settings["breaker_failure_threshold"], settings["breaker_reset_seconds"])
+        else:
+            breaker.failure_threshold = settings["breaker_failure_threshold"]
+            breaker.reset_seconds = settings["breaker_reset_seconds"]
+        return breaker
+
+
+def is_circuit_open(provider: str) -> bool:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+    return breaker is not None and breaker.is_open
+
+
+class RetryPolicy:
+    """Експоненційна затримка з jitter, Retry-After, обмеження спроб і дедлайн потоку."""
+    def __init__(self, settings: dict = None):
+        self.settings = {**DEFAULT_RETRY_SETTINGS, **(settings or {})}
+        self.base_delay = self.settings["base_delay"]
+        self.max_delay = self.settings["max_delay"]
+        self.max_attempts = self.settings["max_attempts"]
+
+    def delay(self, attempt: int, retry_after=None) -> float:
+        if retry_after is not None:
+            return retry_after
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        # "Equal jitter": половина затримки фіксована, половина випадкова, щоб воркери не повторювали синхронно
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def call(self, provider: str, attempt, description: str, default=None):
+        """
+        Виконує attempt() з повторами. attempt повертає результат успішної (2xx) відповіді, кидає TerminalError
+        на остаточну помилку чи RetryableError / requests.RequestException, щоб спробувати ще раз.
+        Запобіжник закривається лише успішними відповідями; остаточні помилки рахуються як збої.
+        Якщо спроби, дедлайн або запобіжник провайдера не дозволяють продовжити, повертає default.
+        Зупинка черги (токен cancellation_scope) перериває і запит, і паузу між спробами.
+        """
+        breaker = get_circuit_breaker(provider, self.settings)
+        token = current_token()
+        attempt_num = 0
+        while True:
+            if token is not None and token.is_cancelled:
+                logger.info(f"{provider} -> {description}: обробку зупинено, запит скасовано.")
+                return default
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired:
+                logger.error(f"{provider} -> {description}: дедлайн вичерпано, запит скасовано.")
+                return default
+            if not breaker.allow():
+                logger.warning(f"{provider} -> {description}: запобіжник відкрито, провайдер вважається недоступним.")
+                return default
+            try:
+                result = attempt()
+                breaker.record_success()
+                return result
+            except OperationCancelled:
+                logger.info(f"{provider} -> {description}: обробку зупинено, запит перервано.")
+                return default
+            except TerminalError as e:
+                if e.provider_failure:
+                    breaker.record_failure()
+                    logger.error(f"{provider} -> {description}: {e}")
+                else:
+                    breaker.record_neutral()
+                    logger.warning(f"{provider} -> {description}: {e}")
+                return default if e.result is None else e.result
+            except (RetryableError, requests.exceptions.RequestException) as e:
+                if getattr(e, 'rate_limited', False):
+                    breaker.record_neutral()
+                else:
+                    breaker.record_failure()
+                attempt_num += 1
+                if self.max_attempts and attempt_num >= self.max_attempts:
+                    logger.error(f"{provider} -> {description}: {e}. Вичерпано {attempt_num} спроб.")
+                    return default
+                delay = self.delay(attempt_num, getattr(e, 'retry_after', None))
+                if deadline is not None and deadline.remaining() < delay:
+                    logger.error(f"{provider} -> {description}: {e}. До дедлайну лишилось {max(0.0, deadline.remaining()):.0f}с, повтори припинено.")
+                    return default
+                logger.warning(f"{provider} -> {description}: {e}. Повторна спроба {attempt_num + 1} через {delay:.1f}с...")
+                if token is not None:
+                    token.wait(delay)
+                else:
+                    time.sleep(delay)
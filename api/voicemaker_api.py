@@ -8,6 +8,8 @@ from typing import Dict, Optional, Tuple
 
 # Імпортуємо словник з голосами з папки constants
 from constants.voicemaker_voices import VOICEMAKER_VOICES
+from api.retry_policy import RATE_LIMIT_STATUSES, RetryPolicy, RetryableError, parse_retry_after, request_timeout
+from api.cancellation import cancellable_request
 
 # Отримуємо існуючий логер
 logger = logging.getLogger("TranslationApp")
@@ -23,6 +25,7 @@ class VoiceMakerAPI:
         # Для асинхронної обробки
         self.pending_tasks: Dict[str, dict] = {}  # task_id -> task_info
         self.completed_tasks: Dict[str, dict] = {}  # task_id -> result_info
+        self.retry_policy = RetryPolicy(config.get("retry_policy", {}))
 
     def get_balance(self):
         if not self.api_key:
@@ -65,25 +68,20 @@ class VoiceMakerAPI:
         text = text.replace('—', '-').replace('…', '...').replace('«', '"').replace('»', '"')
         payload = {"Engine": engine, "VoiceId": voice_id, "LanguageCode": language_code, "Text": text, "OutputFormat": "mp3", "SampleRate": "48000"}
         
-        retry_delay = 10
-        response_data = None
-
-        while response_data is None:
-            try:
-                response = requests.post(self.base_url, headers=self.headers, json=payload, timeout=180)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("success"):
-                        response_data = data
-                    else:
-                        logger.error(f"VoiceMaker -> КРИТИЧНА ПОМИЛКА: Не вдалося перетворити текст: {data.get('message')}. Зупинка.")
-                        return False, None
-                else:
-                    logger.warning(f"VoiceMaker -> Помилка API при генерації ({response.status_code}). Повторна спроба через {retry_delay}с...")
-                    time.sleep(retry_delay)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"VoiceMaker -> ПОМИЛКА: Запит на отримання URL не вдався: {e}. Повторна спроба через {retry_delay}с...")
-                time.sleep(retry_delay)
+        def request_audio():
+            response = cancellable_request("POST", self.base_url, headers=self.headers, json=payload, timeout=request_timeout(180))
+            if response.status_code == 200:
+                data = response.json()
+                if data.get("success"):
+                    return data
+                logger.error(f"VoiceMaker -> КРИТИЧНА ПОМИЛКА: Не вдалося перетворити текст: {data.get('message')}. Зупинка.")
+                return None
+            raise RetryableError(f"Помилка API при генерації ({response.status_code})", retry_after=parse_retry_after(response),
+                                 rate_limited=response.status_code in RATE_LIMIT_STATUSES)
+
+        response_data = self.retry_policy.call("VoiceMaker", request_audio, "Генерація аудіо")
+        if not response_data:
+            return False, None
         
         audio_url = response_data.get("path")
         if not audio_url:
@@ -91,20 +89,23 @@ class VoiceMakerAPI:
             return False, None
 
         logger.info("VoiceMaker -> URL отримано, починається завантаження файлу...")
-        while True:
-            try:
-                audio_response = requests.get(audio_url, timeout=180)
-                if audio_response.status_code == 200:
-                    with open(output_path, 'wb') as f:
-                        f.write(audio_response.content)
-                    logger.info(f"VoiceMaker -> УСПІХ: Аудіо успішно збережено в {output_path}")
-                    return True, response_data.get("remainChars")
-                else:
-                    logger.warning(f"VoiceMaker -> Не вдалося завантажити аудіофайл ({audio_response.status_code}). Повторна спроба через {retry_delay}с...")
-                    time.sleep(retry_delay)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"VoiceMaker -> ПОМИЛКА: Запит на завантаження не вдався: {e}. Повторна спроба через {retry_delay}с...")
-                time.sleep(retry_delay)
+        if self._download_file(audio_url, output_path, "Завантаження аудіофайлу"):
+            logger.info(f"VoiceMaker -> УСПІХ: Аудіо успішно збережено в {output_path}")
+            return True, response_data.get("remainChars")
+        return False, None
+
+    def _download_file(self, audio_url, output_path, description):
+        """Завантажує готовий аудіофайл з повторами за спільною політикою."""
+        def attempt():
+            audio_response = cancellable_request("GET", audio_url, timeout=request_timeout(180))
+            if audio_response.status_code == 200:
+                with open(output_path, 'wb') as f:
+                    f.write(audio_response.content)
+                return True
+            raise RetryableError(f"Не вдалося завантажити аудіофайл ({audio_response.status_code})", retry_after=parse_retry_after(audio_response),
+                                 rate_limited=audio_response.status_code in RATE_LIMIT_STATUSES)
+
+        return self.retry_policy.call("VoiceMaker", attempt, description, default=False)
 
     def create_audio_task_async(self, text: str, voice_id: str, engine: str, language_code: str, chunk_index: int) -> Optional[str]:
         """
@@ -201,29 +202,17 @@ class VoiceMakerAPI:
             logger.error(f"VoiceMaker -> Відсутній URL для завдання {task_id}")
             return False, None
 
-        retry_delay = 10
         logger.info(f"VoiceMaker -> Початок завантаження {task_id}...")
+        if not self._download_file(audio_url, output_path, f"Завантаження {task_id}"):
+            return False, None
+
+        remain_chars = task_info.get("remain_chars")
         
-        while True:
-            try:
-                audio_response = requests.get(audio_url, timeout=180)
-                if audio_response.status_code == 200:
-                    with open(output_path, 'wb') as f:
-                        f.write(audio_response.content)
-                    
-                    remain_chars = task_info.get("remain_chars")
-                    
-                    # Переміщуємо в completed_tasks і видаляємо з pending
-                    self.completed_tasks[task_id] = self.pending_tasks.pop(task_id)
-                    
-                    logger.info(f"VoiceMaker -> УСПІХ: Завдання {task_id} завантажено в {output_path}")
-                    return True, remain_chars
-                else:
-                    logger.warning(f"VoiceMaker -> Не вдалося завантажити {task_id} ({audio_response.status_code}). Повторна спроба через {retry_delay}с...")
-                    time.sleep(retry_delay)
-            except requests.exceptions.RequestException as e:
-                logger.error(f"VoiceMaker -> ПОМИЛКА завантаження {task_id}: {e}. Повторна спроба через {retry_delay}с...")
-                time.sleep(retry_delay)
+        # Переміщуємо в completed_tasks і видаляємо з pending
+        self.completed_tasks[task_id] = self.pending_tasks.pop(task_id)
+        
+        logger.info(f"VoiceMaker -> УСПІХ: Завдання {task_id} завантажено в {output_path}")
+        return True, remain_chars
 
     def get_task_status(self, task_id: str) -> str:
         """Повертає статус завдання: 'pending', 'ready', 'error', 'completed', або 'not_found'."""
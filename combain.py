@@ -16,6 +16,7 @@ import contextlib
 import subprocess
 import ctypes
 import concurrent.futures
+import multiprocessing
 import shutil
 import numpy as np
 import queue
@@ -43,6 +44,9 @@ from api.firebase_api import FirebaseAPI
 
 # Core modules
 from core.workflow import WorkflowManager
+from core.whisper_manager import WhisperModelManager
+from utils.history_utils import RunHistory, format_duration
+from utils.estimate_utils import estimate_queue
 
 # GUI modules
 from gui.task_tab import create_task_tab
@@ -171,6 +175,8 @@ class TranslationApp:
         self.tg_api = TelegramAPI(self.config)
         self.firebase_api = FirebaseAPI(self.config)
         self.speechify_api = SpeechifyAPI(self.config)
+        self.whisper_manager = WhisperModelManager(self.config)
+        self.run_history = RunHistory()
         self.montage_api = MontageAPI(self.config, self, self.update_progress_for_montage)
         self.workflow_manager = WorkflowManager(self)
 
@@ -225,6 +231,7 @@ class TranslationApp:
         
         # Сховище для прогресу відео-чанків
         self.video_chunk_progress = {}
+        self.video_chunk_eta = {}
         self.video_progress_lock = threading.Lock()
         
         # Task status tracking for reports
@@ -477,6 +484,8 @@ class TranslationApp:
         # Зупиняємо аудіо воркер пул
         if hasattr(self, 'workflow_manager') and self.workflow_manager:
             self.workflow_manager.shutdown()
+        if hasattr(self, 'whisper_manager'):
+            self.whisper_manager.unload()
 
         if "ui_settings" not in self.config:
             self.config["ui_settings"] = {}
@@ -979,17 +988,47 @@ class TranslationApp:
         if not self.task_queue:
             messagebox.showinfo(self._t('queue_title'), self._t('info_queue_empty'))
             return
+        if self.config.get("ui_settings", {}).get("show_queue_estimate", True) and not self._confirm_queue_estimate():
+            return
         
         self.is_processing_queue = True
         
         if hasattr(self, 'pause_resume_button'):
             self.pause_resume_button.config(state="normal")
+        if hasattr(self, 'stop_queue_button'):
+            self.stop_queue_button.config(state="normal")
         
         # Запускаємо обробку єдиної черги
         thread = threading.Thread(target=self.workflow_manager.process_unified_queue, args=(self.task_queue,))
         thread.daemon = True
         thread.start()
 
+    def _confirm_queue_estimate(self):
+        """Показує оцінку часу та витрат черги (за історією запусків) і питає, чи запускати обробку."""
+        try:
+            estimate = estimate_queue(self, self.task_queue)
+        except Exception as e:
+            logger.warning(f"Оцінка черги -> Не вдалося оцінити чергу: {e}", exc_info=True)
+            return True
+
+        lines = [self._t('queue_estimate_summary', time=format_duration(estimate['total_seconds']),
+                         el_chars=estimate['elevenlabs_chars'], googler_images=estimate['googler_images']), ""]
+        for item in estimate['items']:
+            lines.append(self._t('queue_estimate_task_line', task=item['task_name'], lang=item['lang'].upper(),
+                                 time=format_duration(item['seconds']), chars=item['chars'], images=item['images']))
+        flagged = set()
+        for flag in estimate['flags']:
+            if (flag['type'], flag['task_name'], flag['lang']) in flagged:
+                continue
+            flagged.add((flag['type'], flag['task_name'], flag['lang']))
+            lines.append(self._t(f"queue_estimate_flag_{flag['type']}", task=flag['task_name'], lang=flag['lang'].upper(), limit=flag['limit']))
+        if estimate['defaults_used']:
+            lines.append(self._t('queue_estimate_no_history'))
+        lines.extend(["", self._t('queue_estimate_confirm')])
+
+        logger.info("Оцінка черги -> " + " | ".join(line for line in lines[:-1] if line))
+        return messagebox.askyesno(self._t('queue_estimate_title'), "\n".join(lines))
+
     def setup_empty_gallery(self, queue_type, tasks_to_display):
         if queue_type == 'main': 
             gallery_parent_frame = self.chain_image_gallery_frame
@@ -1105,8 +1144,8 @@ class TranslationApp:
             logger.error(f"Could not load image {image_path}: {e}")
 
     def _check_app_state(self):
-        """Перевіряє, чи не зупинено програму. Повертає False, якщо треба зупинити потік."""
-        if self.shutdown_event.is_set():
+        """Перевіряє, чи не зупинено програму або чергу. Повертає False, якщо треба зупинити потік."""
+        if self.shutdown_event.is_set() or self.workflow_manager.cancel_token.is_cancelled:
             return False
         
         if not self.pause_event.is_set():
@@ -1114,7 +1153,7 @@ class TranslationApp:
             queue_type = 'rewrite' if self.is_processing_rewrite_queue else 'main'
             self.update_progress(self._t('status_paused'), queue_type=queue_type)
             self.pause_event.wait()
-            if self.shutdown_event.is_set(): # Перевіряємо знову після паузи
+            if self.shutdown_event.is_set() or self.workflow_manager.cancel_token.is_cancelled: # Перевіряємо знову після паузи
                 return False
             # Не відновлюємо попередній текст
         return True
@@ -1617,6 +1656,19 @@ class TranslationApp:
             self.pause_event.set()
             logger.info("Resuming process.")
 
+    def stop_queue(self):
+        """Зупиняє обробку черги: поточні рендери, транскрипція та запити перериваються, завдання лишаються в черзі."""
+        if not self.is_processing_queue:
+            return
+        logger.info("Stop requested. Cancelling in-flight ffmpeg, transcription and API requests.")
+        self.update_progress(self._t('status_stopping'))
+        if hasattr(self, 'stop_queue_button'):
+            self.stop_queue_button.config(state="disabled")
+        self.workflow_manager.cancel()
+        # Знімаємо блокування паузи та контролю зображень, щоб потоки обробки побачили зупинку
+        self.pause_event.set()
+        self.image_control_active.set()
+
     def edit_task_name(self, event):
         item_id = self.queue_tree.identify_row(event.y)
         if not item_id or not item_id.startswith("task_"):
@@ -1693,6 +1745,8 @@ class TranslationApp:
                         'transition_effect': self.montage_transition_var.get(),
                         'font_size': self.montage_font_size_var.get(),
                         'output_framerate': self.montage_output_framerate_var.get(),
+                        'quality_tier': self.montage_preview_quality_tier_var.get(),
+                        'quality_tiers': self.config.get('montage', {}).get('quality_tiers'),
                         'codec': {
                             'video_codec': self.codec_video_codec_var.get(),
                             'x264_crf': self.codec_x264_crf_var.get(),
@@ -1727,6 +1781,39 @@ class TranslationApp:
 
         threading.Thread(target=preview_thread, daemon=True).start()
 
+    def _calibrate_encoder(self):
+        """Запускає калібрування libx264 у фоні та зберігає найкращу комбінацію в налаштування кодека."""
+        if not messagebox.askyesno(self._t('calibrate_encoder_button'), self._t('calibration_confirm_message')):
+            return
+
+        def calibration_thread():
+            try:
+                def on_step(n, total, preset, threads, crf):
+                    self.root.after(0, lambda: self.calibrate_encoder_button.config(state="disabled", text=f"{self._t('calibration_running_label')} {n}/{total}"))
+
+                best, results = self.montage_api.calibrate_encoder(on_step)
+                if not best:
+                    self.root.after(0, lambda: messagebox.showerror(self._t('error_title'), self._t('calibration_failed_message')))
+                    return
+
+                codec_cfg = self.config.setdefault('montage', {}).setdefault('codec', {})
+                codec_cfg['x264_preset'] = best['preset']
+                codec_cfg['x264_threads'] = best['threads']
+                codec_cfg['x264_crf'] = best['crf']
+                save_config(self.config)
+                logger.info(f"Калібрування -> Обрано preset={best['preset']}, threads={best['threads'] or 'авто'}, crf={best['crf']} ({best['fps']:.1f} fps).")
+
+                def show_result():
+                    self.codec_x264_crf_var.set(best['crf'])
+                    messagebox.showinfo(self._t('calibration_result_title'), self._t(
+                        'calibration_result_message', preset=best['preset'], threads=best['threads'] or 'auto',
+                        crf=best['crf'], fps=f"{best['fps']:.1f}", size=f"{best['size_mb']:.2f}", tested=len(results)))
+                self.root.after(0, show_result)
+            finally:
+                self.root.after(0, lambda: self.calibrate_encoder_button.config(state="normal", text=self._t('calibrate_encoder_button')))
+
+        threading.Thread(target=calibration_thread, daemon=True).start()
+
     def continue_processing_after_image_control(self):
         logger.info("Continue button pressed. Resuming final video processing. Gallery remains visible.")
         
@@ -2669,7 +2756,7 @@ class TranslationApp:
             
             if len(video_chunk_paths) == len(final_audio_chunks):
                 final_video_path = os.path.join(lang_output_path, f"video_{sanitize_filename(video_title)}_{lang_code}.mp4")
-                if concatenate_videos(self, sorted(video_chunk_paths), final_video_path):
+                if concatenate_videos(self, sorted(video_chunk_paths), final_video_path, final_audio_chunks):
                     logger.info(f"Successfully created final video: {final_video_path}")
                     self._send_telegram_notification('create_video', lang_name, task_num, total_tasks)
             
@@ -2703,13 +2790,36 @@ class TranslationApp:
         """Очищає зображення Firebase."""
         clear_firebase_images(self)\
     
-    def update_progress_for_montage(self, message, task_key=None, chunk_index=None, progress=None):
-        logger.info(f"{message}")
+    def update_progress_for_montage(self, message, task_key=None, chunk_index=None, progress=None, eta=None):
+        # Проміжний прогрес приходить кілька разів на секунду, тому пишеться лише в детальний лог
+        if progress is not None and 0 < progress < 100:
+            logger.debug(message)
+        else:
+            logger.info(message)
         if task_key is not None and chunk_index is not None and progress is not None:
             with self.video_progress_lock:
                 if task_key not in self.video_chunk_progress:
                     self.video_chunk_progress[task_key] = {}
                 self.video_chunk_progress[task_key][chunk_index] = progress
+                if eta is not None:
+                    self.video_chunk_eta.setdefault(task_key, {})[chunk_index] = eta
+
+    def get_montage_eta(self, task_key):
+        """
+        Орієнтовний час до завершення монтажу (завдання, мова) у секундах або None.
+        Чанки рендеряться паралельно, тож завдання закінчиться разом з найповільнішим чанком.
+        """
+        with self.video_progress_lock:
+            etas = [eta for chunk, eta in self.video_chunk_eta.get(task_key, {}).items()
+                    if self.video_chunk_progress.get(task_key, {}).get(chunk, 0) < 100]
+        return max(etas) if etas else None
+
+    def get_active_montage_etas(self):
+        """Список (task_key, ETA у секундах) для всіх завдань, монтаж яких ще триває."""
+        with self.video_progress_lock:
+            task_keys = list(self.video_chunk_eta.keys())
+        etas = [(task_key, self.get_montage_eta(task_key)) for task_key in task_keys]
+        return [(task_key, eta) for task_key, eta in etas if eta is not None]
 
     def start_periodic_progress_update(self):
         """Запускає таймер для періодичного оновлення GUI."""
@@ -2788,6 +2898,7 @@ class TranslationApp:
             
             # Перевіряємо поточний прогрес з video_chunk_progress як резервний варіант
             task_key_tuple = (task_index, lang_code)
+            avg_progress = None
             with self.video_progress_lock:
                 if task_key_tuple in self.video_chunk_progress:
                     progress_dict = self.video_chunk_progress[task_key_tuple]
@@ -2795,7 +2906,11 @@ class TranslationApp:
                         valid_progress_values = [v for v in progress_dict.values() if isinstance(v, (int, float))]
                         if valid_progress_values:
                             avg_progress = sum(valid_progress_values) / len(valid_progress_values)
-                            return f"{avg_progress:.1f}%"
+            if avg_progress is not None:
+                eta = self.get_montage_eta(task_key_tuple)
+                if eta:
+                    return f"{avg_progress:.1f}% (~{format_duration(eta)})"
+                return f"{avg_progress:.1f}%"
             
             # Якщо немає прогресу в video_chunk_progress, повертаємо статус як є
             return status
@@ -2834,6 +2949,9 @@ if __name__ == "__main__":
     - Firebase integration for remote control
     - Telegram notifications and reporting
     """
+    # Потрібно для ProcessPoolExecutor у зібраному EXE (шардована транскрипція)
+    multiprocessing.freeze_support()
+
     # Configure Windows console for UTF-8 support
     if sys.platform == 'win32':
         console_window = ctypes.windll.kernel32.GetConsoleWindow()
@@ -17,7 +17,11 @@ os.makedirs(LOGS_DIR, exist_ok=True)
 current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 DETAILED_LOG_FILE = os.path.join(LOGS_DIR, f"log_{current_time}.txt")
 
+# --- Кеш проміжних файлів (підготовлені зображення, кліпи монтажу) ---
+CACHE_DIR = os.path.join(APP_BASE_PATH, "cache")
+
 # --- Конфігурація ---
 CONFIG_FILE = os.path.join(APP_BASE_PATH, "config.json")
 TRANSLATIONS_FILE = os.path.join(APP_BASE_PATH, "translations.json")
+RUN_HISTORY_FILE = os.path.join(APP_BASE_PATH, "run_history.json")
 SPEECHIFY_CHAR_LIMIT = 19000 # Ліміт символів для Speechify, трохи менше 20000
\ No newline at end of file
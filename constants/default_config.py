@@ -16,7 +16,18 @@ DEFAULT_CONFIG = {
         "translation_params": {"temperature": 0.7, "max_tokens": 1000},
         "prompt_params": {"temperature": 0.8, "max_tokens": 500},
         "cta_params": {"temperature": 0.7, "max_tokens": 200},
-        "rewrite_params": {"temperature": 0.7, "max_tokens": 4000}
+        "rewrite_params": {"temperature": 0.7, "max_tokens": 4000},
+        "streaming_enabled": False,
+        "combined_cta_prompts": False,
+        "max_concurrent_requests": 4,
+        "segmented_translation": {
+            "enabled": True,
+            "segment_chars": 3000,
+            "context_chars": 300,
+            "glossary": True,
+            "glossary_sample_chars": 6000,
+            "glossary_timeout": 60
+        }
     },
     "pollinations": {
         "token": "",
@@ -81,6 +92,8 @@ DEFAULT_CONFIG = {
     "parallel_processing": {
         "enabled": True,
         "num_chunks": 3,
+        "montage_workers": 0,
+        "ffmpeg_threads": 0,
         "keep_temp_files": False
     },
     "rewrite_settings": {
@@ -90,6 +103,14 @@ DEFAULT_CONFIG = {
     "montage": {
         "whisper_backend": "standard",
         "whisper_model": "base",
+        "transcription_shard_seconds": 300,
+        "transcription_shard_overlap": 2.0,
+        "transcription_workers": 2,
+        "whisper_idle_unload_seconds": 300,
+        "vad_enabled": True,
+        "vad_threshold_db": -35.0,
+        "vad_min_silence": 0.5,
+        "vad_padding": 0.25,
         "amd_whisper_use_gpu": True,
         "amd_whisper_threads": 4,
         "ffmpeg_path": "",
@@ -101,10 +122,45 @@ DEFAULT_CONFIG = {
         "zoom_speed": 1.0,
         "transition_effect": "fade",
         "font_size": 48,
+        "subtitle_mode": "burn",
+        "soft_subtitle_container": "mkv",
+        "soft_subtitle_burned_copy": False,
+        "image_budget_enabled": True,
+        "image_budget_seconds_per_image": 8.0,
+        "image_budget_min": 3,
+        "image_budget_max": 300,
+        "output_profiles_enabled": False,
+        "output_profiles": [
+            {"name": "shorts", "suffix": "shorts", "width": 1080, "height": 1920, "framing": "crop",
+             "vcodec": None, "bitrate": None, "crf": None, "subtitle_style": "Fontsize=36,MarginV=120"}
+        ],
         "output_framerate": 30,
+        "clip_cache_max_gb": 20,
+        "image_cache_max_gb": 5,
+        # auto - як до підготовки зображень (рух: розтягнути, статика: з полями); crop - обрізати; fit - з полями
+        "image_framing": "auto",
+        "quality_tier": "final",
+        "preview_quality_tier": "draft",
+        # Рівні якості рендеру; None = брати значення з основних налаштувань монтажу/кодека
+        "quality_tiers": {
+            "draft": {"width": 960, "height": 540, "supersample": 1, "fps": 24,
+                      "segment_preset": "ultrafast", "segment_crf": 28, "preset": "ultrafast", "crf": 30},
+            "final": {"width": 1920, "height": 1080, "supersample": 2, "fps": None,
+                      "segment_preset": "veryfast", "segment_crf": 12, "preset": None, "crf": None}
+        },
+        "calibration": {
+            "target_fps": 60,
+            "goal": "quality",
+            "duration": 6,
+            "presets": ["ultrafast", "veryfast", "faster", "medium"],
+            "threads": [0, 4],
+            "crfs": [20, 23, 26]
+        },
         "codec": {
             "video_codec": "h264_amf (AMD H.264)" if sys.platform == 'win32' else 'libx264 (CPU)',
             "x264_crf": 23,
+            "x264_preset": "",
+            "x264_threads": 0,
             "nvenc_cq": 23,
             "amf_usage": "transcoding",
             "amf_rc": "cqp",
@@ -141,9 +197,22 @@ DEFAULT_CONFIG = {
     },
     "default_prompts": {
         "translation": "Translate the following text to {language}: {text}",
-        "image_prompt_generation": "Based on the following text, generate 3 detailed image prompts in English, one per line, without any numbering or prefixes:\n{text}",
+        "image_prompt_generation": "Based on the following text, generate {count} detailed image prompts in English, one per line, without any numbering or prefixes:\n{text}",
+        "translation_glossary": "List up to 30 proper names and recurring key terms from the following text together with their translation to {language}, one per line in the form 'term - translation'. Output only the list:\n{text}",
+        "translation_segment_context": "You are translating part {part} of {total} of a longer text to {language}. Translate only the text of the user message and output only its translation, without comments.\n{glossary}Preceding text (context only, do not translate):\n{before}\n\nFollowing text (context only, do not translate):\n{after}",
+        "combined_cta_prompts": "Complete both tasks for the TEXT below and answer only with a JSON object of the form {{\"call_to_action\": \"...\", \"image_prompts\": [\"...\", \"...\"]}}.\n\ncall_to_action: {cta_task}\n\nimage_prompts: {prompts_task}\n\nTEXT:\n{text}",
         "call_to_action": "Based on the following text, write a short and engaging call to action for a YouTube video, encouraging viewers to watch until the end. Keep it under 150 characters:\n{text}"
     },
+    "retry_policy": {
+        "base_delay": 2.0,
+        "max_delay": 60.0,
+        "max_attempts": 8,
+        "breaker_failure_threshold": 5,
+        "breaker_reset_seconds": 120,
+        "text_deadline_seconds": 1800,
+        "audio_chunk_deadline_seconds": 1200,
+        "tts_fallback_enabled": False
+    },
     "ui_settings": {
         "language": "ua",
         "theme": "darkly",
@@ -160,6 +229,7 @@ DEFAULT_CONFIG = {
         },
         "image_control_enabled": False,
         "auto_switch_service_on_fail": False,
-        "auto_switch_retry_limit": 10
+        "auto_switch_retry_limit": 10,
+        "show_queue_estimate": True
     }
 }
\ No newline at end of file
@@ -5,9 +5,23 @@ import queue
 import time
 from typing import Optional, Dict
 import os
+import re
+
+from api.cancellation import CancellationToken, cancellation_scope
+from api.retry_policy import deadline_scope, is_circuit_open
+from utils.file_utils import chunk_text_balanced
+from utils.history_utils import tts_voice_key
 
 logger = logging.getLogger("TranslationApp")
 
+# Кінець речення там само, де його ріже chunk_text_balanced; пробіл після розділового знака
+# гарантує, що модель уже дописала речення
+SENTENCE_END_RE = re.compile(r'[.!?]\s+')
+
+# Ім'я запобіжника (api/retry_policy.py) і поле голосу в налаштуваннях мови для кожного TTS-сервісу
+TTS_PROVIDERS = {'elevenlabs': 'ElevenLabs', 'voicemaker': 'VoiceMaker', 'speechify': 'Speechify'}
+TTS_VOICE_FIELDS = {'elevenlabs': 'elevenlabs_template_uuid', 'voicemaker': 'voicemaker_voice_id', 'speechify': 'speechify_voice_id'}
+
 class AudioPipelineItem:
     """Елемент для обробки в аудіо пайплайні."""
     def __init__(self, text_chunk: str, output_path: str, lang_config: dict, 
@@ -38,13 +52,187 @@ class AudioWorkerResult:
         self.success = success
         self.item = item
 
+def route_tts_service(app, item: AudioPipelineItem) -> str:
+    """
+    Якщо запобіжник основного TTS-сервісу відкрито і резервна маршрутизація увімкнена,
+    переводить фрагмент на інший сервіс, для якого в мові налаштовано голос.
+    """
+    tts_service = item.lang_config.get("tts_service", "elevenlabs")
+    if not app.config.get("retry_policy", {}).get("tts_fallback_enabled", False) or not is_circuit_open(TTS_PROVIDERS.get(tts_service, tts_service)):
+        return tts_service
+    for fallback in TTS_PROVIDERS:
+        if fallback != tts_service and item.lang_config.get(TTS_VOICE_FIELDS[fallback]) and not is_circuit_open(TTS_PROVIDERS[fallback]):
+            logger.warning(f"{TTS_PROVIDERS.get(tts_service, tts_service)} недоступний -> {item.task_key} chunk {item.chunk_index} озвучується через {TTS_PROVIDERS[fallback]}.")
+            # Копія налаштувань, щоб статистика голосу записалась під фактичний сервіс
+            item.lang_config = dict(item.lang_config, tts_service=fallback)
+            return fallback
+    return tts_service
+
+def generate_audio_chunk(app, item: AudioPipelineItem) -> bool:
+    """Генерує аудіо файл для текстового фрагменту."""
+    try:
+        tts_service = route_tts_service(app, item)
+
+        if tts_service == "elevenlabs":
+            task_id = app.el_api.create_audio_task(
+                item.text_chunk, 
+                item.lang_config.get("elevenlabs_template_uuid")
+            )
+            if task_id and app.el_api.wait_for_elevenlabs_task(app, task_id, item.output_path):
+                return True
+
+        elif tts_service == "voicemaker":
+            voice_id = item.lang_config.get("voicemaker_voice_id")
+            engine = item.lang_config.get("voicemaker_engine")
+            success, _ = app.vm_api.generate_audio(
+                item.text_chunk, voice_id, engine, item.lang_code, item.output_path
+            )
+            return success
+
+        elif tts_service == "speechify":
+            success, _ = app.speechify_api.generate_audio_streaming(
+                text=item.text_chunk,
+                voice_id=item.lang_config.get("speechify_voice_id"),
+                model=item.lang_config.get("speechify_model"),
+                output_path=item.output_path,
+                emotion=item.lang_config.get("speechify_emotion"),
+                pitch=item.lang_config.get("speechify_pitch", 0),
+                rate=item.lang_config.get("speechify_rate", 0)
+            )
+            return success
+
+        return False
+
+    except Exception as e:
+        logger.exception(f"Помилка генерації аудіо: {e}")
+        return False
+
+
+def synthesize_audio_item(app, item: AudioPipelineItem, cancel_token: CancellationToken = None) -> bool:
+    """Озвучує фрагмент і записує результат в історію запусків. cancel_token перериває запити до TTS."""
+    if cancel_token is not None and cancel_token.is_cancelled:
+        return False
+    start_time = time.time()
+    with deadline_scope(app.config.get("retry_policy", {}).get("audio_chunk_deadline_seconds")), cancellation_scope(cancel_token):
+        success = generate_audio_chunk(app, item)
+    if success:
+        # Реальна тривалість озвучки калібрує оцінку швидкості голосу для наступних розбиттів тексту
+        app.run_history.record_tts_result(item.lang_config, item.text_chunk, item.output_path)
+        app.run_history.record_throughput('tts', tts_voice_key(item.lang_config), len(item.text_chunk), time.time() - start_time)
+    return success
+
+class StreamingTTSFeeder:
+    """
+    Озвучує текст, поки модель його ще пише (потокова відповідь OpenRouter).
+    Завершені речення накопичуються до target_chars і одразу йдуть на озвучку;
+    решту тексту після кінця потоку ділить finish(). Якщо потік розійшовся з уже
+    озвученим текстом (повтор запиту після збою), рання озвучка відкидається.
+    """
+    def __init__(self, app_instance, executor, lang_config: dict, lang_code: str, task_key: str,
+                 audio_dir: str, target_chars: float, char_limit: int = None, cancel_token: CancellationToken = None):
+        self.app = app_instance
+        self.executor = executor
+        self.cancel_token = cancel_token
+        self.lang_config = lang_config
+        self.lang_code = lang_code
+        self.task_key = task_key
+        self.audio_dir = audio_dir
+        self.target_chars = max(1.0, target_chars)
+        self.char_limit = char_limit
+        self.valid = True
+        self.chunks = []  # [(AudioPipelineItem, Future), ...]
+        self._consumed = ""
+        self._lock = threading.Lock()
+
+    def feed(self, accumulated: str):
+        """Приймає весь отриманий на цей момент текст і відправляє на озвучку готові частини."""
+        with self._lock:
+            if not self.valid:
+                return
+            text = accumulated.lstrip()
+            if not text.startswith(self._consumed):
+                # Коротший текст, що збігається з початком озвученого, - це повтор запиту, який ще не наздогнав
+                if not self._consumed.startswith(text):
+                    self._invalidate("текст потоку змінився після повтору запиту")
+                return
+            while True:
+                pending = text[len(self._consumed):]
+                cut = self._find_cut(pending)
+                if cut is None:
+                    break
+                self._submit(pending[:cut].strip())
+                self._consumed += pending[:cut]
+
+    def finish(self, final_text: str) -> bool:
+        """Озвучує решту тексту після завершення потоку. Повертає False, якщо рання озвучка непридатна."""
+        with self._lock:
+            if not self.valid:
+                return False
+            head = self._consumed.rstrip()
+            if not final_text.startswith(head):
+                self._invalidate("підсумковий текст не збігається з озвученим")
+                return False
+            rest = final_text[len(head):].strip()
+            if rest:
+                num_chunks = max(1, round(len(rest) / self.target_chars))
+                sec_per_char, sec_per_sentence = self.app.run_history.speech_model(tts_voice_key(self.lang_config))
+                for chunk in chunk_text_balanced(rest, num_chunks, self.char_limit, sec_per_char, sec_per_sentence):
+                    self._submit(chunk)
+            for item, _ in self.chunks:
+                item.total_chunks = len(self.chunks)
+            early = sum(1 for _, future in self.chunks if future.running() or future.done())
+            logger.info(f"Streaming TTS -> {self.task_key}: {len(self.chunks)} частин, {early} з них почали озвучуватись до кінця відповіді.")
+            return bool(self.chunks)
+
+    def cancel(self):
+        """Скасовує ще не розпочату ранню озвучку (переклад не вдався або текст розійшовся)."""
+        with self._lock:
+            self._invalidate(None)
+
+    def deliver(self, results_queue: queue.Queue):
+        """Передає результати ранньої озвучки в чергу результатів AudioWorkerPool у міру готовності."""
+        for item, future in self.chunks:
+            future.add_done_callback(
+                lambda f, item=item: results_queue.put(AudioWorkerResult(success=not f.cancelled() and f.exception() is None and bool(f.result()), item=item))
+            )
+
+    def _find_cut(self, pending: str):
+        """Позиція після останнього речення частини або None, якщо частина ще не набралась."""
+        last_fit = None
+        for match in SENTENCE_END_RE.finditer(pending):
+            size = len(pending[:match.start() + 1].strip())
+            if self.char_limit and size > self.char_limit:
+                return last_fit
+            if size >= self.target_chars:
+                return match.end()
+            last_fit = match.end()
+        return None
+
+    def _submit(self, text_chunk: str):
+        index = len(self.chunks)
+        item = AudioPipelineItem(
+            text_chunk=text_chunk, output_path=os.path.join(self.audio_dir, f"audio_{index:02d}.mp3"),
+            lang_config=self.lang_config, lang_code=self.lang_code, chunk_index=index,
+            total_chunks=0, task_key=self.task_key
+        )
+        self.chunks.append((item, self.executor.submit(synthesize_audio_item, self.app, item, self.cancel_token)))
+        logger.info(f"Streaming TTS -> {self.task_key}: частина {index} ({len(text_chunk)} симв.) відправлена на озвучку.")
+
+    def _invalidate(self, reason):
+        if reason and self.valid:
+            logger.warning(f"Streaming TTS -> {self.task_key}: ранню озвучку відкинуто ({reason}), текст буде озвучено звичайним шляхом.")
+        self.valid = False
+        for _, future in self.chunks:
+            future.cancel()
+
 class VoicemakerAsyncHandler:
     """
     Обробляє асинхронні Voicemaker завдання з затримками та правильною хронологією.
     """
-    def __init__(self, app_instance):
+    def __init__(self, app_instance, cancel_token: CancellationToken = None):
         self.app = app_instance
         self.vm_api = app_instance.vm_api
+        self.cancel_token = cancel_token or CancellationToken()
         # Сховище для всіх завдань, що обробляються, згрупованих за task_key
         self.task_groups: Dict[str, Dict[str, dict]] = {}  # task_key -> {vm_task_id -> task_info}
         self.submission_delay = 1.0  # 1 секунда між запитами
@@ -69,8 +257,8 @@ class VoicemakerAsyncHandler:
     def _submit_tasks_with_delay(self, items: list, task_key: str):
         """Відправляє завдання з затримкою між запитами."""
         for i, item in enumerate(items):
-            if self.app.shutdown_event.is_set():
-                logger.warning(f"VoicemakerAsync -> Відправку завдань для {task_key} скасовано через закриття програми.")
+            if self.app.shutdown_event.is_set() or self.cancel_token.is_cancelled:
+                logger.warning(f"VoicemakerAsync -> Відправку завдань для {task_key} скасовано: обробку зупинено.")
                 break
             try:
                 vm_task_id = self.vm_api.create_audio_task_async(
@@ -92,7 +280,7 @@ class VoicemakerAsyncHandler:
                     self.task_groups[task_key][f"error_{item.chunk_index}"] = {"status": "error", "item": item}
 
                 if i < len(items) - 1:
-                    time.sleep(self.submission_delay)
+                    self.cancel_token.wait(self.submission_delay)
                     
             except Exception as e:
                 logger.exception(f"VoicemakerAsync -> Помилка відправки chunk {item.chunk_index}: {e}")
@@ -125,6 +313,7 @@ class VoicemakerAsyncHandler:
                 if success:
                     downloaded_items.append(item)
                     task_info["status"] = "completed" # Позначаємо як завершене
+                    self.app.run_history.record_tts_result(item.lang_config, item.text_chunk, item.output_path)
                     logger.info(f"VoicemakerAsync -> Завантажено chunk {item.chunk_index} для {task_key}")
                 else:
                     task_info["status"] = "error"
@@ -147,9 +336,11 @@ class AudioWorkerPool:
     Керований пул для генерації аудіо та субтитрів.
     Воркери лише виконують завдання; вся логіка керування знаходиться в WorkflowManager.
     """
-    def __init__(self, app_instance, max_workers: int):
+    def __init__(self, app_instance, max_workers: int, cancel_token: CancellationToken = None):
         self.app = app_instance
         self.max_workers = max_workers
+        # Токен запуску черги: після зупинки воркери не беруть нових завдань, а поточні запити перериваються
+        self.cancel_token = cancel_token or CancellationToken()
         self.audio_queue = queue.Queue()
         self.transcription_queue = queue.Queue()
         self.audio_results_queue = queue.Queue() # Сюди воркери кладуть результати озвучки
@@ -158,7 +349,7 @@ class AudioWorkerPool:
         self.workers = []
         
         # Асинхронний обробник для Voicemaker
-        self.voicemaker_handler = VoicemakerAsyncHandler(app_instance)
+        self.voicemaker_handler = VoicemakerAsyncHandler(app_instance, self.cancel_token)
 
     def start(self):
         if self.is_running: return
@@ -212,7 +403,7 @@ class AudioWorkerPool:
         return self.voicemaker_handler.is_task_group_completed(task_key, expected_total)
         
     def _audio_worker(self, worker_id: int):
-        while not self.shutdown_event.is_set():
+        while not self.shutdown_event.is_set() and not self.cancel_token.is_cancelled:
             try:
                 item = self.audio_queue.get(timeout=1)
                 if item is None: break
@@ -222,7 +413,7 @@ class AudioWorkerPool:
                     self.app.log_context.worker_id = f'Chunk {worker_id + 1}'
                 
                 logger.info(f"AudioWorker-{worker_id}: Початок {item.task_key} chunk {item.chunk_index}")
-                success = self._generate_audio_chunk(item)
+                success = synthesize_audio_item(self.app, item, self.cancel_token)
                 
                 result = AudioWorkerResult(success=success, item=item)
                 self.audio_results_queue.put(result)
@@ -235,7 +426,7 @@ class AudioWorkerPool:
         logger.info(f"AudioWorker-{worker_id} завершено")
 
     def _transcription_worker(self):
-        while not self.shutdown_event.is_set():
+        while not self.shutdown_event.is_set() and not self.cancel_token.is_cancelled:
             try:
                 item = self.transcription_queue.get(timeout=1)
                 if item is None: break
@@ -256,6 +447,10 @@ class AudioWorkerPool:
                 logger.info(f"TranscriptionWorker: Початок транскрипції {item.task_key} chunk {item.chunk_index}")
                 subs_path = self._generate_transcription_chunk(item)
                 item.subs_path = subs_path
+                if self.cancel_token.is_cancelled:
+                    # Результат зупиненого запуску не повинен потрапити в чергу наступного
+                    logger.info(f"TranscriptionWorker: {item.task_key} chunk {item.chunk_index} відкинуто, обробку зупинено.")
+                    break
                 
                 if subs_path:
                     logger.info(f"TranscriptionWorker: Успішно створено транскрипцію для {item.task_key} chunk {item.chunk_index}: {subs_path}")
@@ -271,45 +466,6 @@ class AudioWorkerPool:
                 logger.exception(f"TranscriptionWorker: Критична помилка: {e}")
         logger.info("TranscriptionWorker завершено")
 
-    def _generate_audio_chunk(self, item: AudioPipelineItem) -> bool:
-        """Генерує аудіо файл для текстового фрагменту."""
-        try:
-            tts_service = item.lang_config.get("tts_service", "elevenlabs")
-            
-            if tts_service == "elevenlabs":
-                task_id = self.app.el_api.create_audio_task(
-                    item.text_chunk, 
-                    item.lang_config.get("elevenlabs_template_uuid")
-                )
-                if task_id and self.app.el_api.wait_for_elevenlabs_task(self.app, task_id, item.output_path):
-                    return True
-                        
-            elif tts_service == "voicemaker":
-                voice_id = item.lang_config.get("voicemaker_voice_id")
-                engine = item.lang_config.get("voicemaker_engine")
-                success, _ = self.app.vm_api.generate_audio(
-                    item.text_chunk, voice_id, engine, item.lang_code, item.output_path
-                )
-                return success
-                    
-            elif tts_service == "speechify":
-                success, _ = self.app.speechify_api.generate_audio_streaming(
-                    text=item.text_chunk,
-                    voice_id=item.lang_config.get("speechify_voice_id"),
-                    model=item.lang_config.get("speechify_model"),
-                    output_path=item.output_path,
-                    emotion=item.lang_config.get("speechify_emotion"),
-                    pitch=item.lang_config.get("speechify_pitch", 0),
-                    rate=item.lang_config.get("speechify_rate", 0)
-                )
-                return success
-                    
-            return False
-            
-        except Exception as e:
-            logger.exception(f"Помилка генерації аудіо: {e}")
-            return False
-            
     def _generate_transcription_chunk(self, item: TranscriptionPipelineItem) -> Optional[str]:
         """Генерує транскрипцію для аудіо файлу."""
         try:
@@ -0,0 +1,188 @@
+# core/whisper_manager.py
+import concurrent.futures
+import contextlib
+import gc
+import logging
+import os
+import sys
+import threading
+
+import whisper
+
+logger = logging.getLogger("TranslationApp")
+
+def whisper_download_root():
+    """Повертає папку для моделей Whisper (тільки для EXE), інакше None."""
+    if getattr(sys, 'frozen', False):
+        download_root = os.path.join(os.path.dirname(sys.executable), "whisper_models")
+        os.makedirs(download_root, exist_ok=True)
+        return download_root
+    return None
+
+class WhisperModelManager:
+    """
+    Керує життєвим циклом моделі Whisper для всієї програми.
+    Модель прогрівається у фоні на старті черги, спільно використовується
+    транскрипцією рерайту та AudioWorkerPool і вивантажується після простою.
+    Один екземпляр моделі не можна декодувати з кількох потоків одночасно,
+    тому use() серіалізує доступ до неї.
+    Шардована транскрипція довгих джерел працює в пулі процесів (shard_pool): модель
+    не передається між процесами, тож кожен воркер тримає власну копію, але пул теж
+    належить менеджеру - створюється один раз, перевикористовується наступними джерелами
+    і вивантажується разом із моделлю.
+    """
+    def __init__(self, config):
+        self.config = config
+        self._model = None
+        self._model_name = None
+        self._pool = None
+        self._pool_key = None
+        self._load_lock = threading.Lock()
+        self._use_lock = threading.Lock()
+        self._idle_timer = None
+        self._timer_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def _montage_cfg(self) -> dict:
+        return self.config.get("montage", {})
+
+    def _ensure_loaded(self, status_callback=None):
+        """Завантажує модель (або перезавантажує, якщо в налаштуваннях змінено модель)."""
+        model_name = self._montage_cfg().get("whisper_model", "base")
+        with self._load_lock:
+            if self._model is not None and self._model_name == model_name:
+                return self._model
+            if self._model is not None:
+                logger.info(f"Whisper -> Модель змінено ({self._model_name} -> {model_name}), перезавантаження.")
+                self._release_model()
+
+            logger.info(f"Whisper -> Запит на завантаження моделі: {model_name}")
+            if status_callback:
+                status_callback(f"Завантаження моделі Whisper ({model_name})...")
+            try:
+                self._model = whisper.load_model(model_name, download_root=whisper_download_root())
+                self._model_name = model_name
+                logger.info(f"Whisper -> УСПІХ: Модель '{model_name}' успішно завантажена.")
+            except Exception as e:
+                logger.error(f"Whisper -> ПОМИЛКА: Не вдалося завантажити модель '{model_name}': {e}", exc_info=True)
+                self._model = None
+                self._model_name = None
+            return self._model
+
+    def warm_up_async(self):
+        """Починає завантаження моделі у фоні, якщо вона ще не завантажена."""
+        if self._montage_cfg().get("whisper_backend", "standard") == "amd":
+            return
+        self._cancel_idle_timer()
+        if self.is_loaded:
+            return
+        logger.info("Whisper -> Фоновий прогрів моделі...")
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def _warm_up(self):
+        self._ensure_loaded()
+        self._schedule_idle_unload()
+
+    @contextlib.contextmanager
+    def use(self, status_callback=None):
+        """Надає модель на час транскрипції. Якщо модель не вдалося завантажити, повертає None."""
+        with self._use_lock:
+            self._cancel_idle_timer()
+            try:
+                yield self._ensure_loaded(status_callback)
+            finally:
+                self._schedule_idle_unload()
+
+    @contextlib.contextmanager
+    def shard_pool(self, num_workers: int, status_callback=None):
+        """
+        Надає пул процесів з моделлю для шардованої транскрипції. Доступ серіалізується з use(),
+        тож шарди не змагаються за ядра й пам'ять із транскрипцією субтитрів. Якщо робота з пулом
+        завершилась помилкою (зокрема процеси завершено зупинкою черги), пул відкидається.
+        """
+        with self._use_lock:
+            self._cancel_idle_timer()
+            try:
+                pool = self._ensure_pool(num_workers, status_callback)
+                try:
+                    yield pool
+                except BaseException:
+                    with self._load_lock:
+                        self._release_pool()
+                    raise
+            finally:
+                self._schedule_idle_unload()
+
+    def _ensure_pool(self, num_workers, status_callback=None):
+        from utils.speech_utils import init_transcribe_worker
+        model_name = self._montage_cfg().get("whisper_model", "base")
+        with self._load_lock:
+            if self._pool is not None and self._pool_key == (model_name, num_workers):
+                return self._pool
+            self._release_pool()
+            logger.info(f"Whisper -> Запуск пулу транскрипції: {num_workers} процесів з моделлю '{model_name}'.")
+            if status_callback:
+                status_callback(f"Завантаження моделі Whisper ({model_name}) у {num_workers} процесах...")
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, initializer=init_transcribe_worker,
+                                                                initargs=(model_name, whisper_download_root()))
+            self._pool_key = (model_name, num_workers)
+            return self._pool
+
+    def _release_pool(self):
+        if self._pool is not None:
+            logger.info("Whisper -> Пул транскрипції зупинено.")
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._pool_key = None
+
+    def _schedule_idle_unload(self):
+        idle_seconds = self._montage_cfg().get("whisper_idle_unload_seconds", 300)
+        if not idle_seconds or idle_seconds <= 0:
+            return
+        with self._timer_lock:
+            if self._idle_timer:
+                self._idle_timer.cancel()
+            self._idle_timer = threading.Timer(idle_seconds, self._on_idle)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _cancel_idle_timer(self):
+        with self._timer_lock:
+            if self._idle_timer:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+
+    def _on_idle(self):
+        # Якщо модель саме зараз використовується, таймер перезапуститься після use()
+        if not self._use_lock.acquire(blocking=False):
+            return
+        try:
+            with self._load_lock:
+                if self._model is not None:
+                    logger.info(f"Whisper -> Модель '{self._model_name}' не використовувалась, вивантаження з пам'яті.")
+                    self._release_model()
+                self._release_pool()
+        finally:
+            self._use_lock.release()
+
+    def unload(self):
+        """Негайно вивантажує модель (наприклад, при закритті програми)."""
+        self._cancel_idle_timer()
+        with self._use_lock, self._load_lock:
+            if self._model is not None:
+                self._release_model()
+            self._release_pool()
+
+    def _release_model(self):
+        self._model = None
+        self._model_name = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
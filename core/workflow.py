@@ -4,18 +4,23 @@ import os
 import threading
 import concurrent.futures
 import shutil
-import numpy as np
 import time
 import re
+import math
 import queue
 from tkinter import messagebox
 import shutil
 import yt_dlp
 
 # Імпортуємо необхідні утиліти та функції
-from utils.file_utils import sanitize_filename, chunk_text, chunk_text_voicemaker, chunk_text_speechify
-from utils.media_utils import concatenate_audio_files, concatenate_videos
-from core.audio_pipeline import AudioWorkerPool, AudioPipelineItem, TranscriptionPipelineItem
+from constants.app_settings import SPEECHIFY_CHAR_LIMIT
+from utils.file_utils import sanitize_filename, chunk_text_speechify, chunk_text_balanced
+from utils.history_utils import tts_voice_key
+from utils.media_utils import concatenate_audio_files, concatenate_videos, split_images_by_duration, get_media_duration, image_budget, pick_evenly
+from utils.resource_utils import plan_montage_resources
+from core.audio_pipeline import AudioWorkerPool, AudioPipelineItem, TranscriptionPipelineItem, StreamingTTSFeeder
+from api.cancellation import CancellationToken, cancellation_scope
+from api.retry_policy import deadline_scope
 
 logger = logging.getLogger("TranslationApp")
 
@@ -93,21 +98,46 @@ class WorkflowManager:
         self.tg_api = app_instance.tg_api
         self.firebase_api = app_instance.firebase_api
         self.transcription_results_queue = queue.Queue()
+        # Рання озвучка потокових відповідей OpenRouter (див. _create_tts_feeder)
+        self._early_tts_executor = None
+        self._early_tts_lock = threading.Lock()
+        # Токен поточного запуску черги; cancel() зупиняє його разом з ffmpeg, Whisper і HTTP-запитами
+        self.cancel_token = CancellationToken()
         
     def _get_status_key(self, task_idx, lang_code, is_rewrite=False):
         """Helper функція для створення правильного ключа статусу"""
         prefix = "rewrite_" if is_rewrite else ""
         return f"{prefix}{task_idx}_{lang_code}"
     
+    def cancel(self):
+        """
+        Зупиняє поточний запуск черги: завершує процеси ffmpeg і воркери транскрипції,
+        перериває запити до провайдерів. Завдання лишаються в черзі для повторного запуску.
+        """
+        logger.info("Зупинка черги -> Скасування поточних процесів і запитів...")
+        self.cancel_token.cancel()
+        self._shutdown_early_tts_executor()
+
     def shutdown(self):
         """Зупиняє всі активні процеси WorkflowManager."""
+        self.cancel_token.cancel()
+        self._shutdown_early_tts_executor()
         if hasattr(self, 'audio_worker_pool') and self.audio_worker_pool:
             logger.info("Зупинка аудіо воркер пулу...")
             self.audio_worker_pool.stop()
             self.audio_worker_pool = None
             
+    def _shutdown_early_tts_executor(self):
+        """Зупиняє пул ранньої озвучки; ще не розпочаті частини скасовуються. Новий пул створиться за потреби."""
+        with self._early_tts_lock:
+            executor, self._early_tts_executor = self._early_tts_executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def process_unified_queue(self, unified_queue):
         self.app.is_processing_queue = True
+        self.cancel_token = CancellationToken()
+        self.montage_api.cancel_token = self.cancel_token
         self.app._update_button_states(is_processing=True, is_image_stuck=False)
         if hasattr(self.app, 'pause_resume_button'):
             self.app.root.after(0, lambda: self.app.pause_resume_button.config(state="normal"))
@@ -150,8 +180,20 @@ class WorkflowManager:
             # Оновлюємо відображення в GUI з початковими статусами "Очікує"
             self.app.root.after(0, self.app.update_queue_display)
 
+            # Прогріваємо Whisper у фоні паралельно з текстовим етапом
+            needs_whisper = any(
+                task['steps'][lang_code].get('create_subtitles') or task['steps'][lang_code].get('transcribe')
+                for task in queue_to_process for lang_code in task['selected_langs']
+            )
+            if needs_whisper:
+                self.app.whisper_manager.warm_up_async()
+
             # НОВИЙ ПІДХІД: спочатку всі підготовчі етапи для всіх завдань, потім монтаж
             self._process_all_preparation_phases(queue_to_process)
+
+            if self.cancel_token.is_cancelled:
+                logger.info("Обробку черги зупинено користувачем. Завдання лишаються в черзі для повторного запуску.")
+                return
             
             # Перевірка контролю зображень перед монтажем
             if self.config.get("ui_settings", {}).get("image_control_enabled", False):
@@ -175,13 +217,19 @@ class WorkflowManager:
         finally:
             self.app.is_processing_queue = False
             self.app.current_processing_task_index = None  # Скидаємо поточне завдання
+            self._shutdown_early_tts_executor()
+            # Монтаж поза чергою (попередній перегляд тощо) не повинен успадкувати зупинений токен
+            self.montage_api.cancel_token = CancellationToken()
             # Очищуємо прогрес відео після завершення обробки
             with self.app.video_progress_lock:
                 self.app.video_chunk_progress.clear()
+                self.app.video_chunk_eta.clear()
             self.app._update_button_states(is_processing=False, is_image_stuck=False)
             self.app.root.after(0, self.app.update_queue_display)
             if hasattr(self.app, 'pause_resume_button'):
                 self.app.root.after(0, lambda: self.app.pause_resume_button.config(text=self.app._t('pause_button'), state="disabled"))
+            if hasattr(self.app, 'stop_queue_button'):
+                self.app.root.after(0, lambda: self.app.stop_queue_button.config(state="disabled"))
             self.app.pause_event.set()
 
     def _process_all_preparation_phases(self, queue_to_process):
@@ -241,7 +289,7 @@ class WorkflowManager:
                                 
                                 voicemaker_limit = self.config.get("voicemaker", {}).get("char_limit", 2900)
                                 if len(text_to_process) > voicemaker_limit:
-                                    text_chunks = chunk_text_voicemaker(text_to_process, voicemaker_limit)
+                                    text_chunks = self._chunk_text_for_tts(text_to_process, lang_config, num_chunks)
                                     actual_chunks = len(text_chunks)
                                     # Для субтитрів Voicemaker використовує num_chunks груп після злиття
                                     if step == 'create_subtitles':
@@ -325,10 +373,8 @@ class WorkflowManager:
                 with open(original_transcript_path, "r", encoding='utf-8') as f:
                     transcribed_text = f.read()
             else:
-                model = self.montage_api._load_whisper_model()
-                if not model: return
-                transcription_result = model.transcribe(mp3_path, verbose=False)
-                transcribed_text = transcription_result['text']
+                transcribed_text = self.montage_api.transcribe_long_audio(mp3_path)
+                if transcribed_text is None: return
                 with open(original_transcript_path, "w", encoding='utf-8') as f: f.write(transcribed_text)
 
             task['transcribed_text'] = transcribed_text
@@ -351,7 +397,7 @@ class WorkflowManager:
                 worker = self._rewrite_text_processing_worker if is_rewrite else self._text_processing_worker
                 task_key = (task['task_index'], lang_code)
                 all_processing_data[task_key] = {'task': task}
-                future = executor.submit(worker, self.app, task, lang_code, queue_type)
+                future = executor.submit(self._run_text_worker, worker, self.app, task, lang_code, queue_type)
                 future_to_task_key[future] = task_key
 
             for future in concurrent.futures.as_completed(future_to_task_key):
@@ -364,6 +410,11 @@ class WorkflowManager:
                     all_processing_data[task_key]['text_results'] = None
         return all_processing_data
 
+    def _run_text_worker(self, worker, app, task, lang_code, queue_type):
+        """Виконує текстовий воркер з дедлайном на всі його запити до OpenRouter і токеном зупинки черги."""
+        with deadline_scope(self.config.get("retry_policy", {}).get("text_deadline_seconds")), cancellation_scope(self.cancel_token):
+            return worker(app, task, lang_code, queue_type)
+
     def _process_media_generation_phase(self, all_processing_data, queue_to_process):
         """Обробляє генерацію зображень та аудіо/субтитрів для всіх завдань паралельно"""
         # Визначаємо тип галереї на основі завдань
@@ -397,83 +448,18 @@ class WorkflowManager:
         # Додаємо кроки монтажу до загального підрахунку
         num_chunks = self.config.get('parallel_processing', {}).get('num_chunks', 3)
         for task in queue_to_process:
-            is_rewrite = task.get('type') == 'Rewrite'
             for lang_code in task['selected_langs']:
                 steps = task['steps'][lang_code]
                 if steps.get('create_video'):
                     self.app.total_individual_steps += num_chunks  # chunk videos
                     self.app.total_individual_steps += 1  # final concatenation
 
-        for task_key, data in sorted(self.all_processing_data.items()):
-            # Встановлюємо поточне завдання, що обробляється
-            task_index = task_key[0]
-            if self.app.current_processing_task_index != task_index:
-                self.app.current_processing_task_index = task_index
-                self.app.root.after(0, self.app.update_queue_display)  # Оновлюємо відображення статусу
-            
-            if not self.app._check_app_state():
-                logger.warning("Монтаж зупинено користувачем.")
-                break
-                
-            lang_code = task_key[1]
-            task_idx_str = task_key[0]
-            task = data['task']
-            is_rewrite = task.get('type') == 'Rewrite'
-            queue_type = 'rewrite' if is_rewrite else 'main'
-            status_key = self._get_status_key(task_idx_str, lang_code, is_rewrite)
-            
-            if not (data.get('task') and data.get('text_results') and data['task']['steps'][lang_code].get('create_video')):
-                continue
-
-            images_folder = data['text_results']['images_folder']
-            all_images = sorted([os.path.join(images_folder, f) for f in os.listdir(images_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
-            
-            if not data.get('audio_chunks') or not data.get('subs_chunks') or not all_images:
-                if status_key in self.app.task_completion_status:
-                    self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
-                continue
-
-            if status_key in self.app.task_completion_status:
-                self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "0.0%"
-                self.app.root.after(0, self.app.update_task_status_display)
+        self._render_montage_jobs(sorted(self.all_processing_data.items()))
 
-            image_chunks = np.array_split(all_images, len(data['audio_chunks']))
-            video_chunk_paths = []
-            num_montage_threads = self.config.get('parallel_processing', {}).get('num_chunks', 3)
-            os.makedirs(os.path.join(data['temp_dir'], "video"), exist_ok=True)
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_montage_threads) as executor:
-                video_futures = {executor.submit(self._video_chunk_worker, self.app, list(image_chunks[i]), data['audio_chunks'][i], data['subs_chunks'][i], os.path.join(data['temp_dir'], "video", f"video_chunk_{i:02d}.mp4"), i + 1, len(data['audio_chunks']), task_key): i for i in range(len(data['audio_chunks']))}
-                
-                video_results = {}
-                for f in concurrent.futures.as_completed(video_futures):
-                    chunk_index = video_futures[f]
-                    result = f.result()
-                    if result: 
-                        video_results[chunk_index] = result
-                        self.app.increment_and_update_progress(queue_type)
-                        
-                video_chunk_paths = [video_results[i] for i in sorted(video_results.keys())]
-
-            if len(video_chunk_paths) == len(data['audio_chunks']):
-                base_name = sanitize_filename(data['text_results'].get('video_title', data['text_results'].get('task_name', f"Task_{task_key[0]}")))
-                final_video_path = os.path.join(data['text_results']['output_path'], f"video_{base_name}_{lang_code}.mp4")
-                
-                if self._concatenate_videos(self.app, video_chunk_paths, final_video_path):
-                    self.app.increment_and_update_progress(queue_type)
-                    if status_key in self.app.task_completion_status:
-                        self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "100.0%"
-                    if is_rewrite and 'original_filename' in data['task']:
-                        self.app.save_processed_link(data['task']['original_filename'])
-                else:
-                    if status_key in self.app.task_completion_status:
-                        self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
-            else:
-                if status_key in self.app.task_completion_status:
-                    self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
-            
-            if self.config.get("telegram", {}).get("report_timing", "per_task") == "per_language":
-                self.app.send_task_completion_report(data['task'], single_lang_code=lang_code)
+        if self.cancel_token.is_cancelled:
+            # Тимчасові файли й кеш сегментів лишаються: повторний запуск продовжить з готових чанків
+            logger.info("Монтаж зупинено користувачем. Завдання лишаються в черзі, тимчасові файли збережено.")
+            return
 
         # Позначаємо завершені завдання
         completed_tasks = set()
@@ -494,6 +480,9 @@ class WorkflowManager:
         # Очищуємо тимчасові файли
         if not self.config.get('parallel_processing', {}).get('keep_temp_files', False):
             for data in self.all_processing_data.values():
+                if data.get('montage_failed'):
+                    logger.info(f"Монтаж не завершено, тимчасові файли збережено для повторного запуску: {data.get('temp_dir')}")
+                    continue
                 if 'temp_dir' in data and os.path.exists(data['temp_dir']):
                     try: shutil.rmtree(data['temp_dir'])
                     except Exception as e: logger.error(f"Failed to delete temp dir {data['temp_dir']}: {e}")
@@ -565,7 +554,7 @@ class WorkflowManager:
                             
                             voicemaker_limit = self.config.get("voicemaker", {}).get("char_limit", 2900)
                             if len(text_to_process) > voicemaker_limit:
-                                text_chunks = chunk_text_voicemaker(text_to_process, voicemaker_limit)
+                                text_chunks = self._chunk_text_for_tts(text_to_process, lang_config, num_chunks)
                                 actual_chunks = len(text_chunks)
                                 # Для субтитрів Voicemaker використовує num_chunks груп після злиття
                                 if step == 'create_subtitles':
@@ -634,10 +623,8 @@ class WorkflowManager:
                         with open(original_transcript_path, "r", encoding='utf-8') as f:
                             transcribed_text = f.read()
                     else:
-                        model = self.montage_api._load_whisper_model()
-                        if not model: return
-                        transcription_result = model.transcribe(mp3_path, verbose=False)
-                        transcribed_text = transcription_result['text']
+                        transcribed_text = self.montage_api.transcribe_long_audio(mp3_path)
+                        if transcribed_text is None: return
                         with open(original_transcript_path, "w", encoding='utf-8') as f: f.write(transcribed_text)
 
                     task['transcribed_text'] = transcribed_text
@@ -663,7 +650,7 @@ class WorkflowManager:
                     for lang_code in task['selected_langs']:
                         task_key = (task['task_index'], lang_code)
                         processing_data[task_key] = {'task': task} 
-                        future = executor.submit(worker, self.app, task, lang_code, queue_type)
+                        future = executor.submit(self._run_text_worker, worker, self.app, task, lang_code, queue_type)
                         text_futures[future] = task_key
                 
                 for future in concurrent.futures.as_completed(text_futures):
@@ -695,63 +682,7 @@ class WorkflowManager:
 
             logger.info("Hybrid mode -> Phase 4: Starting final montage.")
             
-            for task_key, data in sorted(processing_data.items()):
-                lang_code = task_key[1]
-                task_idx_str = task_key[0]
-                status_key = self._get_status_key(task_idx_str, lang_code, is_rewrite)
-                
-                if not (data.get('task') and data.get('text_results') and data['task']['steps'][lang_code].get('create_video')):
-                    continue
-
-                images_folder = data['text_results']['images_folder']
-                all_images = sorted([os.path.join(images_folder, f) for f in os.listdir(images_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
-                
-                if not data.get('audio_chunks') or not data.get('subs_chunks') or not all_images:
-                    if status_key in self.app.task_completion_status:
-                        self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
-                    continue
-
-                if status_key in self.app.task_completion_status:
-                    self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "0.0%"
-                    self.app.root.after(0, self.app.update_task_status_display)
-
-                image_chunks = np.array_split(all_images, len(data['audio_chunks']))
-                video_chunk_paths = []
-                num_montage_threads = self.config.get('parallel_processing', {}).get('num_chunks', 3)
-                os.makedirs(os.path.join(data['temp_dir'], "video"), exist_ok=True)
-
-                with concurrent.futures.ThreadPoolExecutor(max_workers=num_montage_threads) as executor:
-                    video_futures = {executor.submit(self._video_chunk_worker, self.app, list(image_chunks[i]), data['audio_chunks'][i], data['subs_chunks'][i], os.path.join(data['temp_dir'], "video", f"video_chunk_{i:02d}.mp4"), i + 1, len(data['audio_chunks']), task_key): i for i in range(len(data['audio_chunks']))}
-                    
-                    video_results = {}
-                    for f in concurrent.futures.as_completed(video_futures):
-                        chunk_index = video_futures[f]
-                        result = f.result()
-                        if result: 
-                            video_results[chunk_index] = result
-                            self.app.increment_and_update_progress(queue_type)
-                            
-                    video_chunk_paths = [video_results[i] for i in sorted(video_results.keys())]
-
-                if len(video_chunk_paths) == len(data['audio_chunks']):
-                    base_name = sanitize_filename(data['text_results'].get('video_title', data['text_results'].get('task_name', f"Task_{task_key[0]}")))
-                    final_video_path = os.path.join(data['text_results']['output_path'], f"video_{base_name}_{lang_code}.mp4")
-                    
-                    if self._concatenate_videos(self.app, video_chunk_paths, final_video_path):
-                        self.app.increment_and_update_progress(queue_type)
-                        if status_key in self.app.task_completion_status:
-                            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "100.0%"
-                        if is_rewrite and 'original_filename' in data['task']:
-                            self.app.save_processed_link(data['task']['original_filename'])
-                    else:
-                        if status_key in self.app.task_completion_status:
-                            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
-                else:
-                    if status_key in self.app.task_completion_status:
-                        self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
-                
-                if self.config.get("telegram", {}).get("report_timing", "per_task") == "per_language":
-                    self.app.send_task_completion_report(data['task'], single_lang_code=lang_code)
+            self._render_montage_jobs(sorted(processing_data.items()))
 
             if self.config.get("telegram", {}).get("report_timing", "per_task") == "per_task":
                 self.app.send_task_completion_report(task)
@@ -764,10 +695,14 @@ class WorkflowManager:
         finally:
             if not self.config.get('parallel_processing', {}).get('keep_temp_files', False):
                 for data in processing_data.values():
+                    if data.get('montage_failed'):
+                        logger.info(f"Монтаж не завершено, тимчасові файли збережено для повторного запуску: {data.get('temp_dir')}")
+                        continue
                     if 'temp_dir' in data and os.path.exists(data['temp_dir']):
                         try: shutil.rmtree(data['temp_dir'])
                         except Exception as e: logger.error(f"Failed to delete temp dir {data['temp_dir']}: {e}")
 
+            self._shutdown_early_tts_executor()
             self.app.stop_command_listener.set()
             if is_rewrite:
                 self.app.is_processing_rewrite_queue = False
@@ -797,6 +732,7 @@ class WorkflowManager:
 
             text_to_process = task['input_text']
             translation_path = os.path.join(output_path, "translation.txt")
+            early_audio = None
 
             step_name_key_translate = self.app._t('step_name_translate')
             if lang_steps.get('translate'):
@@ -804,17 +740,26 @@ class WorkflowManager:
                     app.task_completion_status[status_key]['steps'][step_name_key_translate] = "В процесі"
                     app.root.after(0, app.update_task_status_display)
 
-                translated_text = self.or_api.translate_text(task['input_text'], self.config["openrouter"]["translation_model"], self.config["openrouter"]["translation_params"], lang_name, custom_prompt_template=lang_config.get("prompt"))
+                length_ratio = app.run_history.average_value('translation_length_ratio', 1.0)
+                tts_feeder = self._create_tts_feeder(task, lang_code, output_path, len(task['input_text']) * length_ratio)
+                translated_text = self.or_api.translate_text(task['input_text'], self.config["openrouter"]["translation_model"], self.config["openrouter"]["translation_params"], lang_name, custom_prompt_template=lang_config.get("prompt"),
+                                                             on_text=tts_feeder.feed if tts_feeder else None)
                 
                 if translated_text:
                     text_to_process = translated_text
                     with open(translation_path, 'w', encoding='utf-8') as f: f.write(translated_text)
+                    if task['input_text']:
+                        app.run_history.record_value('translation_length_ratio', len(translated_text) / len(task['input_text']))
+                    if tts_feeder and tts_feeder.finish(translated_text):
+                        early_audio = tts_feeder
                     app.increment_and_update_progress(queue_type)
                     if status_key in app.task_completion_status: 
                         app.task_completion_status[status_key]['steps'][step_name_key_translate] = "Готово"
                     app.root.after(0, app.update_task_status_display)
                 else:
                     logger.error(f"Translation failed for {lang_name}.")
+                    if tts_feeder:
+                        tts_feeder.cancel()
                     if status_key in app.task_completion_status: 
                         app.task_completion_status[status_key]['steps'][step_name_key_translate] = "Помилка"
                     app.root.after(0, app.update_task_status_display)
@@ -826,8 +771,12 @@ class WorkflowManager:
                 text_to_process = task['input_text']
 
             prompts_path = os.path.join(output_path, "image_prompts.txt")
+
+            combined_prompts = None
+            if lang_steps.get('cta') and lang_steps.get('gen_prompts') and self.config["openrouter"].get("combined_cta_prompts", False):
+                combined_prompts = self._generate_cta_and_prompts(app, text_to_process, lang_code, lang_name, output_path, status_key, queue_type)
             
-            if lang_steps.get('cta'):
+            if lang_steps.get('cta') and combined_prompts is None:
                 step_name_key_cta = self.app._t('step_name_cta')
                 if status_key in app.task_completion_status:
                     app.task_completion_status[status_key]['steps'][step_name_key_cta] = "В процесі"
@@ -846,15 +795,18 @@ class WorkflowManager:
 
 
             raw_prompts = None
-            if lang_steps.get('gen_prompts'):
+            if lang_steps.get('gen_prompts') and combined_prompts is None:
                 step_name_key_prompts = self.app._t('step_name_gen_prompts')
                 if status_key in app.task_completion_status:
                     app.task_completion_status[status_key]['steps'][step_name_key_prompts] = "В процесі"
                     app.root.after(0, app.update_task_status_display)
 
-                raw_prompts = self.or_api.generate_image_prompts(text_to_process, self.config["openrouter"]["prompt_model"], self.config["openrouter"]["prompt_params"], lang_name)
+                raw_prompts = self.or_api.generate_image_prompts(text_to_process, self.config["openrouter"]["prompt_model"], self.config["openrouter"]["prompt_params"], lang_name,
+                                                                 image_count=self._image_budget(text_to_process, lang_code))
                 if raw_prompts:
                     with open(prompts_path, 'w', encoding='utf-8') as f: f.write(raw_prompts)
+                    if text_to_process:
+                        self.app.run_history.record_value('images_per_1k_chars', len(parse_image_prompts(raw_prompts, logger)) * 1000 / len(text_to_process))
                     app.increment_and_update_progress(queue_type)
                     if status_key in app.task_completion_status: 
                         app.task_completion_status[status_key]['steps'][step_name_key_prompts] = "Готово"
@@ -862,11 +814,13 @@ class WorkflowManager:
                     if status_key in app.task_completion_status: 
                         app.task_completion_status[status_key]['steps'][step_name_key_prompts] = "Помилка"
                 app.root.after(0, app.update_task_status_display)
-            elif os.path.exists(prompts_path):
+            elif combined_prompts is None and os.path.exists(prompts_path):
                 with open(prompts_path, 'r', encoding='utf-8') as f: raw_prompts = f.read()
 
-            # Використовуємо розумний парсер промптів
-            image_prompts = parse_image_prompts(raw_prompts, logger)
+            # Використовуємо розумний парсер промптів (структурована відповідь його не потребує)
+            image_prompts = combined_prompts if combined_prompts is not None else parse_image_prompts(raw_prompts, logger)
+            if lang_steps.get('gen_images'):
+                image_prompts = self._apply_image_budget(image_prompts, self._image_budget(text_to_process, lang_code), lang_code)
 
             images_folder = os.path.join(output_path, "images")
             os.makedirs(images_folder, exist_ok=True)
@@ -907,12 +861,84 @@ class WorkflowManager:
             return {
                 "text_to_process": text_to_process, "output_path": output_path,
                 "prompts": image_prompts, "images_folder": images_folder,
-                "task_name": task.get('task_name', 'Untitled_Task')
+                "task_name": task.get('task_name', 'Untitled_Task'),
+                "early_audio": early_audio
             }
         except Exception as e:
             logger.exception(f"Error in text processing worker for {lang_code}: {e}")
             return None
 
+    def _generate_cta_and_prompts(self, app, text, lang_code, lang_name, output_path, status_key, queue_type):
+        """
+        Заклик до дії та промпти зображень одним структурованим запитом.
+        Повертає список промптів або None - тоді обидва кроки виконуються окремими запитами, як раніше.
+        """
+        step_names = [self.app._t('step_name_cta'), self.app._t('step_name_gen_prompts')]
+        if status_key in app.task_completion_status:
+            for step_name in step_names:
+                app.task_completion_status[status_key]['steps'][step_name] = "В процесі"
+            app.root.after(0, app.update_task_status_display)
+
+        result = self.or_api.generate_cta_and_prompts(text, self.config["openrouter"]["prompt_model"], self.config["openrouter"]["prompt_params"], lang_name,
+                                                      image_count=self._image_budget(text, lang_code))
+        if not result:
+            logger.warning(f"[Workflow] Структурований запит для {lang_code} не вдався, заклик до дії та промпти генеруються окремо.")
+            return None
+
+        with open(os.path.join(output_path, "call_to_action.txt"), 'w', encoding='utf-8') as f: f.write(result['call_to_action'])
+        # По абзацу на промпт - parse_image_prompts прочитає файл так само при повторному запуску
+        with open(os.path.join(output_path, "image_prompts.txt"), 'w', encoding='utf-8') as f: f.write("\n\n".join(result['image_prompts']))
+        if text:
+            app.run_history.record_value('images_per_1k_chars', len(result['image_prompts']) * 1000 / len(text))
+        for step_name in step_names:
+            app.increment_and_update_progress(queue_type)
+            if status_key in app.task_completion_status:
+                app.task_completion_status[status_key]['steps'][step_name] = "Готово"
+        app.root.after(0, app.update_task_status_display)
+        return result['image_prompts']
+
+    def _create_tts_feeder(self, task, lang_code, output_path, expected_chars):
+        """
+        Готує озвучку тексту ще під час потокової відповіді моделі.
+        Повертає None, якщо стрімінг вимкнено, етап озвучки не обрано або сервіс - Voicemaker
+        (його частини йдуть окремою асинхронною групою, кратною num_chunks).
+        """
+        if not self.config["openrouter"].get("streaming_enabled", False) or not task['steps'][lang_code].get('audio'):
+            return None
+        lang_config = self.config["languages"][lang_code]
+        tts_service = lang_config.get("tts_service", "elevenlabs")
+        if tts_service == "voicemaker":
+            return None
+
+        num_chunks = max(1, self.config.get('parallel_processing', {}).get('num_chunks', 3))
+        with self._early_tts_lock:
+            if self._early_tts_executor is None:
+                # Спільний для всіх мов пул, щоб рання озвучка не перевищувала звичайну кількість паралельних запитів
+                self._early_tts_executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_chunks, thread_name_prefix="EarlyTTS")
+        audio_dir = os.path.join(output_path, "temp", "audio")
+        os.makedirs(audio_dir, exist_ok=True)
+        return StreamingTTSFeeder(
+            self.app, self._early_tts_executor, lang_config, lang_code, str((task['task_index'], lang_code)),
+            audio_dir, expected_chars / num_chunks, SPEECHIFY_CHAR_LIMIT if tts_service == "speechify" else None,
+            cancel_token=self.cancel_token
+        )
+
+    def _image_budget(self, text, lang_code):
+        """Кількість зображень за оціненою тривалістю озвучки тексту; None, якщо бюджет вимкнено."""
+        montage_cfg = self.config.get('montage', {})
+        if not montage_cfg.get('image_budget_enabled', True) or not text:
+            return None
+        lang_config = self.config.get('languages', {}).get(lang_code, {})
+        narration_seconds = self.app.run_history.estimate_speech_seconds(tts_voice_key(lang_config), text)
+        return image_budget(narration_seconds, montage_cfg)
+
+    def _apply_image_budget(self, image_prompts, budget, lang_code):
+        """Обрізає список промптів до бюджету ще до генерації, рівномірно по всьому тексту."""
+        if not budget or len(image_prompts) <= budget:
+            return image_prompts
+        logger.info(f"[Image Budget] {lang_code}: {len(image_prompts)} промптів, бюджет {budget} - зайві не генеруватимуться.")
+        return pick_evenly(image_prompts, budget)
+
     def _rewrite_text_processing_worker(self, app, task, lang_code, queue_type):
         """Обробляє ВЖЕ транскрибований текст для одного завдання рерайту."""
         try:
@@ -929,6 +955,7 @@ class WorkflowManager:
             os.makedirs(lang_output_path, exist_ok=True)
 
             selected_template_name = app.rewrite_template_var.get()
+            early_audio = None
             rewrite_prompt_template = self.config.get("rewrite_prompt_templates", {}).get(selected_template_name, {}).get(lang_code)
             
             step_name_key_rewrite = self.app._t('step_name_rewrite_text')
@@ -937,15 +964,22 @@ class WorkflowManager:
                     app.task_completion_status[status_key]['steps'][step_name_key_rewrite] = "В процесі"
                     app.root.after(0, app.update_task_status_display)
 
-                rewritten_text = self.or_api.rewrite_text(transcribed_text, self.config["openrouter"]["rewrite_model"], self.config["openrouter"]["rewrite_params"], rewrite_prompt_template)
+                tts_feeder = self._create_tts_feeder(task, lang_code, lang_output_path, app.run_history.average_value('rewrite_chars', len(transcribed_text)))
+                rewritten_text = self.or_api.rewrite_text(transcribed_text, self.config["openrouter"]["rewrite_model"], self.config["openrouter"]["rewrite_params"], rewrite_prompt_template,
+                                                          on_text=tts_feeder.feed if tts_feeder else None)
                 
                 if not rewritten_text: 
+                    if tts_feeder:
+                        tts_feeder.cancel()
                     if status_key in app.task_completion_status: 
                         app.task_completion_status[status_key]['steps'][step_name_key_rewrite] = "Помилка"
                     app.root.after(0, app.update_task_status_display)
                     return None
                 
                 with open(os.path.join(lang_output_path, "rewritten_text.txt"), "w", encoding='utf-8') as f: f.write(rewritten_text)
+                app.run_history.record_value('rewrite_chars', len(rewritten_text))
+                if tts_feeder and tts_feeder.finish(rewritten_text):
+                    early_audio = tts_feeder
                 app.increment_and_update_progress(queue_type)
                 if status_key in app.task_completion_status: 
                     app.task_completion_status[status_key]['steps'][step_name_key_rewrite] = "Готово"
@@ -953,8 +987,12 @@ class WorkflowManager:
             else:
                 rewritten_text = transcribed_text
             
+            combined_prompts = None
+            if task['steps'][lang_code]['cta'] and task['steps'][lang_code]['gen_prompts'] and self.config["openrouter"].get("combined_cta_prompts", False):
+                combined_prompts = self._generate_cta_and_prompts(app, rewritten_text, lang_code, "", lang_output_path, status_key, queue_type)
+
             cta_path = os.path.join(lang_output_path, "call_to_action.txt")
-            if task['steps'][lang_code]['cta']:
+            if task['steps'][lang_code]['cta'] and combined_prompts is None:
                 step_name_key_cta = self.app._t('step_name_cta')
                 if status_key in app.task_completion_status:
                     app.task_completion_status[status_key]['steps'][step_name_key_cta] = "В процесі"
@@ -973,15 +1011,18 @@ class WorkflowManager:
 
             raw_prompts = None
             prompts_path = os.path.join(lang_output_path, "image_prompts.txt")
-            if task['steps'][lang_code]['gen_prompts']:
+            if task['steps'][lang_code]['gen_prompts'] and combined_prompts is None:
                 step_name_key_prompts = self.app._t('step_name_gen_prompts')
                 if status_key in app.task_completion_status:
                     app.task_completion_status[status_key]['steps'][step_name_key_prompts] = "В процесі"
                     app.root.after(0, app.update_task_status_display)
 
-                raw_prompts = self.or_api.generate_image_prompts(rewritten_text, self.config["openrouter"]["prompt_model"], self.config["openrouter"]["prompt_params"])
+                raw_prompts = self.or_api.generate_image_prompts(rewritten_text, self.config["openrouter"]["prompt_model"], self.config["openrouter"]["prompt_params"],
+                                                                 image_count=self._image_budget(rewritten_text, lang_code))
                 if raw_prompts:
                     with open(prompts_path, 'w', encoding='utf-8') as f: f.write(raw_prompts)
+                    if rewritten_text:
+                        app.run_history.record_value('images_per_1k_chars', len(parse_image_prompts(raw_prompts, logger)) * 1000 / len(rewritten_text))
                     app.increment_and_update_progress(queue_type)
                     if status_key in app.task_completion_status: 
                         app.task_completion_status[status_key]['steps'][step_name_key_prompts] = "Готово"
@@ -989,11 +1030,13 @@ class WorkflowManager:
                     if status_key in app.task_completion_status:
                         app.task_completion_status[status_key]['steps'][step_name_key_prompts] = "Помилка"
                 app.root.after(0, app.update_task_status_display)
-            elif os.path.exists(prompts_path):
+            elif combined_prompts is None and os.path.exists(prompts_path):
                 with open(prompts_path, 'r', encoding='utf-8') as f: raw_prompts = f.read()
 
-            # Використовуємо розумний парсер промптів
-            image_prompts = parse_image_prompts(raw_prompts, logger)
+            # Використовуємо розумний парсер промптів (структурована відповідь його не потребує)
+            image_prompts = combined_prompts if combined_prompts is not None else parse_image_prompts(raw_prompts, logger)
+            if task['steps'][lang_code]['gen_images']:
+                image_prompts = self._apply_image_budget(image_prompts, self._image_budget(rewritten_text, lang_code), lang_code)
 
             images_folder = os.path.join(lang_output_path, "images")
             os.makedirs(images_folder, exist_ok=True)
@@ -1004,7 +1047,8 @@ class WorkflowManager:
             
             return {
                 "text_to_process": rewritten_text, "output_path": lang_output_path,
-                "prompts": image_prompts, "images_folder": images_folder, "video_title": video_title
+                "prompts": image_prompts, "images_folder": images_folder, "video_title": video_title,
+                "early_audio": early_audio
             }
         except Exception as e:
             logger.exception(f"Error in rewrite text processing worker for {lang_code}: {e}")
@@ -1019,7 +1063,11 @@ class WorkflowManager:
             step_name = self.app._t('step_name_gen_images')
 
             if data.get('text_results') and data['task']['steps'][lang_code].get('gen_images'):
+                images_before = self.app.task_completion_status.get(status_key, {}).get("images_generated", 0)
+                start_time = time.time()
                 self._image_generation_worker(data, task_key, int(task_idx_str) + 1, len(queue_to_process), queue_type, is_rewrite)
+                images_done = self.app.task_completion_status.get(status_key, {}).get("images_generated", 0) - images_before
+                self.app.run_history.record_throughput('images', self.app.active_image_api_var.get(), images_done, time.time() - start_time)
                 
                 if status_key in self.app.task_completion_status:
                     # Після завершення воркера, інкрементуємо загальний прогрес, якщо хоч щось згенерувалось
@@ -1344,11 +1392,12 @@ class WorkflowManager:
         logger.info("[Audio/Subs Master] Запуск керованого пайплайну.")
 
         num_parallel_chunks = self.config.get('parallel_processing', {}).get('num_chunks', 3)
-        self.audio_worker_pool = AudioWorkerPool(self.app, num_parallel_chunks)
+        self.audio_worker_pool = AudioWorkerPool(self.app, num_parallel_chunks, self.cancel_token)
         self.audio_worker_pool.start()
 
         voicemaker_task_keys = []
         other_audio_items = []
+        early_audio_feeders = []
         tasks_info = {}
         total_transcriptions_expected = 0
 
@@ -1372,58 +1421,50 @@ class WorkflowManager:
                     lang_config = self.config["languages"][lang_code]
                     tts_service = lang_config.get("tts_service", "elevenlabs")
                     
-                    if tts_service == "voicemaker":
-                        # Шукаємо merged_audio_*
-                        expected_audio_files = [os.path.join(temp_dir, "audio", f"merged_audio_{i:02d}.mp3") 
-                                               for i in range(num_parallel_chunks)]
-                    else:
-                        # Шукаємо audio_*
-                        expected_audio_files = [os.path.join(temp_dir, "audio", f"audio_{i:02d}.mp3") 
-                                               for i in range(num_parallel_chunks)]
-                    
-                    found_audio = [p for p in expected_audio_files if os.path.exists(p) and os.path.getsize(p) > 0]
+                    # Кількість частин залежить від ліміту символів сервісу і потокової озвучки, а не лише від num_chunks,
+                    # тож беремо всі файли, що реально лежать у теці, за їх індексом
+                    audio_prefix = "merged_audio_" if tts_service == "voicemaker" else "audio_"
+                    found_audio, missing_indices = self._find_numbered_chunks(os.path.join(temp_dir, "audio"), audio_prefix, ".mp3")
                     
-                    if len(found_audio) == num_parallel_chunks:
-                        found_audio_chunks = expected_audio_files
-                        logger.info(f"✓ Знайдено всі {num_parallel_chunks} існуючих аудіо-чанків для {task_key} ({tts_service}). Генерація аудіо пропущена.")
+                    if found_audio and not missing_indices:
+                        found_audio_chunks = found_audio
+                        logger.info(f"✓ Знайдено всі {len(found_audio)} існуючих аудіо-чанків для {task_key} ({tts_service}). Генерація аудіо пропущена.")
                         if status_key in self.app.task_completion_status: 
                             self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_audio')] = "Знайдено"
-                    elif len(found_audio) > 0:
+                    elif found_audio:
                         # ВИПРАВЛЕННЯ: Використовуємо те що є
                         found_audio_chunks = found_audio
-                        missing_indices = [i for i in range(num_parallel_chunks) if expected_audio_files[i] not in found_audio]
-                        logger.warning(f"⚠ Етап 'audio' вимкнено для {task_key}. Знайдено тільки {len(found_audio)}/{num_parallel_chunks} аудіо-файлів ({tts_service}). "
+                        expected_count = len(found_audio) + len(missing_indices)
+                        logger.warning(f"⚠ Етап 'audio' вимкнено для {task_key}. Знайдено тільки {len(found_audio)}/{expected_count} аудіо-файлів ({tts_service}). "
                                       f"Відсутні індекси: {missing_indices}. ВИКОРИСТОВУЄМО ТЕ ЩО Є ДЛЯ МОНТАЖУ!")
                         if status_key in self.app.task_completion_status: 
-                            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_audio')] = f"Часткові ({len(found_audio)}/{num_parallel_chunks})"
+                            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_audio')] = f"Часткові ({len(found_audio)}/{expected_count})"
                     else:
                         logger.error(f"✗ КРИТИЧНА ПОМИЛКА: Етап 'audio' вимкнено для {task_key}, але НЕ ЗНАЙДЕНО ЖОДНОГО аудіо-файлу! "
-                                   f"Очікувалось: {num_parallel_chunks} файлів у {os.path.join(temp_dir, 'audio')}. "
+                                   f"Очікувались файли {audio_prefix}XX.mp3 у {os.path.join(temp_dir, 'audio')}. "
                                    f"Монтаж НЕМОЖЛИВИЙ без аудіо!")
                         if status_key in self.app.task_completion_status: 
                             self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_audio')] = "❌ Відсутні"
 
                 if not steps.get('create_subtitles'):
-                    expected_subs_files = [os.path.join(temp_dir, "subs", f"subs_chunk_{i:02d}.ass") 
-                                          for i in range(num_parallel_chunks)]
-                    found_subs = [p for p in expected_subs_files if os.path.exists(p) and os.path.getsize(p) > 0]
+                    found_subs, missing_indices = self._find_numbered_chunks(os.path.join(temp_dir, "subs"), "subs_chunk_", ".ass")
                     
-                    if len(found_subs) == num_parallel_chunks:
-                        found_subs_chunks = expected_subs_files
-                        logger.info(f"✓ Знайдено всі {num_parallel_chunks} існуючих чанків субтитрів для {task_key}. Створення субтитрів пропущено.")
+                    if found_subs and not missing_indices:
+                        found_subs_chunks = found_subs
+                        logger.info(f"✓ Знайдено всі {len(found_subs)} існуючих чанків субтитрів для {task_key}. Створення субтитрів пропущено.")
                         if status_key in self.app.task_completion_status: 
                             self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_subtitles')] = "Знайдено"
-                    elif len(found_subs) > 0:
+                    elif found_subs:
                         # ВИПРАВЛЕННЯ: Використовуємо те що є
                         found_subs_chunks = found_subs
-                        missing_indices = [i for i in range(num_parallel_chunks) if expected_subs_files[i] not in found_subs]
-                        logger.warning(f"⚠ Етап 'create_subtitles' вимкнено для {task_key}. Знайдено тільки {len(found_subs)}/{num_parallel_chunks} файлів субтитрів. "
+                        expected_count = len(found_subs) + len(missing_indices)
+                        logger.warning(f"⚠ Етап 'create_subtitles' вимкнено для {task_key}. Знайдено тільки {len(found_subs)}/{expected_count} файлів субтитрів. "
                                       f"Відсутні індекси: {missing_indices}. ВИКОРИСТОВУЄМО ТЕ ЩО Є ДЛЯ МОНТАЖУ!")
                         if status_key in self.app.task_completion_status: 
-                            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_subtitles')] = f"Часткові ({len(found_subs)}/{num_parallel_chunks})"
+                            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_subtitles')] = f"Часткові ({len(found_subs)}/{expected_count})"
                     else:
                         logger.error(f"✗ КРИТИЧНА ПОМИЛКА: Етап 'create_subtitles' вимкнено для {task_key}, але НЕ ЗНАЙДЕНО ЖОДНОГО файлу субтитрів! "
-                                   f"Очікувалось: {num_parallel_chunks} файлів у {os.path.join(temp_dir, 'subs')}. "
+                                   f"Очікувались файли subs_chunk_XX.ass у {os.path.join(temp_dir, 'subs')}. "
                                    f"Монтаж НЕМОЖЛИВИЙ без субтитрів!")
                         if status_key in self.app.task_completion_status: 
                             self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_subtitles')] = "❌ Відсутні"
@@ -1454,19 +1495,25 @@ class WorkflowManager:
                 lang_config = self.config["languages"][lang_code]
                 tts_service = lang_config.get("tts_service", "elevenlabs")
                 text_to_process = data['text_results']['text_to_process']
+                early_audio = data['text_results'].get('early_audio')
                 
-                voicemaker_limit = self.config.get("voicemaker", {}).get("char_limit", 2900)
-                text_chunks = []
-                if tts_service == "voicemaker" and len(text_to_process) > voicemaker_limit:
-                    text_chunks = chunk_text_voicemaker(text_to_process, voicemaker_limit)
+                if early_audio:
+                    # Текст уже розбито і частково озвучено під час потокової відповіді моделі
+                    text_chunks = [item.text_chunk for item, _ in early_audio.chunks]
                 else:
-                    text_chunks = chunk_text(text_to_process, num_parallel_chunks)
+                    text_chunks = self._chunk_text_for_tts(text_to_process, lang_config, num_parallel_chunks)
 
                 if not text_chunks:
                     logger.warning(f"Текст для {task_key} порожній.")
                     continue
 
                 transcription_count = num_parallel_chunks if tts_service == 'voicemaker' and len(text_chunks) > num_parallel_chunks else len(text_chunks)
+                # Файли зайвих частин від попереднього запуску з іншою кількістю частин інакше потрапили б у монтаж при повторному запуску
+                self._remove_stale_chunks(os.path.join(temp_dir, "audio"), "audio_", ".mp3", len(text_chunks))
+                if tts_service == 'voicemaker':
+                    self._remove_stale_chunks(os.path.join(temp_dir, "audio"), "merged_audio_", ".mp3", transcription_count)
+                if steps.get('create_subtitles'):
+                    self._remove_stale_chunks(os.path.join(temp_dir, "subs"), "subs_chunk_", ".ass", transcription_count)
                 if steps.get('create_subtitles'): total_transcriptions_expected += transcription_count
                 
                 tasks_info[str(task_key)] = {
@@ -1495,6 +1542,8 @@ class WorkflowManager:
 
                 if tts_service == "voicemaker":
                     voicemaker_task_keys.append(str(task_key))
+                elif early_audio:
+                    early_audio_feeders.append(early_audio)
                 else:
                     other_audio_items.extend(audio_items)
 
@@ -1502,17 +1551,19 @@ class WorkflowManager:
             total_other_chunks = len(other_audio_items)
             for item in other_audio_items:
                 self.audio_worker_pool.add_audio_task(item)
+            for feeder in early_audio_feeders:
+                feeder.deliver(self.audio_worker_pool.audio_results_queue)
+                total_other_chunks += len(feeder.chunks)
             logger.info(f"Відправлено на паралельну обробку: {total_other_chunks} фрагментів (ElevenLabs, Speechify).")
 
             for task_key in voicemaker_task_keys:
-                if self.app.shutdown_event.is_set(): break
+                if self.cancel_token.is_cancelled: break
                 
                 info = tasks_info[task_key]
                 task_data = info['data']
                 
                 text_to_process_vm = task_data['text_results']['text_to_process']
-                voicemaker_limit = self.config.get("voicemaker", {}).get("char_limit", 2900)
-                vm_text_chunks = chunk_text_voicemaker(text_to_process_vm, voicemaker_limit) if len(text_to_process_vm) > voicemaker_limit else chunk_text(text_to_process_vm, num_parallel_chunks)
+                vm_text_chunks = self._chunk_text_for_tts(text_to_process_vm, self.config["languages"][eval(task_key)[1]], num_parallel_chunks)
 
                 vm_items_for_task = [
                     AudioPipelineItem(
@@ -1526,7 +1577,7 @@ class WorkflowManager:
                 logger.info(f"Початок послідовної обробки Voicemaker для {task_key} ({len(vm_items_for_task)} чанків)...")
                 self.audio_worker_pool.submit_voicemaker_tasks_async(vm_items_for_task)
                 
-                while not self.audio_worker_pool.is_voicemaker_group_completed(task_key, info['total_chunks']) and not self.app.shutdown_event.is_set():
+                while not self.audio_worker_pool.is_voicemaker_group_completed(task_key, info['total_chunks']) and not self.cancel_token.is_cancelled:
                     downloaded = self.audio_worker_pool.check_and_download_ready_tasks(task_key)
                     if downloaded:
                         for item in downloaded:
@@ -1540,6 +1591,7 @@ class WorkflowManager:
                                 if status_data['total_audio'] > 0: status_data['steps'][self.app._t('step_name_audio')] = f"{status_data['audio_generated']}/{status_data['total_audio']}"
                                 self.app.root.after(0, self.app.update_task_status_display)
                     time.sleep(1) 
+                if self.cancel_token.is_cancelled: break
                 
                 logger.info(f"Завершено обробку Voicemaker для {task_key}. Склеювання та відправка на транскрипцію...")
                 if info['data']['task']['steps'][eval(task_key)[1]].get('create_subtitles'):
@@ -1547,7 +1599,7 @@ class WorkflowManager:
 
             # --- ЕТАП 4: Збір результатів та транскрипція (без змін) ---
             completed_audio_count = 0
-            while completed_audio_count < total_other_chunks and not self.app.shutdown_event.is_set():
+            while completed_audio_count < total_other_chunks and not self.cancel_token.is_cancelled:
                 try:
                     result = self.audio_worker_pool.audio_results_queue.get(timeout=0.5)
                     completed_audio_count += 1
@@ -1581,7 +1633,7 @@ class WorkflowManager:
             
             logger.info(f"Очікується {total_transcriptions_expected} результатів транскрипції.")
             completed_transcriptions = 0
-            while completed_transcriptions < total_transcriptions_expected and not self.app.shutdown_event.is_set():
+            while completed_transcriptions < total_transcriptions_expected and not self.cancel_token.is_cancelled:
                 try:
                     result_item = self.transcription_results_queue.get(timeout=1.0)
                     completed_transcriptions += 1
@@ -1639,30 +1691,93 @@ class WorkflowManager:
                 self.audio_worker_pool.stop()
                 logger.info("[Audio/Subs Master] Пайплайн завершено, воркер пул зупинено.")
     
+    def _chunk_text_for_tts(self, text, lang_config, num_parallel_chunks):
+        """
+        Розбиває текст для озвучки на частини з однаковою прогнозованою тривалістю.
+        Швидкість мовлення голосу береться з історії запусків; ліміт символів сервісу дотримується.
+        Для Voicemaker частин може бути більше за num_parallel_chunks: їх склеюють у групи
+        за фактичною кількістю (див. _split_voicemaker_groups).
+        """
+        tts_service = lang_config.get("tts_service", "elevenlabs")
+        char_limit = None
+        num_chunks = num_parallel_chunks
+        if tts_service == "voicemaker":
+            char_limit = self.config.get("voicemaker", {}).get("char_limit", 2900)
+            if len(text) > char_limit:
+                num_chunks = max(num_parallel_chunks, math.ceil(len(text) / char_limit))
+        elif tts_service == "speechify":
+            char_limit = SPEECHIFY_CHAR_LIMIT
+
+        sec_per_char, sec_per_sentence = self.app.run_history.speech_model(tts_voice_key(lang_config))
+        return chunk_text_balanced(text, num_chunks, char_limit, sec_per_char, sec_per_sentence)
+
+    @staticmethod
+    def _numbered_chunk_files(folder, prefix, ext):
+        """Словник {індекс: шлях} непорожніх файлів виду <prefix>NN<ext> у теці."""
+        if not os.path.isdir(folder):
+            return {}
+        pattern = re.compile(rf"^{re.escape(prefix)}(\d+){re.escape(ext)}$")
+        files = {}
+        for name in os.listdir(folder):
+            match = pattern.match(name)
+            path = os.path.join(folder, name)
+            if match and os.path.getsize(path) > 0:
+                files[int(match.group(1))] = path
+        return files
+
+    @classmethod
+    def _find_numbered_chunks(cls, folder, prefix, ext):
+        """Готові частини, впорядковані за індексом, і список пропущених індексів між ними."""
+        files = cls._numbered_chunk_files(folder, prefix, ext)
+        if not files:
+            return [], []
+        missing_indices = [i for i in range(max(files) + 1) if i not in files]
+        return [files[i] for i in sorted(files)], missing_indices
+
+    @classmethod
+    def _remove_stale_chunks(cls, folder, prefix, ext, keep_count):
+        """Видаляє файли частин з індексом keep_count і більше, що лишились від попереднього запуску."""
+        for index, path in cls._numbered_chunk_files(folder, prefix, ext).items():
+            if index >= keep_count:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Не вдалося видалити застарілий файл {path}: {e}")
+
+    @staticmethod
+    def _split_voicemaker_groups(sorted_items, num_groups):
+        """
+        Ділить аудіочастини (по порядку) на min(num_groups, len) непорожніх груп з приблизно однаковою
+        сумарною довжиною тексту. Межі рахуються з фактичної кількості частин, тож додаткові частини,
+        які з'явились через ліміт символів, не роблять групи нерівними.
+        """
+        num_groups = min(num_groups, len(sorted_items))
+        weights = [max(1, len(item.text_chunk)) for item in sorted_items]
+        target = sum(weights) / max(1, num_groups)
+
+        groups, current, elapsed = [], [], 0
+        for index, (item, weight) in enumerate(zip(sorted_items, weights)):
+            items_left = len(sorted_items) - index
+            groups_left = num_groups - len(groups)
+            # Закриваємо групу на межі, але так, щоб на решту груп лишилось хоча б по одній частині
+            if current and groups_left > 1 and (items_left < groups_left or elapsed + weight / 2 > (len(groups) + 1) * target):
+                groups.append(current)
+                current = []
+            current.append(item)
+            elapsed += weight
+        if current:
+            groups.append(current)
+        return groups
+
     def _process_voicemaker_group(self, task_info: dict, task_key: str, num_parallel_chunks: int):
         """Обробляє завершену групу Voicemaker аудіофайлів: склеює та відправляє на транскрипцію."""
         sorted_items = sorted(task_info['completed_audio_items'], key=lambda x: x.chunk_index)
         audio_paths_to_merge = [item.output_path for item in sorted_items]
         
-        # Розбиваємо всі аудіочастини на рівно num_parallel_chunks груп
         total_audio_chunks = len(audio_paths_to_merge)
-        chunks_per_group = total_audio_chunks // num_parallel_chunks
-        remaining_chunks = total_audio_chunks % num_parallel_chunks
-        
-        logger.info(f"Voicemaker: Склеювання {total_audio_chunks} аудіочастин у {num_parallel_chunks} фінальних файлів для {task_key}...")
-        
-        groups = []
-        start_idx = 0
-        for i in range(num_parallel_chunks):
-            # Додаємо один додатковий елемент до перших "remaining_chunks" груп
-            group_size = chunks_per_group + (1 if i < remaining_chunks else 0)
-            end_idx = start_idx + group_size
-            if start_idx < total_audio_chunks:
-                groups.append(audio_paths_to_merge[start_idx:end_idx])
-            start_idx = end_idx
-        
-        # Видаляємо порожні групи
-        groups = [group for group in groups if group]
+        logger.info(f"Voicemaker: Склеювання {total_audio_chunks} аудіочастин у {min(num_parallel_chunks, total_audio_chunks)} фінальних файлів для {task_key}...")
+
+        groups = [[item.output_path for item in group] for group in self._split_voicemaker_groups(sorted_items, num_parallel_chunks)]
         
         # Створюємо merged файли та відправляємо на транскрипцію
         for i, group_list in enumerate(groups):
@@ -1692,6 +1807,11 @@ class WorkflowManager:
         
         logger.info(f"Voicemaker: Склеювання для {task_key} завершено, відправлено {len(groups)} файлів на транскрипцію")
                 
+    def _raise_if_cancelled(self, _progress):
+        """Хук прогресу yt-dlp: перериває завантаження після зупинки черги."""
+        if self.cancel_token.is_cancelled:
+            raise yt_dlp.utils.DownloadCancelled("Обробку зупинено")
+
     def _video_download_worker(self, task):
         """
         Завантажує відео з будь-якого URL, використовуючи yt-dlp, і конвертує його в MP3.
@@ -1727,6 +1847,8 @@ class WorkflowManager:
                 'ignoreerrors': True,
                 'quiet': True,
                 'noprogress': True,
+                # Зупинка черги перериває завантаження на наступному фрагменті
+                'progress_hooks': [self._raise_if_cancelled],
             }
 
             if self.config.get("rewrite_settings", {}).get("use_cookies", False):
@@ -1785,6 +1907,9 @@ class WorkflowManager:
                     logger.error(f"Не вдалося знайти фінальний MP3 файл для {url}. Очікувався тут: {final_mp3_path}. Можливо, сталася помилка під час конвертації FFmpeg.")
                     return None
 
+        except yt_dlp.utils.DownloadCancelled:
+            logger.warning(f"Завантаження '{task.get('url', '')}' перервано: обробку зупинено.")
+            return None
         except yt_dlp.utils.DownloadError as e:
             logger.error(f"Помилка завантаження yt-dlp для URL '{task.get('url', '')}': {e}")
             logger.error("Перевірте, чи URL доступний, чи не потрібна VPN, та чи встановлено FFmpeg у системі.")
@@ -1793,11 +1918,150 @@ class WorkflowManager:
             logger.exception(f"Критична непередбачувана помилка під час завантаження відео з '{task.get('url', '')}': {e}")
             return None
 
-    def _concatenate_videos(self, app_instance, video_chunks, output_path):
-        """Об'єднання відеофрагментів."""
-        return concatenate_videos(app_instance, video_chunks, output_path)
+    def _render_montage_jobs(self, processing_items):
+        """
+        Монтаж усіх пар (завдання, мова) зі спільним бюджетом процесів ffmpeg.
+        Чанки всіх відео подаються в один пул у порядку черги, тож відео готуються по черзі,
+        а слоти не простоюють на коротких завданнях. Склеювання готового відео виконується
+        окремим потоком і не займає слот рендеру: тим часом пул уже рендерить наступне завдання.
+        """
+        jobs = [job for job in (self._prepare_montage_job(task_key, data) for task_key, data in processing_items) if job]
+        if not jobs:
+            return
+
+        resources = plan_montage_resources(
+            sum(len(job['image_chunks']) for job in jobs), sum(job['audio_seconds'] for job in jobs),
+            self.config.get('parallel_processing', {}), self.montage_api._encoder_params()[0]
+        )
+
+        finalize_futures = []
+        # Один пул підготовки зображень на всі чанки всіх завдань, а не окремий на кожен виклик create_video
+        with self.montage_api.image_prep_pool(), concurrent.futures.ThreadPoolExecutor(max_workers=1) as finalize_executor:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=resources['chunk_workers']) as executor:
+                chunk_futures = {}
+                for job in jobs:
+                    for i in range(len(job['image_chunks'])):
+                        chunk_futures[executor.submit(self._render_montage_chunk, job, i, resources)] = (job, i)
+
+                for future in concurrent.futures.as_completed(chunk_futures):
+                    job, chunk_index = chunk_futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Збій одного чанка не має зупиняти збір інших: чанк рахується невдалим, завдання завершиться з "❌"
+                        logger.exception(f"Монтаж -> Помилка чанка {chunk_index + 1} для {job['task_key']}: {e}")
+                        result = None
+                    if result:
+                        job['results'][chunk_index] = result
+                        self.app.increment_and_update_progress(job['queue_type'])
+                    job['pending'] -= 1
+                    if job['pending'] == 0:
+                        finalize_futures.append(finalize_executor.submit(self._finalize_montage_job, job))
+
+            for future in finalize_futures:
+                future.result()
+
+    def _prepare_montage_job(self, task_key, data):
+        """Перевіряє готовність матеріалів для монтажу однієї пари (завдання, мова) і розподіляє зображення по чанках."""
+        lang_code = task_key[1]
+        task_idx_str = task_key[0]
+        if not (data.get('task') and data.get('text_results') and data['task']['steps'][lang_code].get('create_video')):
+            return None
+
+        is_rewrite = data['task'].get('type') == 'Rewrite'
+        status_key = self._get_status_key(task_idx_str, lang_code, is_rewrite)
+
+        images_folder = data['text_results']['images_folder']
+        all_images = sorted([os.path.join(images_folder, f) for f in os.listdir(images_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
+        
+        if not data.get('audio_chunks') or not data.get('subs_chunks') or not all_images:
+            if status_key in self.app.task_completion_status:
+                self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
+            return None
+
+        if status_key in self.app.task_completion_status:
+            self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "0.0%"
+            self.app.root.after(0, self.app.update_task_status_display)
+
+        os.makedirs(os.path.join(data['temp_dir'], "video"), exist_ok=True)
+        return {
+            'task_key': task_key, 'data': data, 'status_key': status_key, 'is_rewrite': is_rewrite,
+            'queue_type': 'rewrite' if is_rewrite else 'main',
+            'image_chunks': split_images_by_duration(all_images, data['audio_chunks']),
+            'audio_seconds': sum(get_media_duration(p) or 0 for p in data['audio_chunks']),
+            'results': {}, 'pending': len(data['audio_chunks'])
+        }
+
+    def _render_montage_chunk(self, job, chunk_index, resources):
+        """Рендерить один чанк відео в слоті спільного пулу монтажу."""
+        task_key, data = job['task_key'], job['data']
+        if not self.app._check_app_state():
+            logger.warning(f"Монтаж зупинено користувачем, чанк {chunk_index + 1} для {task_key} пропущено.")
+            return None
+
+        # Встановлюємо поточне завдання, що обробляється
+        if self.app.current_processing_task_index != task_key[0]:
+            self.app.current_processing_task_index = task_key[0]
+            self.app.root.after(0, self.app.update_queue_display)  # Оновлюємо відображення статусу
+
+        output_path = os.path.join(data['temp_dir'], "video", f"video_chunk_{chunk_index:02d}.mp4")
+        return self._video_chunk_worker(self.app, list(job['image_chunks'][chunk_index]), data['audio_chunks'][chunk_index], data['subs_chunks'][chunk_index],
+                                        output_path, chunk_index + 1, len(job['image_chunks']), task_key, resources)
+
+    def _finalize_montage_job(self, job):
+        """Склеює чанки готового відео та оновлює статус завдання."""
+        task_key, data, status_key = job['task_key'], job['data'], job['status_key']
+        lang_code = task_key[1]
+        num_chunks = len(job['image_chunks'])
+        video_chunk_paths = [job['results'][i] for i in sorted(job['results'].keys())]
+
+        if self.cancel_token.is_cancelled:
+            # Зупинка користувачем: не помилка, звіт не надсилаємо, тимчасові файли лишаються для повторного запуску
+            data['montage_failed'] = True
+            if status_key in self.app.task_completion_status:
+                self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Зупинено"
+            self.app.root.after(0, self.app.update_task_status_display)
+            return
+
+        if len(video_chunk_paths) == num_chunks:
+            base_name = sanitize_filename(data['text_results'].get('video_title', data['text_results'].get('task_name', f"Task_{task_key[0]}")))
+            final_video_path = os.path.join(data['text_results']['output_path'], f"video_{base_name}_{lang_code}{self.montage_api.soft_subtitle_extension()}")
+            
+            if self._concatenate_videos(self.app, video_chunk_paths, final_video_path, data['audio_chunks']):
+                # Додаткові формати (наприклад, shorts 9:16) відрендерені тим самим проходом, лишається їх склеїти
+                for profile in self.montage_api.output_profiles():
+                    profile_chunks = [self.montage_api.profile_output_path(p, profile) for p in video_chunk_paths]
+                    profile_path = self.montage_api.profile_output_path(final_video_path, profile)
+                    if not self._concatenate_videos(self.app, profile_chunks, profile_path, data['audio_chunks']):
+                        logger.error(f"Монтаж -> Не вдалося склеїти формат '{profile.get('name')}' для {task_key}.")
+                montage_cfg = self.config.get('montage', {})
+                if montage_cfg.get('subtitle_mode', 'burn') == 'soft' and montage_cfg.get('soft_subtitle_burned_copy', False):
+                    # Копія з вшитими субтитрами для платформ, що не підтримують м'які субтитри
+                    hardsub_path = os.path.join(data['text_results']['output_path'], f"video_{base_name}_{lang_code}_hardsub.mp4")
+                    self.montage_api.burn_subtitles(final_video_path, hardsub_path)
+                self.app.increment_and_update_progress(job['queue_type'])
+                if status_key in self.app.task_completion_status:
+                    self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "100.0%"
+                if job['is_rewrite'] and 'original_filename' in data['task']:
+                    self.app.save_processed_link(data['task']['original_filename'])
+            else:
+                data['montage_failed'] = True
+                if status_key in self.app.task_completion_status:
+                    self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
+        else:
+            # Тимчасові файли залишаються, щоб при повторному запуску перерендерити лише невдалі чанки
+            data['montage_failed'] = True
+            if status_key in self.app.task_completion_status:
+                self.app.task_completion_status[status_key]['steps'][self.app._t('step_name_create_video')] = "Помилка"
+        
+        if self.config.get("telegram", {}).get("report_timing", "per_task") == "per_language":
+            self.app.send_task_completion_report(data['task'], single_lang_code=lang_code)
+
+    def _concatenate_videos(self, app_instance, video_chunks, output_path, audio_chunks=None):
+        """Об'єднання відеофрагментів; аудіо (якщо передано) кодується один раз для всього відео."""
+        return concatenate_videos(app_instance, video_chunks, output_path, audio_chunks)
 
-    def _video_chunk_worker(self, app_instance, image_chunk, audio_path, subs_path, output_path, chunk_num, total_chunks, task_key):
+    def _video_chunk_worker(self, app_instance, image_chunk, audio_path, subs_path, output_path, chunk_num, total_chunks, task_key, resources=None):
         """Створення одного відеофрагменту."""
         from utils.media_utils import video_chunk_worker
-        return video_chunk_worker(app_instance, image_chunk, audio_path, subs_path, output_path, chunk_num, total_chunks, task_key)
+        return video_chunk_worker(app_instance, image_chunk, audio_path, subs_path, output_path, chunk_num, total_chunks, task_key, resources)
@@ -17,6 +17,8 @@ def create_queue_tab(notebook, app):
     ttk.Button(buttons_frame, text=app._t('process_queue_button'), command=app.process_queue, bootstyle="success").pack(side='left', padx=5)
     app.pause_resume_button = ttk.Button(buttons_frame, text=app._t('pause_button'), command=app.toggle_pause_resume, bootstyle="warning", state="disabled")
     app.pause_resume_button.pack(side='left', padx=5)
+    app.stop_queue_button = ttk.Button(buttons_frame, text=app._t('stop_queue_button'), command=app.stop_queue, bootstyle="secondary", state="disabled")
+    app.stop_queue_button.pack(side='left', padx=5)
     ttk.Button(buttons_frame, text=app._t('clear_queue_button'), command=app.clear_queue, bootstyle="danger").pack(side='left', padx=5)
 
     progress_container = ttk.Frame(top_controls_frame)
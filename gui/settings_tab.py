@@ -72,6 +72,9 @@ def create_api_settings_subtabs(parent_tab, app):
     
     ttk.Button(or_frame, text="🔄", command=app.reset_openrouter_balance, bootstyle="light-outline", width=3).grid(row=1, column=2, padx=5, pady=5)
 
+    app.or_streaming_var = tk.BooleanVar(value=app.config["openrouter"].get("streaming_enabled", False))
+    ttk.Checkbutton(or_frame, variable=app.or_streaming_var, text=app._t('or_streaming_label')).grid(row=2, column=0, columnspan=3, sticky='w', padx=5, pady=5)
+
     models_frame = ttk.Labelframe(or_scroll_frame, text=app._t('saved_models_label'), bootstyle="secondary")
     models_frame.pack(fill='x', padx=10, pady=5)
     models_frame.grid_columnconfigure(0, weight=1)
@@ -382,6 +385,15 @@ def create_prompts_settings_tab(parent_tab, app):
     trans_tokens_spinbox = ttk.Spinbox(trans_prompt_frame, from_=1, to=128000, textvariable=app.trans_tokens_var, width=10)
     trans_tokens_spinbox.grid(row=2, column=1, sticky='w', padx=5, pady=5)
     add_text_widget_bindings(app, trans_tokens_spinbox)
+
+    segment_cfg = app.config["openrouter"].get("segmented_translation", {})
+    app.segmented_translation_var = tk.BooleanVar(value=segment_cfg.get("enabled", True))
+    ttk.Checkbutton(trans_prompt_frame, variable=app.segmented_translation_var, text=app._t('segmented_translation_label')).grid(row=3, column=0, columnspan=3, sticky='w', padx=5, pady=5)
+    ttk.Label(trans_prompt_frame, text=app._t('segment_chars_label')).grid(row=4, column=0, sticky='w', padx=5, pady=5)
+    app.segment_chars_var = tk.IntVar(value=segment_cfg.get("segment_chars", 3000))
+    segment_chars_spinbox = ttk.Spinbox(trans_prompt_frame, from_=500, to=20000, increment=500, textvariable=app.segment_chars_var, width=10)
+    segment_chars_spinbox.grid(row=4, column=1, sticky='w', padx=5, pady=5)
+    add_text_widget_bindings(app, segment_chars_spinbox)
     
     rewrite_frame = ttk.Labelframe(scrollable_frame, text=app._t("rewrite_model_label"))
     rewrite_frame.pack(fill='x', padx=10, pady=5)
@@ -515,6 +527,9 @@ def create_prompts_settings_tab(parent_tab, app):
     cta_tokens_spinbox.grid(row=3, column=1, sticky='w', padx=5, pady=5)
     add_text_widget_bindings(app, cta_tokens_spinbox)
 
+    app.combined_cta_prompts_var = tk.BooleanVar(value=app.config["openrouter"].get("combined_cta_prompts", False))
+    ttk.Checkbutton(cta_frame, variable=app.combined_cta_prompts_var, text=app._t('combined_cta_prompts_label')).grid(row=4, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+
 def create_montage_settings_tab(parent_tab, app):
     _, scrollable_frame = create_scrollable_tab(app, parent_tab)
 
@@ -527,8 +542,14 @@ def create_montage_settings_tab(parent_tab, app):
     ttk.Label(p_frame, text=app._t('num_chunks_label')).grid(row=1, column=0, sticky='w', padx=5, pady=2)
     app.parallel_num_chunks_var = tk.IntVar(value=parallel_cfg.get('num_chunks', 3))
     ttk.Spinbox(p_frame, from_=1, to=20, textvariable=app.parallel_num_chunks_var, width=10).grid(row=1, column=1, sticky='w', padx=5, pady=2)
+    ttk.Label(p_frame, text=app._t('montage_workers_label')).grid(row=2, column=0, sticky='w', padx=5, pady=2)
+    app.parallel_montage_workers_var = tk.IntVar(value=parallel_cfg.get('montage_workers', 0))
+    ttk.Spinbox(p_frame, from_=0, to=64, textvariable=app.parallel_montage_workers_var, width=10).grid(row=2, column=1, sticky='w', padx=5, pady=2)
+    ttk.Label(p_frame, text=app._t('ffmpeg_threads_label')).grid(row=3, column=0, sticky='w', padx=5, pady=2)
+    app.parallel_ffmpeg_threads_var = tk.IntVar(value=parallel_cfg.get('ffmpeg_threads', 0))
+    ttk.Spinbox(p_frame, from_=0, to=64, textvariable=app.parallel_ffmpeg_threads_var, width=10).grid(row=3, column=1, sticky='w', padx=5, pady=2)
     app.parallel_keep_temps_var = tk.BooleanVar(value=parallel_cfg.get('keep_temp_files', False))
-    ttk.Checkbutton(p_frame, variable=app.parallel_keep_temps_var, text=app._t('keep_temp_files_label'), bootstyle="light-round-toggle").grid(row=2, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+    ttk.Checkbutton(p_frame, variable=app.parallel_keep_temps_var, text=app._t('keep_temp_files_label'), bootstyle="light-round-toggle").grid(row=4, column=0, columnspan=2, sticky='w', padx=5, pady=5)
     
     montage_cfg = app.config.get('montage', {})
     montage_frame = ttk.Labelframe(scrollable_frame, text=app._t('montage_settings_label'))
@@ -721,6 +742,42 @@ def create_montage_settings_tab(parent_tab, app):
     vt_bitrate_entry.pack(side='left', padx=5)
     add_text_widget_bindings(app, vt_bitrate_entry)
 
+    app.calibrate_encoder_button = ttk.Button(codec_frame, text=app._t('calibrate_encoder_button'), command=app._calibrate_encoder, bootstyle="secondary-outline")
+    app.calibrate_encoder_button.pack(side='bottom', anchor='w', padx=5, pady=5)
+
+    # --- Рівні якості рендеру ---
+    quality_tiers = list(montage_cfg.get('quality_tiers', DEFAULT_CONFIG['montage']['quality_tiers']).keys())
+    quality_frame = ttk.Labelframe(scrollable_frame, text=app._t('quality_tier_settings_label'))
+    quality_frame.pack(fill='x', padx=10, pady=5)
+    ttk.Label(quality_frame, text=app._t('quality_tier_label')).grid(row=0, column=0, sticky='w', padx=5, pady=2)
+    app.montage_quality_tier_var = tk.StringVar(value=montage_cfg.get('quality_tier', 'final'))
+    ttk.Combobox(quality_frame, textvariable=app.montage_quality_tier_var, values=quality_tiers, state="readonly", width=18).grid(row=0, column=1, sticky='w', padx=5, pady=2)
+    ttk.Label(quality_frame, text=app._t('preview_quality_tier_label')).grid(row=1, column=0, sticky='w', padx=5, pady=2)
+    app.montage_preview_quality_tier_var = tk.StringVar(value=montage_cfg.get('preview_quality_tier', 'draft'))
+    ttk.Combobox(quality_frame, textvariable=app.montage_preview_quality_tier_var, values=quality_tiers, state="readonly", width=18).grid(row=1, column=1, sticky='w', padx=5, pady=2)
+    app.montage_output_profiles_enabled_var = tk.BooleanVar(value=montage_cfg.get('output_profiles_enabled', False))
+    ttk.Checkbutton(quality_frame, variable=app.montage_output_profiles_enabled_var, text=app._t('output_profiles_enabled_label'), bootstyle="light-round-toggle").grid(row=2, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+    app.montage_image_budget_enabled_var = tk.BooleanVar(value=montage_cfg.get('image_budget_enabled', True))
+    ttk.Checkbutton(quality_frame, variable=app.montage_image_budget_enabled_var, text=app._t('image_budget_enabled_label'), bootstyle="light-round-toggle").grid(row=3, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+    ttk.Label(quality_frame, text=app._t('image_budget_seconds_label')).grid(row=4, column=0, sticky='w', padx=5, pady=2)
+    app.montage_image_budget_seconds_var = tk.DoubleVar(value=montage_cfg.get('image_budget_seconds_per_image', 8.0))
+    ttk.Spinbox(quality_frame, from_=2.0, to=60.0, increment=0.5, textvariable=app.montage_image_budget_seconds_var, width=8).grid(row=4, column=1, sticky='w', padx=5, pady=2)
+    ttk.Label(quality_frame, text=app._t('image_framing_label')).grid(row=5, column=0, sticky='w', padx=5, pady=2)
+    app.montage_image_framing_var = tk.StringVar(value=montage_cfg.get('image_framing', 'auto'))
+    ttk.Combobox(quality_frame, textvariable=app.montage_image_framing_var, values=["auto", "crop", "fit"], state="readonly", width=18).grid(row=5, column=1, sticky='w', padx=5, pady=2)
+
+    # --- Режим субтитрів ---
+    subs_frame = ttk.Labelframe(scrollable_frame, text=app._t('subtitle_output_settings_label'))
+    subs_frame.pack(fill='x', padx=10, pady=5)
+    ttk.Label(subs_frame, text=app._t('subtitle_mode_label')).grid(row=0, column=0, sticky='w', padx=5, pady=2)
+    app.montage_subtitle_mode_var = tk.StringVar(value=montage_cfg.get('subtitle_mode', 'burn'))
+    ttk.Combobox(subs_frame, textvariable=app.montage_subtitle_mode_var, values=["burn", "soft"], state="readonly", width=18).grid(row=0, column=1, sticky='w', padx=5, pady=2)
+    ttk.Label(subs_frame, text=app._t('soft_subtitle_container_label')).grid(row=1, column=0, sticky='w', padx=5, pady=2)
+    app.montage_soft_subtitle_container_var = tk.StringVar(value=montage_cfg.get('soft_subtitle_container', 'mkv'))
+    ttk.Combobox(subs_frame, textvariable=app.montage_soft_subtitle_container_var, values=["mkv", "mp4"], state="readonly", width=18).grid(row=1, column=1, sticky='w', padx=5, pady=2)
+    app.montage_soft_subtitle_burned_copy_var = tk.BooleanVar(value=montage_cfg.get('soft_subtitle_burned_copy', False))
+    ttk.Checkbutton(subs_frame, variable=app.montage_soft_subtitle_burned_copy_var, text=app._t('soft_subtitle_burned_copy_label'), bootstyle="light-round-toggle").grid(row=2, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+
     # --- Кнопка попереднього перегляду ---
     preview_frame = ttk.Frame(scrollable_frame)
     preview_frame.pack(fill='x', padx=10, pady=10)
@@ -778,6 +835,18 @@ def create_other_settings_tab(parent_tab, app):
     app.auto_switch_retries_var = tk.IntVar(value=app.config.get("ui_settings", {}).get("auto_switch_retry_limit", 10))
     ttk.Spinbox(auto_switch_frame, from_=1, to=50, textvariable=app.auto_switch_retries_var, width=5).pack(side='left')
 
+    app.show_queue_estimate_var = tk.BooleanVar(value=app.config.get("ui_settings", {}).get("show_queue_estimate", True))
+    ttk.Checkbutton(general_frame, variable=app.show_queue_estimate_var, text=app._t('show_queue_estimate_label')).grid(row=5, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+
+    retry_cfg = app.config.get("retry_policy", DEFAULT_CONFIG["retry_policy"])
+    retry_frame = ttk.Frame(general_frame)
+    retry_frame.grid(row=6, column=0, columnspan=3, sticky='w', padx=5, pady=5)
+    ttk.Label(retry_frame, text=app._t('retry_max_attempts_label')).pack(side='left', padx=(0, 2))
+    app.retry_max_attempts_var = tk.IntVar(value=retry_cfg.get("max_attempts", 8))
+    ttk.Spinbox(retry_frame, from_=1, to=50, textvariable=app.retry_max_attempts_var, width=5).pack(side='left')
+    app.tts_fallback_var = tk.BooleanVar(value=retry_cfg.get("tts_fallback_enabled", False))
+    ttk.Checkbutton(retry_frame, variable=app.tts_fallback_var, text=app._t('tts_fallback_label')).pack(side='left', padx=(10, 0))
+
 
     output_cfg = app.config.get('output_settings', DEFAULT_CONFIG['output_settings'])
     output_frame = ttk.Labelframe(scrollable_frame, text=app._t('output_settings_label'))
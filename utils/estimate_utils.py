@@ -0,0 +1,141 @@
+# utils/estimate_utils.py
+
+import logging
+
+from utils.history_utils import tts_voice_key, count_sentences
+from utils.media_utils import image_budget
+from utils.resource_utils import plan_montage_resources
+
+logger = logging.getLogger("TranslationApp")
+
+# Типові значення, поки в історії запусків немає власних вимірів
+DEFAULT_TTS_CHARS_PER_SECOND = 40.0
+DEFAULT_IMAGES_PER_MINUTE = {'googler': 20.0, 'pollinations': 4.0, 'recraft': 6.0}
+DEFAULT_MONTAGE_FPS = 30.0
+DEFAULT_IMAGES_PER_1K_CHARS = 1.0
+DEFAULT_REWRITE_CHARS = 8000
+# Середня довжина речення, коли відомий лише обсяг тексту (рерайт до транскрипції)
+AVERAGE_SENTENCE_CHARS = 80
+
+def estimate_queue(app, task_queue) -> dict:
+    """
+    Оцінює тривалість і витрати черги до запуску за статистикою RunHistory.
+    Озвучка всіх завдань іде спільним пулом з num_chunks воркерів, зображення генеруються
+    послідовно паралельно з озвучкою, монтаж усіх чанків - спільним пулом після підготовки.
+    Повертає dict:
+      'items'            - [{'task_name', 'lang', 'chars', 'audio_seconds', 'images', 'seconds'}, ...];
+      'total_seconds'    - орієнтовний час усієї черги;
+      'elevenlabs_chars' - символи ElevenLabs; 'googler_images' - зображення Googler;
+      'flags'            - [{'type': 'elevenlabs'|'googler', 'task_name', 'lang', 'limit'}, ...];
+      'defaults_used'    - чи для якихось етапів бракувало статистики.
+    """
+    config = app.config
+    history = app.run_history
+    num_chunks = max(1, config.get('parallel_processing', {}).get('num_chunks', 3))
+    image_provider = app.active_image_api_var.get()
+    montage_key = app.montage_api.history_key()
+    tier = app.montage_api._quality_settings()
+    output_fps = tier['fps'] or config.get('montage', {}).get('output_framerate', 30)
+
+    defaults_used = False
+
+    def rate(stage, key, default):
+        nonlocal defaults_used
+        value = history.throughput(stage, key)
+        if value is None:
+            defaults_used = True
+            return default
+        return value
+
+    image_density = history.average_value('images_per_1k_chars')
+    if image_density is None:
+        defaults_used = True
+        image_density = DEFAULT_IMAGES_PER_1K_CHARS
+    images_per_second = rate('images', image_provider, DEFAULT_IMAGES_PER_MINUTE.get(image_provider, 5.0) / 60.0)
+    montage_fps = rate('montage', montage_key, DEFAULT_MONTAGE_FPS)
+
+    items = []
+    tts_seconds_total = image_seconds_total = montage_frames_total = audio_seconds_total = 0.0
+    for task in task_queue:
+        is_rewrite = task.get('type') == 'Rewrite'
+        text = '' if is_rewrite else task.get('input_text', '')
+        for lang_code in task['selected_langs']:
+            steps = task['steps'][lang_code]
+            lang_config = config.get('languages', {}).get(lang_code, {})
+            chars = len(text) if text else int(history.average_value('rewrite_chars', DEFAULT_REWRITE_CHARS))
+            item = {'task_name': task.get('task_name', ''), 'lang': lang_code, 'chars': chars,
+                    'tts_service': lang_config.get('tts_service', 'elevenlabs'), 'audio_seconds': 0.0, 'images': 0, 'seconds': 0.0}
+
+            if steps.get('audio'):
+                voice_key = tts_voice_key(lang_config)
+                per_char, per_sentence = history.speech_model(voice_key)
+                sentences = count_sentences(text) if text else chars / AVERAGE_SENTENCE_CHARS
+                item['audio_seconds'] = chars * per_char + sentences * per_sentence
+                tts_seconds = chars / rate('tts', voice_key, DEFAULT_TTS_CHARS_PER_SECOND)
+                tts_seconds_total += tts_seconds
+                item['seconds'] += tts_seconds / num_chunks
+
+            if steps.get('gen_images'):
+                montage_cfg = config.get('montage', {})
+                if montage_cfg.get('image_budget_enabled', True) and item['audio_seconds']:
+                    item['images'] = image_budget(item['audio_seconds'], montage_cfg)
+                else:
+                    item['images'] = max(1, round(chars / 1000 * image_density))
+                image_seconds = item['images'] / images_per_second
+                image_seconds_total += image_seconds
+                item['seconds'] += image_seconds
+
+            if steps.get('create_video') and item['audio_seconds']:
+                frames = item['audio_seconds'] * output_fps
+                montage_frames_total += frames
+                audio_seconds_total += item['audio_seconds']
+                item['seconds'] += frames / montage_fps
+            items.append(item)
+
+    # Підготовка: озвучка в пулі воркерів паралельно з послідовною генерацією зображень
+    preparation_seconds = max(tts_seconds_total / num_chunks, image_seconds_total)
+    montage_seconds = 0.0
+    if montage_frames_total:
+        video_codec, _ = app.montage_api._encoder_params()
+        chunk_workers = plan_montage_resources(num_chunks * len(items), audio_seconds_total, config.get('parallel_processing', {}), video_codec)['chunk_workers']
+        montage_seconds = montage_frames_total / montage_fps / chunk_workers
+
+    elevenlabs_chars = sum(i['chars'] for i in items if i['tts_service'] == 'elevenlabs' and i['audio_seconds'])
+    googler_images = sum(i['images'] for i in items) if image_provider == 'googler' else 0
+    flags = _quota_flags(app, items, image_provider)
+    if defaults_used:
+        logger.info("Оцінка черги -> Для частини етапів ще немає статистики, використано типові значення.")
+
+    return {
+        'items': items,
+        'total_seconds': preparation_seconds + montage_seconds,
+        'elevenlabs_chars': elevenlabs_chars,
+        'googler_images': googler_images,
+        'flags': flags,
+        'defaults_used': defaults_used
+    }
+
+def _quota_flags(app, items, image_provider) -> list:
+    """Позначає завдання, на яких черга вийде за баланс ElevenLabs або годинну квоту Googler."""
+    flags = []
+    balance = getattr(app.el_api, 'balance', None)
+    if isinstance(balance, (int, float)):
+        used = 0
+        for item in items:
+            if item['tts_service'] != 'elevenlabs' or not item['audio_seconds']:
+                continue
+            used += item['chars']
+            if used > balance:
+                flags.append({'type': 'elevenlabs', 'task_name': item['task_name'], 'lang': item['lang'], 'limit': balance})
+
+    usage_stats = getattr(app.googler_api, 'last_usage_stats', None) if image_provider == 'googler' else None
+    if usage_stats:
+        limit = usage_stats.get('account_limits', {}).get('img_gen_per_hour_limit')
+        current = usage_stats.get('current_usage', {}).get('hourly_usage', {}).get('image_generation', {}).get('current_usage', 0)
+        if isinstance(limit, (int, float)) and isinstance(current, (int, float)):
+            used = current
+            for item in items:
+                used += item['images']
+                if item['images'] and used > limit:
+                    flags.append({'type': 'googler', 'task_name': item['task_name'], 'lang': item['lang'], 'limit': limit})
+    return flags
@@ -1,5 +1,6 @@
 # utils/file_utils.py
 
+import os
 import re
 import logging
 import math
@@ -12,6 +13,33 @@ def sanitize_filename(name):
     name = name.strip().rstrip('.')
     return name[:150].strip()
 
+def prune_cache_dir(cache_dir: str, max_bytes: int):
+    """Видаляє найдавніше використані файли кешу, поки загальний розмір не стане меншим за max_bytes."""
+    if not max_bytes or max_bytes <= 0 or not os.path.isdir(cache_dir):
+        return
+    try:
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"Cache -> Removed {removed} old files from {cache_dir}.")
+    except Exception as e:
+        logger.warning(f"Cache -> Failed to prune {cache_dir}: {e}")
+
 def chunk_text(text: str, num_chunks: int) -> list[str]:
     if num_chunks <= 0: return [text]
     sentences = re.split(r'(?<=[.!?])\s+', text)
@@ -30,6 +58,81 @@ def chunk_text(text: str, num_chunks: int) -> list[str]:
         sent_idx += num_to_take
     return [c for c in chunks if c.strip()]
 
+def chunk_text_balanced(text: str, num_chunks: int, char_limit: int = None,
+                        sec_per_char: float = 1.0 / 15.0, sec_per_sentence: float = 0.0) -> list[str]:
+    """
+    Розбиває текст по реченнях на num_chunks частин з приблизно однаковою прогнозованою тривалістю озвучки.
+    Тривалість речення оцінюється як len * sec_per_char + sec_per_sentence (коефіцієнти голосу з історії запусків).
+    Якщо задано char_limit, жодна частина його не перевищує (частин тоді може стати більше).
+    """
+    sentences = [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s.strip()]
+    if char_limit:
+        # Речення, довші за ліміт, ріжемо так само, як для Voicemaker
+        sentences = [part for s in sentences for part in (chunk_text_voicemaker(s, char_limit) if len(s) > char_limit else [s])]
+    if not sentences:
+        return []
+    if len(sentences) < num_chunks:
+        # Речень менше, ніж частин: кожне речення - окрема частина, слова посередині не розриваються
+        logger.info(f"Text has {len(sentences)} sentences, fewer than {num_chunks} chunks requested; one chunk per sentence.")
+        return sentences
+
+    weights = [len(s) * sec_per_char + sec_per_sentence for s in sentences]
+    target = sum(weights) / max(1, num_chunks)
+
+    chunks, current, current_len, elapsed = [], [], 0, 0.0
+    for sentence, weight in zip(sentences, weights):
+        boundary = (len(chunks) + 1) * target
+        # Закриваємо частину, якщо середина речення вже за межею або воно не влазить у ліміт
+        past_boundary = len(chunks) < num_chunks - 1 and elapsed + weight / 2 > boundary
+        over_limit = char_limit and current_len + len(sentence) + 1 > char_limit
+        if current and (past_boundary or over_limit):
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(sentence)
+        current_len += len(sentence) + 1
+        elapsed += weight
+    if current:
+        chunks.append(" ".join(current))
+
+    logger.info(f"Text split into {len(chunks)} duration-balanced chunks (~{target:.0f}s each).")
+    return chunks
+
+def _split_keep_separators(text: str, pattern: str) -> list[tuple[str, str]]:
+    parts, pos = [], 0
+    for match in re.finditer(pattern, text):
+        parts.append((text[pos:match.start()], match.group()))
+        pos = match.end()
+    parts.append((text[pos:], ''))
+    return parts
+
+def split_text_segments(text: str, segment_chars: int) -> list[tuple[str, str]]:
+    """
+    Ділить текст на сегменти до segment_chars символів по межах абзаців (задовгі абзаци - по реченнях).
+    Повертає [(segment, separator), ...], де separator - пробіли/переноси після сегмента,
+    тож "".join(segment + separator) відтворює текст і його розбивку на абзаци.
+    """
+    pieces = []
+    for paragraph, paragraph_sep in _split_keep_separators(text.strip(), r'\n\s*\n'):
+        if len(paragraph) > segment_chars:
+            sentences = _split_keep_separators(paragraph, r'(?<=[.!?])\s+')
+            sentences[-1] = (sentences[-1][0], paragraph_sep)
+            pieces.extend(sentences)
+        else:
+            pieces.append((paragraph, paragraph_sep))
+
+    segments, current, pending_sep = [], '', ''
+    for piece, sep in pieces:
+        if current and len(current) + len(pending_sep) + len(piece) > segment_chars:
+            segments.append((current, pending_sep))
+            current = piece
+        else:
+            current = current + pending_sep + piece if current else piece
+        pending_sep = sep
+    if current:
+        segments.append((current, ''))
+    logger.info(f"Text split into {len(segments)} translation segments (limit {segment_chars} chars).")
+    return segments
+
 def chunk_text_voicemaker(text: str, limit: int) -> list[str]:
     chunks, remaining_text = [], text.strip()
     while len(remaining_text) > limit:
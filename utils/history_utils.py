@@ -0,0 +1,151 @@
+# utils/history_utils.py
+
+import os
+import re
+import json
+import logging
+import threading
+
+import numpy as np
+
+from constants.app_settings import RUN_HISTORY_FILE
+from utils.media_utils import get_media_duration
+
+logger = logging.getLogger("TranslationApp")
+
+# Типова швидкість мовлення, поки для голосу немає власної статистики
+DEFAULT_SECONDS_PER_CHAR = 1.0 / 15.0
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+def count_sentences(text: str) -> int:
+    return len([s for s in SENTENCE_SPLIT_RE.split(text.strip()) if s.strip()])
+
+def tts_voice_key(lang_config: dict) -> str:
+    """Ключ голосу для статистики: сервіс + голос (і швидкість для Speechify)."""
+    tts_service = lang_config.get("tts_service", "elevenlabs")
+    if tts_service == "elevenlabs":
+        return f"elevenlabs:{lang_config.get('elevenlabs_template_uuid', '')}"
+    if tts_service == "voicemaker":
+        return f"voicemaker:{lang_config.get('voicemaker_voice_id', '')}"
+    if tts_service == "speechify":
+        return f"speechify:{lang_config.get('speechify_voice_id', '')}:{lang_config.get('speechify_rate', 0)}"
+    return tts_service
+
+def format_duration(seconds) -> str:
+    """Коротке подання тривалості для статусів і звітів: '1г 05хв', '3хв 20с', '45с'."""
+    seconds = max(0, int(round(seconds or 0)))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}г {minutes:02d}хв"
+    if minutes:
+        return f"{minutes}хв {secs:02d}с"
+    return f"{secs}с"
+
+class RunHistory:
+    """
+    Статистика попередніх запусків, що зберігається між сесіями в run_history.json.
+    Містить виміряну тривалість озвучки для кожного голосу (з неї оцінюється швидкість
+    мовлення при розбитті тексту на частини) та продуктивність етапів конвеєра.
+    """
+    MAX_SPEECH_SAMPLES = 50
+
+    def __init__(self, path=RUN_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Не вдалося прочитати історію запусків {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Не вдалося зберегти історію запусків {self.path}: {e}")
+
+    def record_speech(self, voice_key: str, chars: int, sentences: int, seconds: float):
+        """Додає вимір: скільки секунд зайняв текст з chars символів і sentences речень."""
+        if chars <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            samples = self._data.setdefault('speech', {}).setdefault(voice_key, [])
+            samples.append([chars, sentences, round(seconds, 3)])
+            del samples[:-self.MAX_SPEECH_SAMPLES]
+            self._save()
+
+    def record_tts_result(self, lang_config: dict, text: str, audio_path: str):
+        """Вимірює тривалість готового аудіо і записує її для голосу з lang_config."""
+        duration = get_media_duration(audio_path)
+        if duration:
+            self.record_speech(tts_voice_key(lang_config), len(text), count_sentences(text), duration)
+
+    def speech_model(self, voice_key: str):
+        """
+        Повертає (секунд на символ, секунд на речення) для голосу.
+        Коефіцієнти підбираються методом найменших квадратів по збережених вимірах;
+        без достатньої статистики - типова швидкість без окремої паузи на речення.
+        """
+        with self._lock:
+            samples = list(self._data.get('speech', {}).get(voice_key, []))
+        if not samples:
+            return DEFAULT_SECONDS_PER_CHAR, 0.0
+
+        data = np.array(samples, dtype=float)
+        chars, sentences, seconds = data[:, 0], data[:, 1], data[:, 2]
+        if len(samples) >= 3 and np.ptp(sentences / chars) > 0:
+            (per_char, per_sentence), *_ = np.linalg.lstsq(np.column_stack([chars, sentences]), seconds, rcond=None)
+            if per_char > 0 and per_sentence >= 0:
+                return float(per_char), float(per_sentence)
+        return float(seconds.sum() / chars.sum()), 0.0
+
+    def estimate_speech_seconds(self, voice_key: str, text: str) -> float:
+        per_char, per_sentence = self.speech_model(voice_key)
+        return len(text) * per_char + count_sentences(text) * per_sentence
+
+    # --- Продуктивність етапів (для оцінки часу та витрат черги, див. utils/estimate_utils.py) ---
+    MAX_STAGE_SAMPLES = 50
+
+    def record_throughput(self, stage: str, key: str, units: float, seconds: float):
+        """
+        Додає вимір продуктивності етапу: units оброблено за seconds секунд реального часу.
+        stage - 'tts' (символи, ключ - голос), 'images' (зображення, ключ - сервіс),
+        'montage' (вихідні кадри, ключ - кодек|рух|якість).
+        """
+        if units <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            samples = self._data.setdefault('throughput', {}).setdefault(stage, {}).setdefault(key, [])
+            samples.append([round(units, 3), round(seconds, 3)])
+            del samples[:-self.MAX_STAGE_SAMPLES]
+            self._save()
+
+    def throughput(self, stage: str, key: str):
+        """Середня швидкість етапу (одиниць за секунду) або None, якщо вимірів ще немає."""
+        with self._lock:
+            samples = list(self._data.get('throughput', {}).get(stage, {}).get(key, []))
+        total_seconds = sum(s[1] for s in samples)
+        return sum(s[0] for s in samples) / total_seconds if total_seconds > 0 else None
+
+    def record_value(self, name: str, value: float):
+        """Зберігає довільний вимір (наприклад, довжину тексту рерайту), з якого береться середнє."""
+        with self._lock:
+            samples = self._data.setdefault('values', {}).setdefault(name, [])
+            samples.append(round(value, 4))
+            del samples[:-self.MAX_STAGE_SAMPLES]
+            self._save()
+
+    def average_value(self, name: str, default=None):
+        with self._lock:
+            samples = list(self._data.get('values', {}).get(name, []))
+        return sum(samples) / len(samples) if samples else default
@@ -0,0 +1,98 @@
+# utils/image_utils.py
+
+import os
+import hashlib
+import logging
+import concurrent.futures
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger("TranslationApp")
+
+# Змінюйте при зміні алгоритму підготовки, щоб старий кеш не використовувався
+PREPARE_VERSION = 2
+# Способи вписати зображення в кадр: crop - обрізати по центру, fit - з чорними полями, stretch - розтягнути
+FRAMING_MODES = ('crop', 'fit', 'stretch')
+
+def file_sha1(path: str) -> str:
+    """Повертає SHA1 вмісту файлу."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def prepare_montage_image(src_path: str, width: int, height: int, cache_dir: str, framing: str = 'crop') -> str:
+    """
+    Готує одне зображення для монтажу: декодує, вписує в кадр способом framing (FRAMING_MODES)
+    і масштабує рівно до width x height. Результат кешується без втрат (PNG) за хешем вмісту,
+    геометрією та способом кадрування. Запускається в процесі-воркері, тому працює лише з простими аргументами.
+    """
+    cache_name = f"{file_sha1(src_path)}_{width}x{height}_{framing}_v{PREPARE_VERSION}.png"
+    cache_path = os.path.join(cache_dir, cache_name)
+    if os.path.exists(cache_path) and os.path.getsize(cache_path) > 0:
+        os.utime(cache_path) # Оновлюємо час доступу для очищення кешу
+        return cache_path
+
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        if framing == 'fit':
+            prepared = ImageOps.pad(img, (width, height), method=Image.LANCZOS, color='black', centering=(0.5, 0.5))
+        elif framing == 'stretch':
+            prepared = img.resize((width, height), Image.LANCZOS)
+        else:
+            prepared = ImageOps.fit(img, (width, height), method=Image.LANCZOS, centering=(0.5, 0.5))
+
+    # Пишемо у тимчасовий файл і перейменовуємо, щоб паралельні рендери не прочитали недописаний кадр.
+    # Слабке стиснення PNG: кадр лишається без втрат, а запис не гальмує підготовку
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    prepared.save(tmp_path, format='PNG', compress_level=1)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+def prepare_montage_images(image_paths: list, width: int, height: int, cache_dir: str, framing: str = 'crop', max_workers=None, executor=None) -> list:
+    """
+    Готує всі зображення паралельно в пулі процесів executor (спільний пул запуску монтажу).
+    Без executor створює власний пул з max_workers процесів (за замовчуванням - за кількістю ядер).
+    Повертає список шляхів у тому ж порядку; для зображень, які не вдалося підготувати, - None.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    prepared = [None] * len(image_paths)
+    if not image_paths:
+        return prepared
+
+    try:
+        if executor is not None:
+            _collect_prepared_images(executor, image_paths, width, height, cache_dir, framing, prepared)
+        else:
+            workers = max(1, min(len(image_paths), max_workers or os.cpu_count() or 1))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as own_executor:
+                _collect_prepared_images(own_executor, image_paths, width, height, cache_dir, framing, prepared)
+    except Exception as e:
+        logger.error(f"Підготовка зображень -> Пул процесів недоступний: {e}", exc_info=True)
+
+    logger.info(f"Підготовка зображень -> Готово {sum(1 for p in prepared if p)}/{len(image_paths)} кадрів {width}x{height}.")
+    return prepared
+
+def _collect_prepared_images(executor, image_paths, width, height, cache_dir, framing, prepared):
+    futures = {executor.submit(prepare_montage_image, path, width, height, cache_dir, framing): i for i, path in enumerate(image_paths)}
+    for future in concurrent.futures.as_completed(futures):
+        i = futures[future]
+        try:
+            prepared[i] = future.result()
+        except Exception as e:
+            logger.warning(f"Підготовка зображень -> Не вдалося підготувати {os.path.basename(image_paths[i])}: {e}")
+
+def generate_test_image(path: str, width: int, height: int, seed: int = 0) -> str:
+    """
+    Створює синтетичне тестове зображення (кольоровий градієнт з шумом і деталями)
+    для калібрування кодека. Шум не дає кодеку стиснути кадр "безкоштовно", як однотонний фон.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, 3)
+    channels = [127 + 100 * np.sin(x / width * (3 + i) * np.pi + y / height * (2 + i) * np.pi + phase[i]) for i in range(3)]
+    pixels = np.stack(channels, axis=-1) + rng.normal(0, 18, (height, width, 3))
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB').save(path, format='JPEG', quality=92)
+    return path
@@ -1,11 +1,16 @@
 # utils/media_utils.py
 
 import os
+import json
 import random
+import hashlib
 import logging
 import contextlib
 import sys
 import ffmpeg
+import numpy as np
+
+from utils.image_utils import file_sha1
 
 logger = logging.getLogger("TranslationApp")
 
@@ -40,8 +45,12 @@ def concatenate_audio_files(audio_files: list, output_path: str) -> bool:
             os.remove(concat_list_path)
 
 
-def concatenate_videos(app, video_files, output_path):
-    """Concatenate multiple video files into a single output file."""
+def concatenate_videos(app, video_files, output_path, audio_files=None):
+    """
+    Concatenate multiple video files into a single output file.
+    If audio_files are given, the chunks are treated as video-only: the audio files are joined
+    and encoded to AAC once, which avoids per-chunk encoder priming gaps at the boundaries.
+    """
     if not video_files:
         logger.error("No video files to concatenate.")
         return False
@@ -56,13 +65,15 @@ def concatenate_videos(app, video_files, output_path):
             f.write(f"file '{safe_path}'\n")
 
     try:
-        (
-            ffmpeg
-            .input(concat_list_path, format='concat', safe=0)
-            .output(output_path, c='copy')
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)
-        )
+        joined = ffmpeg.input(concat_list_path, format='concat', safe=0)
+        if audio_files:
+            audio_inputs = [ffmpeg.input(p).audio for p in audio_files]
+            audio = audio_inputs[0] if len(audio_inputs) == 1 else ffmpeg.concat(*audio_inputs, v=0, a=1)
+            # 's?' keeps soft subtitle tracks if the chunks have them
+            output = ffmpeg.output(joined['v'], audio, joined['s?'], output_path, vcodec='copy', scodec='copy', acodec='aac')
+        else:
+            output = joined.output(output_path, c='copy', map='0')  # map=0 keeps soft subtitle tracks too
+        output.overwrite_output().run(capture_stdout=True, capture_stderr=True)
         logger.info("Video concatenation successful.")
         os.remove(concat_list_path)
         return True
@@ -73,17 +84,147 @@ def concatenate_videos(app, video_files, output_path):
         return False
 
 
-def video_chunk_worker(app, images_for_chunk, audio_path, subs_path, output_path, chunk_index, total_chunks, task_key):
+def get_media_duration(path):
+    """Returns media duration in seconds via ffprobe, or None if it cannot be read."""
+    try:
+        return float(ffmpeg.probe(path)['format']['duration'])
+    except Exception as e:
+        logger.warning(f"Could not probe duration of {os.path.basename(path)}: {e}")
+        return None
+
+# With transitions enabled every image takes part in two 1 s transitions
+MIN_SECONDS_PER_IMAGE_WITH_TRANSITIONS = 2.0
+
+def image_budget(narration_seconds, montage_cfg):
+    """
+    Number of images for a narration of the given length: one image per target seconds-per-image,
+    clamped to [image_budget_min, image_budget_max]. The target never drops below the shortest
+    slide create_video can show without squeezing its transitions.
+    """
+    seconds_per_image = montage_cfg.get('image_budget_seconds_per_image', 8.0)
+    if montage_cfg.get('transition_effect', 'fade') != "Без переходу":
+        seconds_per_image = max(seconds_per_image, MIN_SECONDS_PER_IMAGE_WITH_TRANSITIONS)
+    budget = int(round(narration_seconds / max(seconds_per_image, 0.5)))
+    return max(montage_cfg.get('image_budget_min', 3), min(montage_cfg.get('image_budget_max', 300), budget))
+
+def pick_evenly(items: list, count: int) -> list:
+    """Picks count items spread evenly over the list, so the kept images still cover the whole story."""
+    if count >= len(items):
+        return list(items)
+    if count <= 0:
+        return []
+    step = len(items) / count
+    return [items[int(i * step)] for i in range(count)]
+
+def split_images_by_duration(images: list, audio_chunks: list) -> list:
+    """
+    Splits images between audio chunks proportionally to each chunk's duration
+    (largest remainder method), so every chunk shows images for roughly the same time.
+    Every chunk gets at least one image when there are enough of them.
+    Falls back to an even split by count if any duration cannot be probed.
+    """
+    num_chunks = len(audio_chunks)
+    durations = [get_media_duration(p) for p in audio_chunks]
+    if num_chunks == 0 or any(not d for d in durations):
+        return [[str(p) for p in part] for part in np.array_split(images, max(1, num_chunks))]
+
+    min_per_chunk = 1 if len(images) >= num_chunks else 0
+    spare = len(images) - min_per_chunk * num_chunks
+    total_duration = sum(durations)
+    quotas = [spare * d / total_duration for d in durations]
+    counts = [min_per_chunk + int(q) for q in quotas]
+    remaining = len(images) - sum(counts)
+    for i in sorted(range(num_chunks), key=lambda i: quotas[i] - int(quotas[i]), reverse=True)[:remaining]:
+        counts[i] += 1
+
+    result, pos = [], 0
+    for count in counts:
+        result.append(images[pos:pos + count])
+        pos += count
+    logger.info("Image split by audio duration: " + ", ".join(f"{d:.0f}s->{c}" for d, c in zip(durations, counts)))
+    return result
+
+# Ключі налаштувань монтажу, які не впливають на відео (лише на транскрипцію)
+_NON_RENDER_MONTAGE_KEYS = ('whisper_', 'transcription_', 'vad_', 'amd_whisper_', 'clip_cache_', 'preview_', 'calibration', 'image_budget_')
+
+def build_chunk_manifest(montage_config, images_for_chunk, audio_path, subs_path):
+    """Builds the render manifest of a video chunk: hashes of all its inputs and of the montage settings."""
+    render_config = {k: v for k, v in montage_config.items() if not k.startswith(_NON_RENDER_MONTAGE_KEYS)}
+    return {
+        'images': [file_sha1(p) for p in images_for_chunk],
+        'audio': file_sha1(audio_path),
+        'subs': file_sha1(subs_path) if subs_path else None,
+        'video_only': True,
+        'montage_config': hashlib.sha1(json.dumps(render_config, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    }
+
+def _chunk_manifest_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}.manifest.json"
+
+def _read_chunk_manifest(output_path):
+    """Manifest of the last successful render of the chunk, or None if the chunk or manifest is missing."""
+    manifest_path = _chunk_manifest_path(output_path)
+    if not (os.path.exists(output_path) and os.path.getsize(output_path) > 0 and os.path.exists(manifest_path)):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_chunk_up_to_date(output_path, manifest):
+    """True if the chunk was rendered successfully before from exactly the same inputs."""
+    return _read_chunk_manifest(output_path) == manifest
+
+def only_subtitles_changed(output_path, manifest):
+    """True if the chunk was rendered before from the same images, audio and settings, and only the subtitles differ."""
+    previous = _read_chunk_manifest(output_path)
+    if not previous or previous.get('subs') == manifest.get('subs'):
+        return False
+    return {k: v for k, v in previous.items() if k != 'subs'} == {k: v for k, v in manifest.items() if k != 'subs'}
+
+def video_chunk_worker(app, images_for_chunk, audio_path, subs_path, output_path, chunk_index, total_chunks, task_key, resources=None):
     """Process a single video chunk using the montage API."""
     app.log_context.parallel_task = 'Video Montage'
     app.log_context.worker_id = f'Chunk {chunk_index}/{total_chunks}'
     try:
+        manifest_path = _chunk_manifest_path(output_path)
+        manifest = build_chunk_manifest(app.montage_api.config, images_for_chunk, audio_path, subs_path)
+        profiles = app.montage_api.output_profiles()
+        profile_paths = [app.montage_api.profile_output_path(output_path, p) for p in profiles]
+        if is_chunk_up_to_date(output_path, manifest) and all(os.path.exists(p) for p in profile_paths):
+            logger.info(f"Відео шматок {chunk_index}/{total_chunks} не змінився з останнього рендеру, використовується готовий файл.")
+            return output_path
+
+        # М'які субтитри - окрема доріжка, тож виправлені субтитри замінюються ремуксом без перекодування кадрів
+        soft_subs = app.montage_api.config.get('subtitle_mode', 'burn') == 'soft' and subs_path
+        if soft_subs and only_subtitles_changed(output_path, manifest) and all(os.path.exists(p) for p in profile_paths):
+            if all(app.montage_api.remux_subtitles(p, subs_path, p) for p in [output_path] + profile_paths):
+                logger.info(f"Відео шматок {chunk_index}/{total_chunks}: змінились лише субтитри, доріжку замінено без рендеру.")
+                with open(manifest_path, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2)
+                return output_path
+            logger.warning(f"Відео шматок {chunk_index}/{total_chunks}: ремукс субтитрів не вдався, шматок буде перерендерено.")
+
+        # Маніфест пишеться лише після успішного рендеру, тож перерваний чанк не вважатиметься готовим
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
         logger.info(f"ЗАПУСК FFMPEG (відео шматок {chunk_index}/{total_chunks}) для аудіо: {os.path.basename(audio_path)}")
-        if app.montage_api.create_video(images_for_chunk, audio_path, subs_path, output_path, task_key=task_key, chunk_index=chunk_index):
+        # The chunk is video-only; its audio is encoded once when the chunks are joined
+        if app.montage_api.create_video(images_for_chunk, audio_path, subs_path, output_path, task_key=task_key, chunk_index=chunk_index, resources=resources, include_audio=False, profiles=profiles):
             logger.info(f"ЗАВЕРШЕННЯ FFMPEG (відео шматок {chunk_index}/{total_chunks})")
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
             return output_path
+        if app.montage_api.cancel_token.is_cancelled:
+            logger.info(f"Відео шматок {chunk_index}/{total_chunks} перервано: обробку зупинено.")
+            return None
         logger.error(f"ПОМИЛКА FFMPEG (відео шматок {chunk_index}/{total_chunks})")
         return None
+    except Exception as e:
+        logger.exception(f"Помилка обробки відео шматка {chunk_index}/{total_chunks}: {e}")
+        return None
     finally:
         if hasattr(app.log_context, 'parallel_task'): del app.log_context.parallel_task
         if hasattr(app.log_context, 'worker_id'): del app.log_context.worker_id
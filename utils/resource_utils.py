@@ -0,0 +1,90 @@
+# utils/resource_utils.py
+
+import os
+import sys
+import logging
+
+logger = logging.getLogger("TranslationApp")
+
+# Оцінка пам'яті одного процесу ffmpeg монтажу (zoompan на 2x кадрі + lookahead кодера 1080p)
+FFMPEG_PROCESS_MEMORY_MB = 700
+# Більше потоків на одне кодування 1080p майже не прискорює libx264
+MAX_USEFUL_ENCODER_THREADS = 8
+# Споживчі GPU обмежують кількість одночасних апаратних сесій кодування
+MAX_HARDWARE_ENCODER_SESSIONS = 4
+
+def available_memory_bytes():
+    """Повертає обсяг доступної оперативної пам'яті в байтах або None, якщо його не вдалося визначити."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullAvailPhys
+        elif os.path.exists('/proc/meminfo'):
+            with open('/proc/meminfo', 'r') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        elif hasattr(os, 'sysconf'):
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except Exception as e:
+        logger.debug(f"Не вдалося визначити доступну пам'ять: {e}")
+    return None
+
+def plan_montage_resources(num_chunks: int, audio_seconds: float, parallel_cfg: dict, video_codec: str = 'libx264') -> dict:
+    """
+    Розраховує паралельність монтажу. Планується лише кількість воркерів і потоків: розбиття на чанки
+    не змінюється і, як і раніше, відповідає парам аудіо+субтитри з етапу озвучки (num_chunks).
+    Щоб мала кількість чанків не обмежувала завантаження CPU, вільні процеси віддаються
+    паралельному рендеру сегментів усередині чанка (segment_workers).
+    Повертає dict:
+      'chunk_workers'   - скільки чанків рендерити одночасно;
+      'segment_workers' - скільки сегментів одного чанка рендерити одночасно;
+      'ffmpeg_threads'  - значення -threads для кожного процесу ffmpeg.
+    Загальна кількість процесів ffmpeg обмежується ядрами, пам'яттю та (для апаратних кодеків) сесіями GPU.
+    Ручні значення parallel_processing.montage_workers / ffmpeg_threads (не 0) мають пріоритет.
+    """
+    cpus = os.cpu_count() or 2
+    is_hardware = video_codec != 'libx264'
+
+    # Сегменти кодуються програмно; апаратний кодек використовується лише у фінальному проході чанка
+    threads_per_process = 2 if is_hardware else min(MAX_USEFUL_ENCODER_THREADS, max(2, cpus // 4))
+    total_processes = max(1, cpus // threads_per_process)
+
+    memory = available_memory_bytes()
+    if memory:
+        memory_limit = max(1, int(memory * 0.7) // (FFMPEG_PROCESS_MEMORY_MB * 1024 * 1024))
+        total_processes = min(total_processes, memory_limit)
+
+    # Короткому аудіо немає сенсу виділяти багато процесів: сегмент займає ~10 с таймлайну
+    total_processes = min(total_processes, max(1, int(audio_seconds // 10)))
+
+    manual_workers = parallel_cfg.get('montage_workers', 0)
+    if manual_workers:
+        total_processes = manual_workers
+
+    chunk_workers = max(1, min(num_chunks, total_processes))
+    if is_hardware:
+        chunk_workers = min(chunk_workers, MAX_HARDWARE_ENCODER_SESSIONS)
+    segment_workers = max(1, total_processes // chunk_workers)
+    ffmpeg_threads = parallel_cfg.get('ffmpeg_threads', 0) or max(1, cpus // (chunk_workers * segment_workers))
+
+    plan = {'chunk_workers': chunk_workers, 'segment_workers': segment_workers, 'ffmpeg_threads': ffmpeg_threads}
+    memory_text = f"{memory / 1024 ** 3:.1f} ГБ" if memory else "невідомо"
+    logger.info(f"Ресурси монтажу -> CPU: {cpus}, вільна пам'ять: {memory_text}, аудіо: {audio_seconds:.0f}с, чанків: {num_chunks}. План: {plan}")
+    return plan
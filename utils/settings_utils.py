@@ -4,7 +4,6 @@ import tkinter as tk
 from tkinter import messagebox
 from utils.config_utils import save_config, setup_ffmpeg_path
 from api.elevenlabs_api import ElevenLabsAPI
-from api.montage_api import MontageAPI
 from api.openrouter_api import OpenRouterAPI
 from api.pollinations_api import PollinationsAPI
 from api.recraft_api import RecraftAPI
@@ -29,6 +28,8 @@ def save_settings(app_instance):
         app.config['parallel_processing'] = {}
     app.config['parallel_processing']['enabled'] = app.parallel_enabled_var.get()
     app.config['parallel_processing']['num_chunks'] = app.parallel_num_chunks_var.get()
+    app.config['parallel_processing']['montage_workers'] = app.parallel_montage_workers_var.get()
+    app.config['parallel_processing']['ffmpeg_threads'] = app.parallel_ffmpeg_threads_var.get()
     app.config['parallel_processing']['keep_temp_files'] = app.parallel_keep_temps_var.get()
     
     # OpenRouter settings
@@ -46,6 +47,11 @@ def save_settings(app_instance):
     app.config["openrouter"]["prompt_params"]["max_tokens"] = app.prompt_gen_tokens_var.get()
     app.config["openrouter"]["cta_params"]["temperature"] = app.cta_temp_var.get()
     app.config["openrouter"]["cta_params"]["max_tokens"] = app.cta_tokens_var.get()
+    app.config["openrouter"]["streaming_enabled"] = app.or_streaming_var.get()
+    app.config["openrouter"]["combined_cta_prompts"] = app.combined_cta_prompts_var.get()
+    segment_cfg = app.config["openrouter"].setdefault("segmented_translation", {})
+    segment_cfg["enabled"] = app.segmented_translation_var.get()
+    segment_cfg["segment_chars"] = app.segment_chars_var.get()
     
     # Default prompts
     app.config["default_prompts"]["image_prompt_generation"] = app.prompt_gen_prompt_text.get("1.0", tk.END).strip()
@@ -148,6 +154,15 @@ def save_settings(app_instance):
     app.config['montage']['font_size'] = app.montage_font_size_var.get()
     app.config['montage']['font_style'] = app.montage_font_style_var.get()
     app.config['montage']['output_framerate'] = app.montage_output_framerate_var.get()
+    app.config['montage']['quality_tier'] = app.montage_quality_tier_var.get()
+    app.config['montage']['preview_quality_tier'] = app.montage_preview_quality_tier_var.get()
+    app.config['montage']['output_profiles_enabled'] = app.montage_output_profiles_enabled_var.get()
+    app.config['montage']['image_budget_enabled'] = app.montage_image_budget_enabled_var.get()
+    app.config['montage']['image_budget_seconds_per_image'] = app.montage_image_budget_seconds_var.get()
+    app.config['montage']['subtitle_mode'] = app.montage_subtitle_mode_var.get()
+    app.config['montage']['image_framing'] = app.montage_image_framing_var.get()
+    app.config['montage']['soft_subtitle_container'] = app.montage_soft_subtitle_container_var.get()
+    app.config['montage']['soft_subtitle_burned_copy'] = app.montage_soft_subtitle_burned_copy_var.get()
     
     # Codec settings
     if 'codec' not in app.config['montage']: 
@@ -182,12 +197,17 @@ def save_settings(app_instance):
     
     app.config['ui_settings']['image_control_enabled'] = app.image_control_var.get()
     app.config['ui_settings']['auto_switch_service_on_fail'] = app.auto_switch_var.get()
+    app.config['ui_settings']['show_queue_estimate'] = app.show_queue_estimate_var.get()
+    app.config.setdefault('retry_policy', {})['max_attempts'] = app.retry_max_attempts_var.get()
+    app.config['retry_policy']['tts_fallback_enabled'] = app.tts_fallback_var.get()
     app.config['ui_settings']['auto_switch_retry_limit'] = app.auto_switch_retries_var.get()
 
     # Зберігаємо конфігурацію
     save_config(app.config)
     
-    # Перестворюємо API об'єкти з новими налаштуваннями
+    # Перестворюємо API об'єкти з новими налаштуваннями.
+    # MontageAPI сам імпортує utils, тому на рівні модуля це був би циклічний імпорт
+    from api.montage_api import MontageAPI
     app.or_api = OpenRouterAPI(app.config)
     app.poll_api = PollinationsAPI(app.config, app)
     app.recraft_api = RecraftAPI(app.config)
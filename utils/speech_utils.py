@@ -0,0 +1,226 @@
+# utils/speech_utils.py
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("TranslationApp")
+
+# Whisper завжди працює з моно 16 кГц
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+
+# Модель у процесі-воркері шардованої транскрипції (див. transcribe_shard_worker)
+_worker_model = None
+
+
+def frame_levels_db(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """Повертає RMS-рівень кожного кадру аудіо в дБ (0 дБ = повна шкала)."""
+    frame_len = max(1, int(sample_rate * frame_seconds))
+    num_frames = len(samples) // frame_len
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:num_frames * frame_len].reshape(num_frames, frame_len).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    return 20.0 * np.log10(rms)
+
+
+def find_silence_points(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, threshold_db: float = -40.0, min_silence: float = 0.4) -> list:
+    """Знаходить паузи довші за min_silence і повертає їхні середини в секундах."""
+    levels = frame_levels_db(samples, sample_rate)
+    if len(levels) == 0:
+        return []
+
+    silent = levels < threshold_db
+    min_frames = max(1, int(min_silence / FRAME_SECONDS))
+    points = []
+    run_start = None
+    for i, is_silent in enumerate(silent):
+        if is_silent and run_start is None:
+            run_start = i
+        elif not is_silent and run_start is not None:
+            if i - run_start >= min_frames:
+                points.append((run_start + i) / 2.0 * FRAME_SECONDS)
+            run_start = None
+    if run_start is not None and len(silent) - run_start >= min_frames:
+        points.append((run_start + len(silent)) / 2.0 * FRAME_SECONDS)
+    return points
+
+
+def plan_shards(duration: float, silence_points: list, shard_seconds: float, overlap: float) -> list:
+    """
+    Ділить аудіо тривалістю duration на шарди приблизно по shard_seconds.
+    Межі ставляться в найближчу паузу (якщо вона є в межах третини шарда).
+    Кожен шард має "ядро" [core_start, core_end) без перекриття та розширені межі
+    [start, end) з перекриттям overlap з обох боків, щоб Whisper бачив контекст.
+    """
+    if duration <= shard_seconds * 1.5:
+        return [{'start': 0.0, 'end': duration, 'core_start': 0.0, 'core_end': duration}]
+
+    cuts = [0.0]
+    search_window = shard_seconds / 3.0
+    while duration - cuts[-1] > shard_seconds * 1.5:
+        target = cuts[-1] + shard_seconds
+        candidates = [p for p in silence_points if abs(p - target) <= search_window and p > cuts[-1]]
+        cut = min(candidates, key=lambda p: abs(p - target)) if candidates else target
+        cuts.append(cut)
+    cuts.append(duration)
+
+    shards = []
+    for core_start, core_end in zip(cuts[:-1], cuts[1:]):
+        shards.append({
+            'start': max(0.0, core_start - overlap),
+            'end': min(duration, core_end + overlap),
+            'core_start': core_start,
+            'core_end': core_end
+        })
+    return shards
+
+
+def stitch_shard_segments(shards: list, shard_segments: list) -> list:
+    """
+    Склеює сегменти з усіх шардів в одну хронологію.
+    Часові мітки зсуваються на початок шарда; з перекриття береться лише той сегмент,
+    середина якого потрапляє в ядро свого шарда, тож дублікатів на стиках немає.
+    """
+    stitched = []
+    for shard, segments in zip(shards, shard_segments):
+        for segment in segments or []:
+            start = segment['start'] + shard['start']
+            end = segment['end'] + shard['start']
+            midpoint = (start + end) / 2.0
+            if not (shard['core_start'] <= midpoint < shard['core_end']):
+                continue
+            text = segment.get('text', '')
+            if not text.strip():
+                continue
+            stitched.append({'start': start, 'end': end, 'text': text})
+    stitched.sort(key=lambda s: s['start'])
+    return stitched
+
+
+def find_speech_regions(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, relative_threshold_db: float = -35.0,
+                        min_silence: float = 0.5, padding: float = 0.25) -> list:
+    """
+    Енергетичний VAD: повертає список ділянок мовлення [(start, end), ...] у секундах.
+    Поріг рахується відносно гучних кадрів (95-й перцентиль), тож не залежить від рівня запису.
+    Паузи коротші за min_silence не розривають ділянку; кожна ділянка розширюється на padding.
+    """
+    levels = frame_levels_db(samples, sample_rate)
+    if len(levels) == 0:
+        return []
+
+    threshold = max(np.percentile(levels, 95) + relative_threshold_db, -60.0)
+    voiced = np.flatnonzero(levels >= threshold)
+    if len(voiced) == 0:
+        return []
+
+    duration = len(samples) / sample_rate
+    max_gap_frames = max(1, int(min_silence / FRAME_SECONDS))
+    regions = []
+    region_start = prev = voiced[0]
+    for frame in voiced[1:]:
+        if frame - prev > max_gap_frames:
+            regions.append((region_start, prev + 1))
+            region_start = frame
+        prev = frame
+    regions.append((region_start, prev + 1))
+
+    padded = []
+    for start_frame, end_frame in regions:
+        start = max(0.0, start_frame * FRAME_SECONDS - padding)
+        end = min(duration, end_frame * FRAME_SECONDS + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def compact_speech(samples: np.ndarray, regions: list, sample_rate: int = SAMPLE_RATE, gap: float = 0.3):
+    """
+    Склеює ділянки мовлення в одне коротше аудіо з короткими паузами gap між ними.
+    Повертає (compact_samples, mapping), де mapping - список (compact_start, original_start, length).
+    """
+    gap_samples = np.zeros(int(gap * sample_rate), dtype=samples.dtype)
+    pieces = []
+    mapping = []
+    compact_pos = 0.0
+    for start, end in regions:
+        piece = samples[int(start * sample_rate):int(end * sample_rate)]
+        if pieces:
+            pieces.append(gap_samples)
+            compact_pos += gap
+        mapping.append((compact_pos, start, len(piece) / sample_rate))
+        pieces.append(piece)
+        compact_pos += len(piece) / sample_rate
+    compact = np.concatenate(pieces) if pieces else samples[:0]
+    return compact, mapping
+
+
+def map_to_original(t: float, mapping: list) -> float:
+    """Переводить час зі стиснутого аудіо назад у час оригіналу."""
+    for compact_start, original_start, length in reversed(mapping):
+        if t >= compact_start:
+            return original_start + min(t - compact_start, length)
+    return mapping[0][1] if mapping else t
+
+
+def transcribe_with_vad(model, samples: np.ndarray, vad_cfg: dict, **transcribe_kwargs) -> dict:
+    """
+    Транскрибує аудіо, подаючи в Whisper лише ділянки мовлення.
+    Часові мітки сегментів повертаються на шкалу оригінального аудіо.
+    Повертає dict з ключами 'text' та 'segments', як model.transcribe.
+    """
+    regions = None
+    if vad_cfg.get('vad_enabled', True):
+        regions = find_speech_regions(
+            samples,
+            relative_threshold_db=vad_cfg.get('vad_threshold_db', -35.0),
+            min_silence=vad_cfg.get('vad_min_silence', 0.5),
+            padding=vad_cfg.get('vad_padding', 0.25)
+        )
+
+    duration = len(samples) / SAMPLE_RATE
+    if regions is not None and not regions:
+        logger.info("VAD -> Мовлення не знайдено, транскрипцію пропущено.")
+        return {'text': '', 'segments': []}
+
+    speech_duration = sum(end - start for start, end in regions) if regions else duration
+    if not regions or speech_duration >= duration * 0.95:
+        result = model.transcribe(samples, **transcribe_kwargs)
+        return {'text': result.get('text', ''), 'segments': result.get('segments', [])}
+
+    compact, mapping = compact_speech(samples, regions)
+    logger.info(f"VAD -> Мовлення {speech_duration:.1f}с з {duration:.1f}с ({len(regions)} ділянок), тиша пропускається.")
+    result = model.transcribe(compact, **transcribe_kwargs)
+
+    segments = []
+    for segment in result.get('segments', []):
+        remapped = dict(segment)
+        remapped['start'] = map_to_original(segment['start'], mapping)
+        remapped['end'] = max(remapped['start'], map_to_original(segment['end'], mapping))
+        segments.append(remapped)
+    return {'text': result.get('text', ''), 'segments': segments}
+
+
+def init_transcribe_worker(model_name: str, download_root=None):
+    """Ініціалізатор процесу-воркера: завантажує власну копію моделі Whisper."""
+    global _worker_model
+    import whisper
+    _worker_model = whisper.load_model(model_name, download_root=download_root)
+
+
+def detect_language_worker(samples: np.ndarray) -> str:
+    """Визначає мову за першими 30 секундами аудіо."""
+    import whisper
+    audio = whisper.pad_or_trim(samples)
+    mel = whisper.log_mel_spectrogram(audio, n_mels=_worker_model.dims.n_mels).to(_worker_model.device)
+    _, probs = _worker_model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def transcribe_shard_worker(samples: np.ndarray, language=None, vad_cfg=None) -> list:
+    """Транскрибує один шард у процесі-воркері та повертає його сегменти."""
+    result = transcribe_with_vad(_worker_model, samples, vad_cfg or {}, verbose=None, language=language)
+    return [{'start': s['start'], 'end': s['end'], 'text': s['text']} for s in result.get('segments', [])]
@@ -4,6 +4,8 @@ import logging
 import tkinter as tk
 from tkinter import messagebox
 
+from utils.history_utils import format_duration
+
 logger = logging.getLogger(__name__)
 
 def send_telegram_error_notification(app_instance, task_name, lang_code, step, error_details):
@@ -77,6 +79,16 @@ def send_task_completion_report(app_instance, task_config, single_lang_code=None
                  report_lines.append(f"• {result_icon} {escaped_step_name} *{skipped_text}*")
             else:
                 report_lines.append(f"• {result_icon} {escaped_step_name}")
+
+    # Монтаж, що ще триває в інших завданнях, з орієнтовним часом до завершення
+    active_etas = app_instance.get_active_montage_etas() if hasattr(app_instance, 'get_active_montage_etas') else []
+    if active_etas:
+        report_lines.append(app_instance._escape_markdown("---"))
+        report_lines.append("⏳ *Монтаж триває:*")
+        for (task_index, lang_code), eta in active_etas:
+            other_task = next((t for t in app_instance.task_queue if str(t.get('task_index')) == str(task_index)), {})
+            name = other_task.get('task_name', f"Task {task_index}")
+            report_lines.append(app_instance._escape_markdown(f"• {name} [{lang_code.upper()}]: ~{format_duration(eta)}"))
     
     app_instance.tg_api.send_message_in_thread("\n".join(report_lines))
 